@@ -0,0 +1,104 @@
+"""Бенчмарк режима "Только аудио": копирование исходной дорожки против перекодирования в MP3.
+
+Через локальные заменители (standins.py) скачивает оригинальное аудио функцией
+download_youtube_audio с --audio-format copy и mp3 для дорожек YouTube двух видов:
+m4a (AAC) и webm (Opus). Печатает время и размер результата. Завершается с кодом 1,
+если при copy кодек дорожки изменился, copy оказался не быстрее перекодирования
+или кроме аудиодорожки скачивалось видео.
+
+    python benchmarks/audio_only.py [--duration 3600]
+"""
+import argparse
+import contextlib
+import io
+import os
+import re
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path[:0] = [os.path.join(HERE, "..", "src"), HERE]
+
+from ytrd import main  # noqa: E402
+import standins  # noqa: E402
+
+SOURCES = {
+    'm4a': ('-c:a', 'aac', '-b:a', '128k'),
+    'webm': ('-c:a', 'libopus', '-b:a', '128k'),
+}
+
+def audio_codec(path):
+    """Кодек первой аудиодорожки по выводу ffmpeg -i."""
+    out = subprocess.run([main.get_binary_path('ffmpeg') or 'ffmpeg', '-hide_banner', '-i', path],
+                         capture_output=True, text=True, errors='replace').stderr
+    match = re.search(r'Audio: (\w+)', out)
+    return match.group(1) if match else None
+
+def run_download(url, out_dir, audio_format):
+    """Скачивает аудио так же, как core_logic. Возвращает (путь, время)."""
+    session = main.VideoSession(url)
+    ext = main.audio_extension(session, audio_format)
+    path = os.path.join(out_dir, f"{audio_format}.{ext}")
+    start = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()), contextlib.redirect_stderr(io.StringIO()):
+        result = main.download_youtube_audio(url, path, session, audio_format)
+    elapsed = time.perf_counter() - start
+    session.close()
+    return result, elapsed
+
+def main_bench():
+    parser = argparse.ArgumentParser(description="Бенчмарк режима 'Только аудио': copy против mp3")
+    parser.add_argument("--duration", type=int, default=3600, help="Длительность тестового аудио, сек (по умолчанию: 3600)")
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix="ytrd-audio-")
+    failures = []
+    media = standins.MediaServer(workdir).start()
+    try:
+        print(f"Генерация тестового аудио ({args.duration} с)...")
+        # Видео экстрактору нужно только для списка форматов
+        fixtures = standins.make_fixtures(workdir, 1, 144)
+        for source, codec_args in SOURCES.items():
+            path = os.path.join(workdir, f"original.{source}")
+            standins.ffmpeg('-f', 'lavfi', '-i', f"sine=frequency=440:sample_rate=48000:duration={args.duration}",
+                            '-ac', '2', *codec_args, path)
+
+        print(f"  {'источник':<10}{'формат':<8}{'время, с':>10}{'файл, МиБ':>11}  результат")
+        for index, source in enumerate(SOURCES, 1):
+            source_path = os.path.join(workdir, f"original.{source}")
+            standins.install_offline_ytdlp(media, {**fixtures, 'audio': source_path}, duration=args.duration)
+            times = {}
+            for audio_format in main.AUDIO_FORMATS:
+                out_dir = os.path.join(workdir, f"out-{source}")
+                os.makedirs(out_dir, exist_ok=True)
+                url = f"https://www.youtube.com/watch?v=audio{index:06d}"
+                video_name = os.path.basename(fixtures['video'])
+                sent = media.sent_by_file.get(video_name, 0)
+                result, times[audio_format] = run_download(url, out_dir, audio_format)
+                video = media.sent_by_file.get(video_name, 0) - sent
+                if video:
+                    failures.append(f"{source}/{audio_format}: скачано {video} байт видео")
+                if not result or not os.path.isfile(result):
+                    failures.append(f"{source}/{audio_format}: аудио не скачано")
+                    continue
+                codec = audio_codec(result)
+                print(f"  {source:<10}{audio_format:<8}{times[audio_format]:>10.2f}"
+                      f"{os.path.getsize(result) / 1024 ** 2:>11.1f}  {os.path.basename(result)} ({codec})")
+                if audio_format == 'copy' and codec != audio_codec(source_path):
+                    failures.append(f"{source}/copy: кодек {codec}, ожидался {audio_codec(source_path)}")
+            if len(times) == 2 and times['copy'] >= times['mp3']:
+                failures.append(f"{source}: copy ({times['copy']:.2f} с) не быстрее mp3 ({times['mp3']:.2f} с)")
+    finally:
+        media.close()
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    for line in failures:
+        print(f"ОШИБКА: {line}")
+    if failures:
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main_bench()
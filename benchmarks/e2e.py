@@ -0,0 +1,335 @@
+"""Офлайн сквозной бенчмарк: полный путь core_logic без интернета.
+
+Вместо YouTube, API перевода и CDN работают локальные заменители из standins.py,
+медиа генерируются FFmpeg (lavfi), сборка идет настоящим FFmpeg. Для каждого сценария
+(Mix, Dual, сегментный Mix, --direct, --stream-audio, --stream-audio с заниженным местом под
+индекс MP4, только аудио, только аудио в пакетном режиме с переводом и с русским видео
+без перевода) печатается по стадиям:
+число вызовов, время, записанные байты и пиковый RSS (Python + дочерние FFmpeg).
+Заменитель YouTube отдает видео в двух качествах (HEIGHT и HIGHER): сценарий с видео
+считается проваленным, если в результате не то качество, что запрошено через -q.
+В сценариях «Только аудио» видео не должно скачиваться вовсе, а оригинальная дорожка
+(для русского видео) — ровно один раз.
+
+    python benchmarks/e2e.py [--duration 180] [--waits 2] [--scenario mix --scenario dual]
+    python benchmarks/e2e.py --save base.json          # сохранить результаты
+    python benchmarks/e2e.py --compare base.json       # код 1, если стадия стала медленнее допуска
+"""
+import argparse
+import contextlib
+import functools
+import io
+import json
+import os
+import re
+import resource
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path[:0] = [os.path.join(HERE, "..", "src"), HERE]
+
+from ytrd import main, poller, vot  # noqa: E402
+import standins  # noqa: E402
+
+SCENARIOS = {
+    'mix': ['-m'],
+    'dual': ['-d'],
+    'mix-segments': ['-m', '--mix-segments', '2'],
+    'direct': ['-d', '--direct'],
+    'stream-audio': ['-m', '--stream-audio'],
+    'stream-audio-moov': ['-m', '--stream-audio'],
+    'audio-only': ['-a'],
+    'batch-audio': ['-a'],
+}
+
+# Пакетные сценарии: вторая ссылка — видео на русском (оригинальное аудио без перевода)
+BATCH_SCENARIOS = {'batch-audio'}
+# Сценарии с заниженной оценкой -moov_size: индекс не помещается, сборка из stdin повторяется
+# из скачанного файла с faststart (ровно два запуска FFmpeg)
+TINY_MOOV_SCENARIOS = {'stream-audio-moov'}
+
+HEIGHT = 360
+# Лучшее качество заменителя: его yt-dlp выберет, если -q не применится
+HIGHER = 720
+
+# Стадии: (объект, функция, название стадии, как найти путь записанного стадией файла)
+STAGES = [
+    (main, 'get_available_qualities', 'analysis', None),
+    (main, 'wait_for_translation', 'translation wait', None),
+    (main, 'download_audio', 'translation download', lambda args, result: args[1]),
+    (main, 'download_video', 'video download', lambda args, result: result[2]),
+    (main, 'run_ffmpeg', 'ffmpeg', lambda args, result: args[0][-1]),
+    (main, 'run_parallel_mix', 'ffmpeg', lambda args, result: args[0]),
+    (main, 'save_output', 'finalize', lambda args, result: None if result == 'rename' else args[1]),
+]
+
+PAGE = os.sysconf('SC_PAGE_SIZE') if hasattr(os, 'sysconf') else 4096
+
+def _rss(pid="self"):
+    try:
+        with open(f"/proc/{pid}/statm") as f:
+            return int(f.read().split()[1]) * PAGE
+    except (OSError, ValueError, IndexError):
+        return 0
+
+def _children():
+    pids = []
+    try:
+        for task in os.listdir("/proc/self/task"):
+            with open(f"/proc/self/task/{task}/children") as f:
+                pids.extend(f.read().split())
+    except OSError:
+        pass
+    return pids
+
+class StageRecorder:
+    """Оборачивает функции main и считает по стадиям время, байты и пиковый RSS."""
+
+    def __init__(self, interval=0.02):
+        self.stats = {}
+        self._active = {}
+        self._lock = threading.Lock()
+        self._interval = interval
+        self._stop = threading.Event()
+        self._patched = []
+        self._sampler = threading.Thread(target=self._sample, daemon=True)
+
+    def install(self):
+        for owner, func_name, stage, output in STAGES:
+            original = getattr(owner, func_name, None)
+            if original is None:
+                continue
+            setattr(owner, func_name, self._wrap(stage, output, original))
+            self._patched.append((owner, func_name, original))
+        self._sampler.start()
+        return self
+
+    def uninstall(self):
+        self._stop.set()
+        self._sampler.join()
+        for owner, func_name, original in self._patched:
+            setattr(owner, func_name, original)
+
+    def _wrap(self, stage, output, func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            token = object()
+            with self._lock:
+                self._active[token] = [stage, _rss() + sum(_rss(pid) for pid in _children())]
+            start = time.perf_counter()
+            try:
+                result = func(*args, **kwargs)
+            finally:
+                elapsed = time.perf_counter() - start
+                with self._lock:
+                    _, peak = self._active.pop(token)
+                    entry = self.stats.setdefault(stage, {'calls': 0, 'seconds': 0.0, 'bytes': 0, 'peak_rss': 0})
+                    entry['calls'] += 1
+                    entry['seconds'] += elapsed
+                    entry['peak_rss'] = max(entry['peak_rss'], peak)
+            if output:
+                try:
+                    path = output(args, result)
+                    if path and os.path.isfile(path):
+                        with self._lock:
+                            entry['bytes'] += os.path.getsize(path)
+                except (TypeError, IndexError, OSError):
+                    pass
+            return result
+        return wrapper
+
+    def _sample(self):
+        while not self._stop.wait(self._interval):
+            rss = _rss() + sum(_rss(pid) for pid in _children())
+            with self._lock:
+                for item in self._active.values():
+                    item[1] = max(item[1], rss)
+
+def run_scenario(name, urls, env, extra, quiet=True):
+    """Запускает core_logic для одного сценария. Возвращает (успех, статистика по стадиям)."""
+    out_dir = os.path.join(env, name, "out")
+    argv = ['ytrd', *urls, *extra,
+            '-o', out_dir,
+            '--cache-dir', os.path.join(env, name, "cache"),
+            '--work-dir', os.path.join(env, name, "work"),
+            '--skip-net-check', '--retries', '2']
+    if '-a' not in extra:
+        argv[1 + len(urls):1 + len(urls)] = ['-q', str(HEIGHT)]
+    recorder = StageRecorder().install()
+    sys.argv = argv
+    sink = io.StringIO()
+    ok = True
+    start = time.perf_counter()
+    try:
+        with contextlib.ExitStack() as stack:
+            # Вопросов быть не должно: любой input() сразу получит EOF
+            stack.enter_context(_stdin_devnull())
+            if quiet:
+                stack.enter_context(contextlib.redirect_stdout(sink))
+                stack.enter_context(contextlib.redirect_stderr(sink))
+            main.core_logic()
+    except SystemExit as e:
+        ok = not e.code
+    finally:
+        total = time.perf_counter() - start
+        recorder.uninstall()
+    outputs = os.listdir(out_dir) if os.path.isdir(out_dir) else []
+    ok = ok and len(outputs) >= len(urls)
+    for f in outputs:
+        if f.endswith(('.mp4', '.mkv')):
+            height = video_height(os.path.join(out_dir, f))
+            if height != HEIGHT:
+                print(f"ОШИБКА: {name}: {f} — {height}p, запрошено {HEIGHT}p")
+                ok = False
+    stats = recorder.stats
+    stats['total'] = {
+        'calls': 1, 'seconds': total,
+        'bytes': sum(os.path.getsize(os.path.join(out_dir, f)) for f in outputs),
+        'peak_rss': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024,
+    }
+    if not ok and quiet:
+        print(sink.getvalue()[-3000:])
+    return ok, stats
+
+def check_audio_only(name, served, fixtures, originals):
+    """Только аудио: видео не скачивается, оригинальная дорожка скачана `originals` раз целиком."""
+    errors = []
+    video = sum(n for f, n in served.items() if f.startswith('video'))
+    if video:
+        errors.append(f"{name}: скачано {video / 1024 ** 2:.1f} МиБ видео")
+    size = os.path.getsize(fixtures['audio'])
+    got = served.get(os.path.basename(fixtures['audio']), 0)
+    if abs(got - size * originals) > size * 0.05:
+        errors.append(f"{name}: оригинального аудио скачано {got} байт, ожидалось {size * originals}")
+    return errors
+
+def video_height(path):
+    """Высота кадра первой видеодорожки по выводу ffmpeg -i."""
+    out = subprocess.run([main.get_binary_path('ffmpeg') or 'ffmpeg', '-hide_banner', '-i', path],
+                         capture_output=True, text=True, errors='replace').stderr
+    match = re.search(r'Video: .*?, (\d+)x(\d+)', out)
+    return int(match.group(2)) if match else None
+
+@contextlib.contextmanager
+def _tiny_moov():
+    """Занижает -moov_size, чтобы индекс MP4 не поместился в зарезервированное место."""
+    original = main.mp4_layout_args
+
+    def patched(*args, **kwargs):
+        flags = original(*args, **kwargs)
+        return ['-moov_size', '4096'] if flags[:1] == ['-moov_size'] else flags
+
+    main.mp4_layout_args = patched
+    try:
+        yield
+    finally:
+        main.mp4_layout_args = original
+
+@contextlib.contextmanager
+def _stdin_devnull():
+    saved = sys.stdin
+    with open(os.devnull) as devnull:
+        sys.stdin = devnull
+        try:
+            yield
+        finally:
+            sys.stdin = saved
+
+def print_stats(name, ok, stats):
+    status = "OK" if ok else "ОШИБКА"
+    print(f"\n=== {name}: {status} ===")
+    print(f"  {'стадия':<22}{'вызовов':>8}{'время, с':>10}{'записано, МиБ':>15}{'пик RSS, МиБ':>14}")
+    for stage, entry in stats.items():
+        print(f"  {stage:<22}{entry['calls']:>8}{entry['seconds']:>10.2f}"
+              f"{entry['bytes'] / 1024 ** 2:>15.1f}{entry['peak_rss'] / 1024 ** 2:>14.1f}")
+
+def compare(results, baseline_path, tolerance, min_seconds=0.2):
+    """Сравнивает время стадий с сохраненным запуском. Возвращает список регрессий."""
+    with open(baseline_path, 'r', encoding='utf-8') as f:
+        baseline = json.load(f)
+    regressions = []
+    for name, (ok, stats) in results.items():
+        for stage, entry in stats.items():
+            base = baseline.get(name, {}).get('stages', {}).get(stage)
+            if not base:
+                continue
+            limit = max(base['seconds'] * (1 + tolerance), base['seconds'] + min_seconds)
+            if entry['seconds'] > limit:
+                regressions.append(f"{name}/{stage}: {entry['seconds']:.2f} с (было {base['seconds']:.2f} с)")
+    return regressions
+
+def main_bench():
+    parser = argparse.ArgumentParser(description="Офлайн сквозной бенчмарк ytrd")
+    parser.add_argument("--duration", type=int, default=180, help="Длительность тестового видео, сек (по умолчанию: 180)")
+    parser.add_argument("--waits", type=int, default=2, help="Сколько ответов 'Waiting' до 'Ready' (по умолчанию: 2)")
+    parser.add_argument("--scenario", action="append", choices=sorted(SCENARIOS), help="Сценарий (можно несколько; по умолчанию все)")
+    parser.add_argument("--fixtures", default=None, help="Папка для тестовых медиа (переиспользуется между запусками)")
+    parser.add_argument("--save", metavar="JSON", help="Сохранить результаты в файл")
+    parser.add_argument("--compare", metavar="JSON", help="Сравнить с сохраненными результатами")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="Допустимое замедление стадии (0.25 = 25%%)")
+    parser.add_argument("--verbose", action="store_true", help="Показывать вывод ytrd")
+    args = parser.parse_args()
+
+    env = tempfile.mkdtemp(prefix="ytrd-e2e-")
+    fixtures_dir = args.fixtures or os.path.join(env, "fixtures")
+    print(f"Генерация тестовых медиа ({args.duration} с)...")
+    fixtures = standins.make_fixtures(fixtures_dir, args.duration, HEIGHT)
+    fixtures['videos'] = [fixtures['video'], standins.make_fixtures(fixtures_dir, args.duration, HIGHER)['video']]
+
+    media = standins.MediaServer(fixtures_dir).start()
+    translate = standins.FakeTranslateServer(media.url(fixtures['translation']), waits=args.waits).start()
+    names = args.scenario or SCENARIOS
+    russian = {f"ruvid{index:06d}": 'ru' for index, name in enumerate(names, 1) if name in BATCH_SCENARIOS}
+    standins.install_offline_ytdlp(media, fixtures, duration=args.duration, languages=russian)
+    vot._default_client = vot.TranslationClient(api_url=translate.url)
+    # Короткие паузы опроса: ожидание перевода в бенчмарке — секунды, а не минуты
+    poller.MIN_INTERVAL = 0.5
+
+    results = {}
+    try:
+        for index, name in enumerate(names, 1):
+            url = f"https://www.youtube.com/watch?v=bench{index:06d}"
+            urls = [url]
+            if name in BATCH_SCENARIOS:
+                urls.append(f"https://www.youtube.com/watch?v=ruvid{index:06d}")
+            sent, sent_by_file = media.bytes_sent, dict(media.sent_by_file)
+            with _tiny_moov() if name in TINY_MOOV_SCENARIOS else contextlib.nullcontext():
+                ok, stats = run_scenario(name, urls, env, SCENARIOS[name], quiet=not args.verbose)
+            if name in TINY_MOOV_SCENARIOS and stats.get('ffmpeg', {}).get('calls') != 2:
+                print(f"ОШИБКА: {name}: запусков FFmpeg {stats.get('ffmpeg', {}).get('calls')}, ожидалось 2")
+                ok = False
+            stats['total']['served'] = media.bytes_sent - sent
+            if '-a' in SCENARIOS[name]:
+                served = {f: n - sent_by_file.get(f, 0) for f, n in media.sent_by_file.items()}
+                errors = check_audio_only(name, served, fixtures, originals=len(urls) - 1)
+                for line in errors:
+                    print(f"ОШИБКА: {line}")
+                ok = ok and not errors
+            results[name] = (ok, stats)
+            print_stats(name, ok, stats)
+            print(f"  отдано локальным CDN: {stats['total']['served'] / 1024 ** 2:.1f} МиБ, "
+                  f"запросов к API перевода: {translate.polls.get(url, 0)}")
+    finally:
+        media.close()
+        translate.close()
+        shutil.rmtree(env, ignore_errors=True)
+
+    if args.save:
+        with open(args.save, 'w', encoding='utf-8') as f:
+            json.dump({name: {'ok': ok, 'stages': stats} for name, (ok, stats) in results.items()}, f, indent=2)
+    failed = [name for name, (ok, _) in results.items() if not ok]
+    regressions = compare(results, args.compare, args.tolerance) if args.compare else []
+    for line in regressions:
+        print(f"РЕГРЕССИЯ: {line}")
+    if failed:
+        print(f"Сценарии с ошибкой: {', '.join(failed)}")
+    if failed or regressions:
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main_bench()
@@ -0,0 +1,87 @@
+"""Бенчмарк кэша исходных видео (--media-cache-gb): разные качества — разные записи кэша.
+
+Через локальные заменители (standins.py) скачивает одно видео функцией download_video
+в 360p, затем в 720p, затем снова в 360p. Печатает время, отданные CDN байты и высоту
+результата. Завершается с кодом 1, если качество результата не совпало с запрошенным,
+720p было взято из записи 360p (или наоборот), повторный 360p скачивался заново
+или в кэше не две записи.
+
+    python benchmarks/media_cache.py [--duration 120]
+"""
+import argparse
+import contextlib
+import io
+import os
+import re
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path[:0] = [os.path.join(HERE, "..", "src"), HERE]
+
+from ytrd import cache, main  # noqa: E402
+import standins  # noqa: E402
+
+HEIGHTS = (360, 720)
+URL = "https://www.youtube.com/watch?v=cache0000001"
+
+def video_height(path):
+    """Высота кадра первой видеодорожки по выводу ffmpeg -i."""
+    out = subprocess.run([main.get_binary_path('ffmpeg') or 'ffmpeg', '-hide_banner', '-i', path],
+                         capture_output=True, text=True, errors='replace').stderr
+    match = re.search(r'Video: .*?, (\d+)x(\d+)', out)
+    return int(match.group(2)) if match else None
+
+def main_bench():
+    parser = argparse.ArgumentParser(description="Бенчмарк кэша исходных видео: ключ по качеству")
+    parser.add_argument("--duration", type=int, default=120, help="Длительность тестового видео, сек (по умолчанию: 120)")
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix="ytrd-cache-")
+    failures = []
+    media = standins.MediaServer(workdir).start()
+    try:
+        print(f"Генерация тестовых медиа ({args.duration} с)...")
+        fixtures = standins.make_fixtures(workdir, args.duration, HEIGHTS[0])
+        fixtures['videos'] = [standins.make_fixtures(workdir, args.duration, h)['video'] for h in HEIGHTS]
+        standins.install_offline_ytdlp(media, fixtures, duration=args.duration)
+        cache.configure(os.path.join(workdir, "cache"), media_bytes=10 * 1024 ** 3)
+        out_dir = os.path.join(workdir, "out")
+        os.makedirs(out_dir)
+
+        print(f"  {'запрос':<8}{'время, с':>10}{'отдано, МиБ':>13}{'высота':>8}")
+        for step, (height, expect_hit) in enumerate([(360, False), (720, False), (360, True)], 1):
+            session = main.VideoSession(URL)
+            sent = media.bytes_sent
+            start = time.perf_counter()
+            with contextlib.redirect_stdout(io.StringIO()), contextlib.redirect_stderr(io.StringIO()):
+                _, _, path = main.download_video(URL, os.path.join(out_dir, f"{step}.mp4"), height, session)
+            elapsed = time.perf_counter() - start
+            session.close()
+            served = media.bytes_sent - sent
+            actual = video_height(path)
+            print(f"  {f'{height}p':<8}{elapsed:>10.2f}{served / 1024 ** 2:>13.1f}{actual or 0:>7}p")
+            if actual != height:
+                failures.append(f"{step}: запрошено {height}p, получено {actual}p")
+            if expect_hit and served:
+                failures.append(f"{step}: {height}p скачано заново, хотя есть в кэше")
+            if not expect_hit and not served:
+                failures.append(f"{step}: {height}p взято из кэша другого качества")
+
+        entries = [f for f in os.listdir(cache.get_media_cache().root) if f.endswith('.json')]
+        if len(entries) != len(HEIGHTS):
+            failures.append(f"записей в кэше: {len(entries)}, ожидалось {len(HEIGHTS)}")
+    finally:
+        media.close()
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    for line in failures:
+        print(f"ОШИБКА: {line}")
+    if failures:
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main_bench()
@@ -0,0 +1,136 @@
+"""Бенчмарк раскладок MP4 (--mp4-layout): сколько байт записывает FFmpeg и сколько это занимает.
+
+Генерирует видео и дорожку перевода через lavfi и собирает Dual (копирование потоков)
+и Mix каждой раскладкой. Записанные байты берутся из /proc/<pid>/io (wchar) до того, как
+процесс FFmpeg будет удален из системы, поэтому второй проход faststart виден в цифрах.
+Проверяется, что индекс (moov) стоит там, где обещано, и файл читается целиком.
+Завершается с кодом 1, если раскладка кроме faststart записала больше
+--max-overhead от размера файла или результат не читается.
+
+    python benchmarks/mp4_layout.py [--duration 600] [--mode dual --mode mix]
+"""
+import argparse
+import os
+import shutil
+import struct
+import subprocess
+import sys
+import tempfile
+import time
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path[:0] = [os.path.join(HERE, "..", "src"), HERE]
+
+from ytrd import main  # noqa: E402
+import standins  # noqa: E402
+
+MODES = {'dual': 3, 'mix': 2}
+
+def ffmpeg_exec():
+    return main.get_binary_path('ffmpeg') or 'ffmpeg'
+
+def run_measured(cmd):
+    """Запускает команду. Возвращает (код, время, записано байт); байты — None, если /proc недоступен."""
+    start = time.perf_counter()
+    proc = subprocess.Popen(cmd, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE)
+    stderr = proc.stderr.read()
+    written = None
+    if hasattr(os, 'waitid'):
+        # WNOWAIT: процесс завершен, но еще не удален — его счетчики ввода-вывода можно прочитать
+        os.waitid(os.P_PID, proc.pid, os.WEXITED | os.WNOWAIT)
+        try:
+            with open(f"/proc/{proc.pid}/io") as f:
+                written = next(int(line.split()[1]) for line in f if line.startswith("wchar:"))
+        except (OSError, StopIteration, ValueError):
+            pass
+    rc = proc.wait()
+    if rc != 0:
+        print(stderr.decode('utf-8', 'replace')[-2000:])
+    return rc, time.perf_counter() - start, written
+
+def top_atoms(path):
+    """Атомы верхнего уровня MP4 по порядку."""
+    atoms = []
+    with open(path, 'rb') as f:
+        size = os.fstat(f.fileno()).st_size
+        pos = 0
+        while pos + 8 <= size:
+            f.seek(pos)
+            length, name = struct.unpack('>I4s', f.read(8))
+            if length == 1:
+                length = struct.unpack('>Q', f.read(8))[0]
+            elif length == 0:
+                length = size - pos
+            atoms.append(name.decode('latin-1'))
+            if length < 8:
+                break
+            pos += length
+    return atoms
+
+def index_position(atoms):
+    if 'moof' in atoms:
+        return "фрагменты"
+    if 'moov' not in atoms or 'mdat' not in atoms:
+        return "нет индекса"
+    return "начало" if atoms.index('moov') < atoms.index('mdat') else "конец"
+
+EXPECTED = {'reserve': "начало", 'faststart': "начало", 'fragmented': "фрагменты", 'none': "конец"}
+
+def readable(path):
+    return subprocess.run([ffmpeg_exec(), '-v', 'error', '-i', path, '-map', '0', '-c', 'copy', '-f', 'null', '-'],
+                          capture_output=True).returncode == 0
+
+def main_bench():
+    parser = argparse.ArgumentParser(description="Бенчмарк раскладок MP4: записанные байты и время")
+    parser.add_argument("--duration", type=int, default=600, help="Длительность тестового видео, сек (по умолчанию: 600)")
+    parser.add_argument("--height", type=int, default=720, help="Высота кадра тестового видео (по умолчанию: 720)")
+    parser.add_argument("--mode", action="append", choices=sorted(MODES), help="Режим сборки (можно несколько; по умолчанию все)")
+    parser.add_argument("--max-overhead", type=float, default=0.1, help="Допустимая доля лишней записи для однопроходных раскладок (по умолчанию: 0.1)")
+    parser.add_argument("--fixtures", default=None, help="Папка для тестовых медиа (переиспользуется между запусками)")
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix="ytrd-mp4-")
+    failures = []
+    try:
+        fixtures_dir = args.fixtures or os.path.join(workdir, "fixtures")
+        print(f"Генерация тестовых медиа ({args.duration} с, {args.height}p)...")
+        fixtures = standins.make_fixtures(fixtures_dir, args.duration, args.height)
+        # Исходник как после загрузки: видео и оригинальный звук в одном файле
+        video = os.path.join(workdir, "source.mp4")
+        subprocess.run([ffmpeg_exec(), '-v', 'error', '-y', '-i', fixtures['video'], '-i', fixtures['audio'],
+                        '-map', '0:v', '-map', '1:a', '-c', 'copy', video], check=True)
+        audio = fixtures['translation']
+
+        for mode_name in args.mode or MODES:
+            print(f"\n=== {mode_name} ===")
+            print(f"  {'раскладка':<12}{'время, с':>10}{'файл, МиБ':>11}{'записано, МиБ':>15}{'×файл':>7}  индекс")
+            for layout in main.MP4_LAYOUTS:
+                out = os.path.join(workdir, f"{mode_name}-{layout}.mp4")
+                cmd = main.build_ffmpeg_command(MODES[mode_name], out, video, audio,
+                                                layout=layout, duration=args.duration)
+                rc, seconds, written = run_measured(cmd)
+                if rc != 0 or not os.path.isfile(out):
+                    failures.append(f"{mode_name}/{layout}: FFmpeg завершился с кодом {rc}")
+                    continue
+                size = os.path.getsize(out)
+                position = index_position(top_atoms(out))
+                ratio = written / size if written else None
+                print(f"  {layout:<12}{seconds:>10.2f}{size / 1024 ** 2:>11.1f}"
+                      f"{(written or 0) / 1024 ** 2:>15.1f}{ratio or 0:>7.2f}  {position}")
+                if position != EXPECTED[layout]:
+                    failures.append(f"{mode_name}/{layout}: индекс «{position}», ожидалось «{EXPECTED[layout]}»")
+                if not readable(out):
+                    failures.append(f"{mode_name}/{layout}: файл не читается")
+                if layout != 'faststart' and ratio and ratio > 1 + args.max_overhead:
+                    failures.append(f"{mode_name}/{layout}: записано {ratio:.2f}× от размера файла")
+                os.remove(out)
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    for line in failures:
+        print(f"ОШИБКА: {line}")
+    if failures:
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main_bench()
@@ -0,0 +1,75 @@
+"""Бенчмарк режима Mix: один процесс FFmpeg против сегментной сборки (--mix-segments).
+
+Генерирует видео и дорожку перевода заданной длины через lavfi, собирает Mix обоими
+способами и печатает время и длительность звука в результатах. Завершается с кодом 1,
+если длина звука сегментной сборки отличается от обычной больше чем на кадр AAC.
+
+    python benchmarks/parallel_mix.py [--duration 1800] [--segments 4]
+"""
+import argparse
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+
+from ytrd import main, parallel_mix  # noqa: E402
+
+def ffmpeg(*args):
+    subprocess.run([main.get_binary_path('ffmpeg') or 'ffmpeg', '-v', 'error', '-y', *args], check=True)
+
+def make_fixtures(workdir, duration):
+    video = os.path.join(workdir, "video.mp4")
+    audio = os.path.join(workdir, "audio.mp3")
+    ffmpeg('-f', 'lavfi', '-i', f"testsrc=size=320x240:rate=25:duration={duration}",
+           '-f', 'lavfi', '-i', f"aevalsrc='sin(2*PI*(200+t)*t)|sin(2*PI*(300+t)*t)':s=48000:d={duration}",
+           '-c:v', 'libx264', '-preset', 'ultrafast', '-c:a', 'aac', '-b:a', '128k', video)
+    ffmpeg('-f', 'lavfi', '-i', f"aevalsrc='0.5*sin(2*PI*(500+t)*t)':s=44100:d={duration}",
+           '-c:a', 'libmp3lame', '-b:a', '128k', audio)
+    return video, audio
+
+def audio_duration(path):
+    """Длительность звука в секундах по числу декодированных сэмплов."""
+    out = subprocess.run([main.get_binary_path('ffmpeg') or 'ffmpeg', '-v', 'error', '-i', path, '-map', '0:a',
+                          '-f', 's16le', '-ac', '1', '-ar', str(parallel_mix.SAMPLE_RATE), '-'],
+                         capture_output=True, check=True).stdout
+    return len(out) / 2 / parallel_mix.SAMPLE_RATE
+
+def main_bench():
+    parser = argparse.ArgumentParser(description="Бенчмарк режима Mix: один процесс против сегментов")
+    parser.add_argument("--duration", type=int, default=1800, help="Длительность тестового видео, сек (по умолчанию: 1800)")
+    parser.add_argument("--segments", type=int, default=os.cpu_count() or 2, help="Число сегментов (по умолчанию: число ядер)")
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix="ytrd-bench-")
+    try:
+        print(f"Генерация тестового видео ({args.duration} с)...")
+        video, audio = make_fixtures(workdir, args.duration)
+
+        single = os.path.join(workdir, "single.mp4")
+        start = time.perf_counter()
+        parallel_mix.run_process(main.build_ffmpeg_command(2, single, video, audio))
+        single_time = time.perf_counter() - start
+
+        segmented = os.path.join(workdir, "segmented.mp4")
+        start = time.perf_counter()
+        count = parallel_mix.mix_parallel(main.get_binary_path('ffmpeg') or 'ffmpeg', video, audio, segmented,
+                                          args.duration, workdir, args.segments)
+        segmented_time = time.perf_counter() - start
+
+        single_len, segmented_len = audio_duration(single), audio_duration(segmented)
+        print(f"Ядер: {os.cpu_count()}")
+        print(f"{'Один процесс:':<20}{single_time:7.2f} с, звук {single_len:.3f} с")
+        print(f"{f'Сегментов: {count}':<20}{segmented_time:7.2f} с, звук {segmented_len:.3f} с")
+        print(f"{'Ускорение:':<20}x{single_time / segmented_time:.2f}")
+        if abs(single_len - segmented_len) > parallel_mix.FRAME / parallel_mix.SAMPLE_RATE:
+            print("ОШИБКА: длина звука сегментной сборки отличается от обычной")
+            sys.exit(1)
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+if __name__ == "__main__":
+    main_bench()
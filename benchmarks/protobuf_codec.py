@@ -0,0 +1,178 @@
+"""Микробенчмарк кодека protobuf (ytrd.protobuf) против прежних помощников из vot.py.
+
+Сравнивает сборку тела запроса перевода, разбор ответа перевода и разбор ответа
+с субтитрами (повторяющиеся вложенные сообщения, которые прежний разборщик не умел:
+он оставлял только последнее поле и не разбирал вложенность).
+
+    python benchmarks/protobuf_codec.py [--number 20000] [--subtitles 50]
+"""
+import argparse
+import os
+import struct
+import sys
+import timeit
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+
+from ytrd import vot  # noqa: E402
+
+# --- Прежняя реализация (копия из vot.py до перехода на схемы) ---
+
+def encode_varint(value):
+    target = []
+    if value < 0:
+        value += (1 << 64)
+    bits = value & 0x7f
+    value >>= 7
+    while value:
+        target.append(bits | 0x80)
+        bits = value & 0x7f
+        value >>= 7
+    target.append(bits)
+    return bytes(target)
+
+def read_varint(buffer, pos):
+    result = 0
+    shift = 0
+    while True:
+        b = buffer[pos]
+        result |= (b & 0x7f) << shift
+        pos += 1
+        if not (b & 0x80):
+            return result, pos
+        shift += 7
+
+def encode_tag(field_number, wire_type):
+    return encode_varint((field_number << 3) | wire_type)
+
+def encode_string(field_number, value):
+    if value is None:
+        return b""
+    encoded = value.encode('utf-8')
+    return encode_tag(field_number, 2) + encode_varint(len(encoded)) + encoded
+
+def encode_bool(field_number, value):
+    return encode_tag(field_number, 0) + encode_varint(1 if value else 0)
+
+def encode_double(field_number, value):
+    return encode_tag(field_number, 1) + struct.pack('<d', float(value))
+
+def encode_int32(field_number, value):
+    return encode_tag(field_number, 0) + encode_varint(value)
+
+class SimpleProtobufReader:
+    def __init__(self, data):
+        self.data = data
+        self.pos = 0
+        self.fields = {}
+        self._parse()
+
+    def _parse(self):
+        while self.pos < len(self.data):
+            try:
+                tag, self.pos = read_varint(self.data, self.pos)
+                field_number = tag >> 3
+                wire_type = tag & 0x07
+                if wire_type == 0:
+                    val, self.pos = read_varint(self.data, self.pos)
+                    self.fields[field_number] = val
+                elif wire_type == 2:
+                    length, self.pos = read_varint(self.data, self.pos)
+                    val = self.data[self.pos:self.pos+length]
+                    self.pos += length
+                    self.fields[field_number] = val
+                elif wire_type == 1:
+                    val = self.data[self.pos:self.pos+8]
+                    self.pos += 8
+                    self.fields[field_number] = val
+                elif wire_type == 5:
+                    val = self.data[self.pos:self.pos+4]
+                    self.pos += 4
+                    self.fields[field_number] = val
+                else:
+                    pass
+            except IndexError:
+                break
+
+    def get_string(self, field_number):
+        if field_number in self.fields:
+            return self.fields[field_number].decode('utf-8')
+        return None
+
+    def get_int(self, field_number):
+        return self.fields.get(field_number)
+
+def legacy_request(url, duration, request_lang="en", response_lang="ru"):
+    body = b""
+    body += encode_string(3, url)
+    body += encode_bool(5, True)
+    body += encode_double(6, float(duration))
+    body += encode_int32(7, 1)
+    body += encode_string(8, request_lang)
+    body += encode_int32(9, 0)
+    body += encode_int32(10, 0)
+    body += encode_string(14, response_lang)
+    body += encode_int32(15, 0)
+    body += encode_int32(16, 1)
+    body += encode_int32(17, 0)
+    return body
+
+def legacy_response(content):
+    reader = SimpleProtobufReader(content)
+    return reader.get_int(4), reader.get_string(9), reader.get_string(1)
+
+# --- Новая реализация ---
+
+def new_request(url, duration, request_lang="en", response_lang="ru"):
+    return vot.encode_translate_request(url, duration, request_lang, response_lang)
+
+def new_response(content):
+    response = vot.TRANSLATE_RESPONSE.decode(content)
+    return response.status, response.message, response.url
+
+def bench(label, func, number):
+    seconds = min(timeit.repeat(func, number=number, repeat=5))
+    print(f"  {label:<10} {seconds / number * 1e6:8.2f} мкс")
+    return seconds
+
+def main():
+    parser = argparse.ArgumentParser(description="Микробенчмарк кодека protobuf")
+    parser.add_argument("--number", type=int, default=20000, help="Вызовов в одном замере (по умолчанию: 20000)")
+    parser.add_argument("--subtitles", type=int, default=50, help="Субтитров в ответе (по умолчанию: 50)")
+    args = parser.parse_args()
+
+    url = "https://www.youtube.com/watch?v=dQw4w9WgXcQ"
+    assert legacy_request(url, 341.0) == new_request(url, 341.0), "тела запросов различаются"
+
+    ready = bytes(vot.TRANSLATE_RESPONSE.encode({
+        "url": "https://vtrans.s3-private.mds.yandex.net/tts/prod/" + "x" * 200 + ".mp3",
+        "duration": 341.0, "status": 1, "translation_id": "1234567890", "language": "en",
+    }))
+    assert legacy_response(ready) == new_response(ready), "результаты разбора различаются"
+
+    subtitles = bytes(vot.SUBTITLES_RESPONSE.encode({
+        "waiting": False,
+        "subtitles": [{"language": "en", "url": f"https://example.com/subs/{i}.json",
+                       "translated_language": "ru", "translated_url": f"https://example.com/subs/{i}.ru.json"}
+                      for i in range(args.subtitles)],
+    }))
+
+    print("Сборка тела запроса:")
+    old = bench("прежняя", lambda: legacy_request(url, 341.0), args.number)
+    new = bench("схема", lambda: new_request(url, 341.0), args.number)
+    print(f"  отношение x{old / new:.2f}")
+
+    print("Разбор ответа перевода (status, message, url):")
+    old = bench("прежняя", lambda: legacy_response(ready), args.number)
+    new = bench("схема", lambda: new_response(ready), args.number)
+    print(f"  отношение x{old / new:.2f}")
+
+    print(f"Разбор ответа с субтитрами ({args.subtitles} шт.):")
+    number = max(1, args.number // 10)
+    bench("прежняя", lambda: SimpleProtobufReader(subtitles), number)
+    bench("схема", lambda: [s.url for s in vot.SUBTITLES_RESPONSE.decode(subtitles).subtitles], number)
+    legacy_count = 1 if 2 in SimpleProtobufReader(subtitles).fields else 0
+    print(f"  субтитров найдено: прежняя {legacy_count}, схема {len(vot.SUBTITLES_RESPONSE.decode(subtitles).subtitles)}")
+
+if __name__ == "__main__":
+    main()
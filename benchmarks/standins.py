@@ -0,0 +1,224 @@
+"""Локальные заменители внешних сервисов для офлайн-бенчмарков.
+
+* make_fixtures — тестовые медиафайлы из FFmpeg lavfi: видео без звука (mp4/H.264),
+  оригинальный звук (m4a/AAC) и дорожка перевода (mp3).
+* MediaServer — HTTP-сервер с поддержкой Range, раздает файлы из папки и считает байты
+  (всего и по каждому файлу).
+* FakeTranslateServer — API перевода в формате protobuf из vot.py: первые `waits` запросов
+  по каждому видео отвечает "Waiting", затем "Ready" со ссылкой на дорожку перевода.
+* install_offline_ytdlp — yt-dlp, у которого вместо экстракторов YouTube один FixtureIE,
+  отдающий форматы с MediaServer: видео без звука в одном или нескольких качествах
+  и отдельную аудиодорожку.
+"""
+import http.server
+import os
+import re
+import subprocess
+import threading
+
+from ytrd import main, vot
+
+def ffmpeg(*args):
+    subprocess.run([main.get_binary_path('ffmpeg') or 'ffmpeg', '-v', 'error', '-y', *args], check=True)
+
+def make_fixtures(workdir, duration, height=360):
+    """Генерирует тестовые файлы длительностью duration секунд. Возвращает словарь путей."""
+    os.makedirs(workdir, exist_ok=True)
+    width = height * 16 // 9 // 2 * 2
+    paths = {
+        'video': os.path.join(workdir, f"video{height}.mp4"),
+        'audio': os.path.join(workdir, "audio.m4a"),
+        'translation': os.path.join(workdir, "translation.mp3"),
+    }
+    if not os.path.exists(paths['video']):
+        ffmpeg('-f', 'lavfi', '-i', f"testsrc2=size={width}x{height}:rate=25:duration={duration}",
+               '-c:v', 'libx264', '-preset', 'ultrafast', '-pix_fmt', 'yuv420p', '-g', '50',
+               '-movflags', '+faststart', paths['video'])
+    if not os.path.exists(paths['audio']):
+        ffmpeg('-f', 'lavfi', '-i', f"sine=frequency=440:sample_rate=48000:duration={duration}",
+               '-ac', '2', '-c:a', 'aac', '-b:a', '128k', paths['audio'])
+    if not os.path.exists(paths['translation']):
+        ffmpeg('-f', 'lavfi', '-i', f"sine=frequency=660:sample_rate=44100:duration={duration}",
+               '-c:a', 'libmp3lame', '-b:a', '128k', paths['translation'])
+    return paths
+
+class _Server:
+    """ThreadingHTTPServer в фоновом потоке на свободном порту 127.0.0.1."""
+
+    def __init__(self, handler):
+        self.httpd = http.server.ThreadingHTTPServer(('127.0.0.1', 0), handler)
+        self.httpd.owner = self
+        self.thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+
+    @property
+    def base_url(self):
+        return f"http://127.0.0.1:{self.httpd.server_address[1]}"
+
+    def start(self):
+        self.thread.start()
+        return self
+
+    def close(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+class _MediaHandler(http.server.BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, *args):
+        pass
+
+    def do_GET(self):
+        server = self.server.owner
+        path = os.path.join(server.root, os.path.basename(self.path.split('?')[0]))
+        if not os.path.isfile(path):
+            self.send_error(404)
+            return
+        size = os.path.getsize(path)
+        start, end = 0, size - 1
+        match = re.match(r'bytes=(\d*)-(\d*)$', self.headers.get('Range', ''))
+        if match and (match.group(1) or match.group(2)):
+            if match.group(1):
+                start = int(match.group(1))
+                end = min(int(match.group(2)), size - 1) if match.group(2) else size - 1
+            else:
+                start = max(0, size - int(match.group(2)))
+            if start >= size:
+                self.send_response(416)
+                self.send_header('Content-Range', f'bytes */{size}')
+                self.send_header('Content-Length', '0')
+                self.end_headers()
+                return
+            self.send_response(206)
+            self.send_header('Content-Range', f'bytes {start}-{end}/{size}')
+        else:
+            self.send_response(200)
+        length = end - start + 1
+        self.send_header('Accept-Ranges', 'bytes')
+        self.send_header('Content-Type', 'application/octet-stream')
+        self.send_header('Content-Length', str(length))
+        self.end_headers()
+        with open(path, 'rb') as f:
+            f.seek(start)
+            remaining = length
+            while remaining > 0:
+                chunk = f.read(min(remaining, 256 * 1024))
+                if not chunk:
+                    break
+                try:
+                    self.wfile.write(chunk)
+                except OSError:
+                    return
+                remaining -= len(chunk)
+                server.add_sent(os.path.basename(path), len(chunk))
+
+class MediaServer(_Server):
+    """Раздает файлы папки root по HTTP с поддержкой Range."""
+
+    def __init__(self, root):
+        super().__init__(_MediaHandler)
+        self.root = root
+        self.bytes_sent = 0
+        self.sent_by_file = {}
+        self._lock = threading.Lock()
+
+    def add_sent(self, name, n):
+        with self._lock:
+            self.bytes_sent += n
+            self.sent_by_file[name] = self.sent_by_file.get(name, 0) + n
+
+    def url(self, path):
+        return f"{self.base_url}/{os.path.basename(path)}"
+
+class _TranslateHandler(http.server.BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, *args):
+        pass
+
+    def do_POST(self):
+        server = self.server.owner
+        body = self.rfile.read(int(self.headers.get('Content-Length', 0)))
+        if self.headers.get('Vtrans-Signature') != vot.get_signature(body):
+            self.send_error(403)
+            return
+        request = vot.TRANSLATE_REQUEST.decode(body)
+        polls = server.count_poll(request.url)
+        if polls <= server.waits:
+            reply = {"status": 2, "remaining_time": server.remaining_time}
+        else:
+            reply = {"status": 1, "url": server.audio_url, "duration": request.duration}
+        data = bytes(vot.TRANSLATE_RESPONSE.encode(reply))
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/x-protobuf')
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+class FakeTranslateServer(_Server):
+    """API перевода: `waits` ответов "Waiting" на каждое видео, затем "Ready" с audio_url."""
+
+    def __init__(self, audio_url, waits=2, remaining_time=1):
+        super().__init__(_TranslateHandler)
+        self.audio_url = audio_url
+        self.waits = waits
+        self.remaining_time = remaining_time
+        self.polls = {}
+        self._lock = threading.Lock()
+
+    @property
+    def url(self):
+        return f"{self.base_url}/video-translation/translate"
+
+    def count_poll(self, url):
+        with self._lock:
+            self.polls[url] = self.polls.get(url, 0) + 1
+            return self.polls[url]
+
+def install_offline_ytdlp(media, fixtures, title="Fixture video", uploader="ytrd bench", duration=0, languages=None):
+    """Подменяет yt_dlp.YoutubeDL версией с единственным экстрактором FixtureIE.
+
+    Любая ссылка YouTube разрешается в локальные файлы fixtures, которые раздает media.
+    fixtures['videos'] (если есть) — несколько видео videoNNN.mp4 разной высоты, иначе одно fixtures['video'].
+    languages — язык видео по ID (по умолчанию 'en'), например 'ru' для пути без перевода.
+    """
+    languages = languages or {}
+    import yt_dlp
+    from yt_dlp.extractor.common import InfoExtractor
+
+    videos = fixtures.get('videos') or [fixtures['video']]
+    audio = fixtures['audio']
+    audio_ext = os.path.splitext(audio)[1][1:]
+
+    def video_format(video):
+        height = int(re.search(r'(\d+)\.mp4$', video).group(1))
+        return {'format_id': f'v{height}', 'url': media.url(video), 'ext': 'mp4',
+                'vcodec': 'avc1.64001e', 'acodec': 'none', 'height': height,
+                'width': height * 16 // 9, 'filesize': os.path.getsize(video)}
+
+    class FixtureIE(InfoExtractor):
+        IE_NAME = 'ytrd:fixture'
+        _VALID_URL = r'https?://(?:www\.|m\.)?(?:youtube\.com/(?:watch\?v=|shorts/)|youtu\.be/)(?P<id>[\w-]{11})'
+
+        def _real_extract(self, url):
+            video_id = self._match_id(url)
+            return {
+                'id': video_id,
+                'title': f"{title} {video_id}",
+                'uploader': uploader,
+                'duration': duration,
+                'language': languages.get(video_id, 'en'),
+                'formats': [
+                    *map(video_format, videos),
+                    {'format_id': 'a128', 'url': media.url(audio), 'ext': audio_ext,
+                     'vcodec': 'none', 'acodec': 'opus' if audio_ext == 'webm' else 'mp4a.40.2', 'abr': 128,
+                     'filesize': os.path.getsize(audio)},
+                ],
+            }
+
+    class OfflineYoutubeDL(yt_dlp.YoutubeDL):
+        def add_default_info_extractors(self):
+            self.add_info_extractor(FixtureIE())
+
+    yt_dlp.YoutubeDL = OfflineYoutubeDL
+    return OfflineYoutubeDL
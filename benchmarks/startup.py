@@ -0,0 +1,71 @@
+"""Регрессионный бенчмарк холодного старта `ytrd --version`.
+
+Запускает CLI в новом процессе несколько раз и сравнивает медиану с бюджетом.
+Дополнительно проверяет, что импорт ytrd.main не тянет yt_dlp, requests и tqdm.
+Завершается с кодом 1, если бюджет превышен или тяжелые модули импортируются заранее.
+
+    python benchmarks/startup.py [--budget 0.25] [--runs 10]
+"""
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+SRC = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src")
+HEAVY_MODULES = ("yt_dlp", "requests", "tqdm", "urllib3")
+
+VERSION_CODE = "import sys; sys.argv = ['ytrd', '--version']; from ytrd.main import entry_point; entry_point()"
+IMPORTS_CODE = ("import sys, ytrd.main; "
+                f"print(','.join(m for m in {HEAVY_MODULES!r} if m in sys.modules))")
+
+def run_python(code):
+    env = dict(os.environ)
+    env["PYTHONPATH"] = os.pathsep.join(filter(None, [SRC, env.get("PYTHONPATH")]))
+    return subprocess.run([sys.executable, "-c", code], env=env, capture_output=True, text=True)
+
+def measure(runs):
+    times = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        result = run_python(VERSION_CODE)
+        times.append(time.perf_counter() - start)
+        if result.returncode != 0:
+            sys.exit(f"ytrd --version завершился с кодом {result.returncode}:\n{result.stderr}")
+    return times
+
+def main():
+    parser = argparse.ArgumentParser(description="Бенчмарк холодного старта ytrd --version")
+    parser.add_argument("--budget", type=float, default=0.25, help="Допустимая медиана, сек (по умолчанию: 0.25)")
+    parser.add_argument("--runs", type=int, default=10, help="Число запусков (по умолчанию: 10)")
+    args = parser.parse_args()
+
+    # Голый интерпретатор — точка отсчета, чтобы видеть собственную стоимость ytrd
+    base_times = []
+    for _ in range(args.runs):
+        start = time.perf_counter()
+        run_python("pass")
+        base_times.append(time.perf_counter() - start)
+    baseline = statistics.median(base_times)
+
+    times = measure(args.runs)
+    median = statistics.median(times)
+    print(f"python -c pass:  {baseline * 1000:7.1f} мс (медиана)")
+    print(f"ytrd --version:  {median * 1000:7.1f} мс (медиана), мин {min(times) * 1000:.1f} мс, макс {max(times) * 1000:.1f} мс")
+    print(f"Бюджет:          {args.budget * 1000:7.1f} мс")
+
+    failed = False
+    loaded = run_python(IMPORTS_CODE).stdout.strip()
+    if loaded:
+        print(f"РЕГРЕССИЯ: import ytrd.main загружает тяжелые модули: {loaded}")
+        failed = True
+    if median > args.budget:
+        print("РЕГРЕССИЯ: холодный старт дольше бюджета")
+        failed = True
+    if failed:
+        sys.exit(1)
+    print("OK")
+
+if __name__ == "__main__":
+    main()
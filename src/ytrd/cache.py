@@ -0,0 +1,319 @@
+"""Локальные кэши между запусками.
+
+MetadataCache — нужные поля info-словаря yt-dlp (форматы, название, автор, длительность, язык)
+по ID видео. Повторный запуск для того же видео не делает сетевой анализ.
+TranslationStore — скачанные дорожки перевода (и недолго — ссылки на них) по ID видео
+и паре языков. Повторная обработка того же видео сразу переходит к сборке.
+MediaCache — скачанные исходные видео по ID видео и ID формата (включается явно).
+Пересборка в другом режиме (Mix/Dual) не качает гигабайты заново.
+"""
+import hashlib
+import json
+import os
+import sys
+import threading
+import time
+from pathlib import Path
+
+from .fileops import copy_file
+
+DEFAULT_INFO_TTL = 24 * 3600    # Сколько секунд запись метаданных считается свежей
+DEFAULT_INFO_ENTRIES = 1000     # Максимум записей метаданных на диске
+DEFAULT_TRANSLATION_BYTES = 500 * 1024 * 1024   # Бюджет места под дорожки перевода
+DEFAULT_TRANSLATION_URL_TTL = 600               # Сколько секунд доверять ссылке на аудио перевода
+FINGERPRINT_BLOCK = 1024 * 1024                 # Размер блока для отпечатка файла медиакэша
+
+# Поля info-словаря, которые нужны для анализа (ссылки на потоки не храним: они быстро протухают)
+INFO_FIELDS = ('id', 'title', 'uploader', 'duration', 'language')
+FORMAT_FIELDS = ('format_id', 'ext', 'height', 'width', 'vcodec', 'acodec', 'format_note', 'filesize', 'tbr')
+
+def get_cache_dir():
+    """Папка кэша: $YTRD_CACHE_DIR или стандартное место для ОС."""
+    env = os.environ.get("YTRD_CACHE_DIR")
+    if env:
+        return env
+    if sys.platform == "win32":
+        base = os.environ.get("LOCALAPPDATA") or str(Path.home() / "AppData" / "Local")
+        return os.path.join(base, "ytrd", "cache")
+    base = os.environ.get("XDG_CACHE_HOME") or str(Path.home() / ".cache")
+    return os.path.join(base, "ytrd")
+
+def _write_json_atomic(path, data):
+    tmp = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    with open(tmp, 'w', encoding='utf-8') as f:
+        json.dump(data, f, ensure_ascii=False)
+    os.replace(tmp, path)
+
+def trim_info(info):
+    """Оставляет из info-словаря только поля, нужные для анализа видео."""
+    data = {key: info.get(key) for key in INFO_FIELDS}
+    data['formats'] = [{key: f.get(key) for key in FORMAT_FIELDS if f.get(key) is not None}
+                       for f in info.get('formats') or []]
+    return data
+
+class MetadataCache:
+    """Кэш метаданных видео с TTL и ограничением числа записей (вытесняются самые старые)."""
+
+    def __init__(self, root=None, ttl=DEFAULT_INFO_TTL, max_entries=DEFAULT_INFO_ENTRIES):
+        self.root = os.path.join(root or get_cache_dir(), "info")
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+
+    @property
+    def enabled(self):
+        return bool(self.ttl) and self.ttl > 0
+
+    def _path(self, video_id):
+        return os.path.join(self.root, f"{video_id}.json")
+
+    def get(self, video_id):
+        """Возвращает сохраненные метаданные или None, если записи нет или она устарела."""
+        if not self.enabled or not video_id:
+            return None
+        path = self._path(video_id)
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                entry = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if time.time() - entry.get('saved_at', 0) > self.ttl:
+            try: os.remove(path)
+            except OSError: pass
+            return None
+        return entry.get('info')
+
+    def put(self, video_id, info):
+        """Сохраняет нужные поля info-словаря. Ошибки записи не критичны и игнорируются."""
+        if not self.enabled or not video_id:
+            return
+        try:
+            os.makedirs(self.root, exist_ok=True)
+            _write_json_atomic(self._path(video_id), {'saved_at': time.time(), 'info': trim_info(info)})
+            self._evict()
+        except OSError:
+            pass
+
+    def _evict(self):
+        with self._lock:
+            try:
+                entries = [e for e in os.scandir(self.root) if e.name.endswith('.json')]
+            except OSError:
+                return
+            excess = len(entries) - self.max_entries
+            if excess <= 0:
+                return
+            entries.sort(key=lambda e: e.stat().st_mtime)
+            for e in entries[:excess]:
+                try: os.remove(e.path)
+                except OSError: pass
+
+def evict_lru(paths, max_bytes):
+    """Удаляет самые давно использованные файлы (по mtime), пока суммарный размер больше max_bytes.
+
+    Возвращает список удаленных путей.
+    """
+    removed = []
+    entries = []
+    for path in paths:
+        try:
+            st = os.stat(path)
+        except OSError:
+            continue
+        entries.append((st.st_mtime, st.st_size, path))
+    total = sum(size for _, size, _ in entries)
+    for _, size, path in sorted(entries):
+        if total <= max_bytes:
+            break
+        try:
+            os.remove(path)
+            total -= size
+            removed.append(path)
+        except OSError:
+            pass
+    return removed
+
+def link_or_copy(src, dst):
+    """Кладет копию файла в dst: жесткой ссылкой, если возможно, иначе обычным копированием.
+
+    Жесткая ссылка годится только для рабочей папки: в папку сохранения такой файл
+    переносится копией (fileops.move_file), чтобы файл пользователя не был записью кэша.
+    """
+    try:
+        if os.path.exists(dst):
+            os.remove(dst)
+        os.link(src, dst)
+    except OSError:
+        # Другой раздел диска: клонирование блоков или копирование в ядре, если доступно
+        copy_file(src, dst)
+
+class TranslationStore:
+    """Хранилище дорожек перевода с LRU-вытеснением по бюджету байтов.
+
+    Ключ — ID видео и пара языков. Дополнительно хранит ссылку на аудио из ответа API
+    на url_ttl секунд, чтобы повторный запуск не ждал перевод заново, даже если файл не сохранен.
+    """
+
+    def __init__(self, root=None, max_bytes=DEFAULT_TRANSLATION_BYTES, url_ttl=DEFAULT_TRANSLATION_URL_TTL):
+        self.root = os.path.join(root or get_cache_dir(), "translations")
+        self.max_bytes = max_bytes
+        self.url_ttl = url_ttl
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def key(video_id, src="en", dst="ru"):
+        return hashlib.sha256(f"{video_id}:{src}:{dst}".encode('utf-8')).hexdigest()
+
+    def _audio_path(self, key):
+        return os.path.join(self.root, f"{key}.mp3")
+
+    def _url_path(self, key):
+        return os.path.join(self.root, f"{key}.url.json")
+
+    def get(self, video_id, src="en", dst="ru"):
+        """Возвращает путь к сохраненной дорожке или None."""
+        if not self.max_bytes or not video_id:
+            return None
+        path = self._audio_path(self.key(video_id, src, dst))
+        if not os.path.exists(path):
+            return None
+        try:
+            os.utime(path)  # Отмечаем использование для LRU
+        except OSError:
+            pass
+        return path
+
+    def put(self, video_id, file_path, src="en", dst="ru"):
+        """Сохраняет дорожку перевода. Ошибки записи не критичны и игнорируются."""
+        if not self.max_bytes or not video_id:
+            return
+        try:
+            os.makedirs(self.root, exist_ok=True)
+            path = self._audio_path(self.key(video_id, src, dst))
+            tmp = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+            copy_file(file_path, tmp)
+            os.replace(tmp, path)
+            with self._lock:
+                evict_lru([e.path for e in os.scandir(self.root) if e.name.endswith('.mp3')], self.max_bytes)
+        except OSError:
+            pass
+
+    def get_url(self, video_id, src="en", dst="ru"):
+        """Возвращает ссылку на аудио перевода, если она получена недавно."""
+        if not self.url_ttl or not video_id:
+            return None
+        try:
+            with open(self._url_path(self.key(video_id, src, dst)), 'r', encoding='utf-8') as f:
+                entry = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if time.time() - entry.get('saved_at', 0) > self.url_ttl:
+            return None
+        return entry.get('url')
+
+    def put_url(self, video_id, url, src="en", dst="ru"):
+        if not self.url_ttl or not video_id or not url:
+            return
+        try:
+            os.makedirs(self.root, exist_ok=True)
+            _write_json_atomic(self._url_path(self.key(video_id, src, dst)), {'saved_at': time.time(), 'url': url})
+        except OSError:
+            pass
+
+def fingerprint(path, block=FINGERPRINT_BLOCK):
+    """Быстрый отпечаток большого файла: SHA-256 от размера и блоков в начале, середине и конце."""
+    size = os.path.getsize(path)
+    h = hashlib.sha256(str(size).encode('ascii'))
+    with open(path, 'rb') as f:
+        for offset in sorted({0, max(0, size // 2 - block // 2), max(0, size - block)}):
+            f.seek(offset)
+            h.update(f.read(block))
+    return h.hexdigest()
+
+class MediaCache:
+    """Кэш скачанных исходных видео с ограничением размера, LRU-вытеснением и проверкой целостности.
+
+    Файлы попадают в кэш жесткой ссылкой (без копирования), если кэш на том же диске.
+    """
+
+    def __init__(self, root=None, max_bytes=0):
+        self.root = os.path.join(root or get_cache_dir(), "media")
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+
+    @property
+    def enabled(self):
+        return bool(self.max_bytes) and self.max_bytes > 0
+
+    def _base(self, video_id, format_id):
+        key = hashlib.sha256(f"{video_id}:{format_id}".encode('utf-8')).hexdigest()
+        return os.path.join(self.root, key)
+
+    def get(self, video_id, format_id, ext):
+        """Возвращает путь к проверенной копии или None. Поврежденная запись удаляется."""
+        if not self.enabled or not video_id or not format_id:
+            return None
+        base = self._base(video_id, format_id)
+        path = f"{base}.{ext}"
+        try:
+            with open(f"{base}.json", 'r', encoding='utf-8') as f:
+                manifest = json.load(f)
+            if os.path.getsize(path) != manifest.get('size') or fingerprint(path) != manifest.get('fingerprint'):
+                raise ValueError("fingerprint mismatch")
+        except (OSError, ValueError):
+            self._remove(base, path)
+            return None
+        try:
+            os.utime(path)  # Отмечаем использование для LRU
+        except OSError:
+            pass
+        return path
+
+    def put(self, video_id, format_id, file_path):
+        """Добавляет скачанный файл в кэш. Ошибки записи не критичны и игнорируются."""
+        if not self.enabled or not video_id or not format_id:
+            return
+        ext = os.path.splitext(file_path)[1].lstrip('.')
+        base = self._base(video_id, format_id)
+        path = f"{base}.{ext}"
+        try:
+            os.makedirs(self.root, exist_ok=True)
+            link_or_copy(file_path, path)
+            _write_json_atomic(f"{base}.json", {
+                'video_id': video_id,
+                'format_id': format_id,
+                'size': os.path.getsize(path),
+                'fingerprint': fingerprint(path),
+            })
+            with self._lock:
+                media = [e.path for e in os.scandir(self.root) if not e.name.endswith(('.json', '.tmp'))]
+                for removed in evict_lru(media, self.max_bytes):
+                    self._remove(os.path.splitext(removed)[0], removed)
+        except OSError:
+            pass
+
+    def _remove(self, base, path):
+        for p in (path, f"{base}.json"):
+            try: os.remove(p)
+            except OSError: pass
+
+_info_cache = MetadataCache()
+_translation_store = TranslationStore()
+_media_cache = MediaCache()
+
+def get_info_cache():
+    return _info_cache
+
+def get_translation_store():
+    return _translation_store
+
+def get_media_cache():
+    return _media_cache
+
+def configure(root=None, info_ttl=DEFAULT_INFO_TTL, translation_bytes=DEFAULT_TRANSLATION_BYTES,
+              translation_url_ttl=DEFAULT_TRANSLATION_URL_TTL, media_bytes=0):
+    """Настраивает кэши процесса (вызывается из CLI после разбора аргументов)."""
+    global _info_cache, _translation_store, _media_cache
+    _info_cache = MetadataCache(root, ttl=info_ttl)
+    _translation_store = TranslationStore(root, max_bytes=translation_bytes, url_ttl=translation_url_ttl)
+    _media_cache = MediaCache(root, max_bytes=media_bytes)
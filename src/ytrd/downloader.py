@@ -0,0 +1,165 @@
+"""Сегментированная докачиваемая загрузка файлов по HTTP.
+
+Файл делится на несколько диапазонов (HTTP Range), каждый качается в своем потоке
+в отдельный файл `<path>.partN`. После сбоя уже скачанные байты остаются на диске,
+и повторный вызов download() продолжает каждый сегмент с места обрыва.
+Чтение идет в большой переиспользуемый буфер, прогресс обновляется не чаще
+PROGRESS_INTERVAL секунд.
+"""
+import json
+import os
+import re
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+from urllib3.exceptions import HTTPError as Urllib3Error
+
+CHUNK_SIZE = 1024 * 1024            # Размер буфера чтения (1 МиБ)
+MIN_SEGMENT_SIZE = 2 * 1024 * 1024  # Меньшие файлы не делятся на сегменты
+SEGMENTS = 4
+PROGRESS_INTERVAL = 0.5
+
+class _Progress:
+    """Потокобезопасный счетчик байтов с редким вызовом колбэка."""
+
+    def __init__(self, total, done, callback):
+        self.total = total
+        self.done = done
+        self._callback = callback
+        self._lock = threading.Lock()
+        self._last = 0.0
+
+    def add(self, n):
+        with self._lock:
+            self.done += n
+            now = time.monotonic()
+            if self._callback and now - self._last >= PROGRESS_INTERVAL:
+                self._last = now
+                self._callback(self.total, self.done)
+
+    def flush(self):
+        if self._callback:
+            self._callback(self.total, self.done)
+
+class SegmentedDownloader:
+    """Качает файл несколькими параллельными Range-запросами с докачкой после сбоя."""
+
+    def __init__(self, session=None, segments=SEGMENTS, timeout=15, chunk_size=CHUNK_SIZE):
+        self.session = session or requests.Session()
+        self.segments = max(1, segments)
+        self.timeout = timeout
+        self.chunk_size = chunk_size
+
+    def probe(self, url):
+        """Возвращает (размер, поддерживает_ли_сервер_Range). Размер может быть 0, если неизвестен."""
+        headers = {"Range": "bytes=0-0", "Accept-Encoding": "identity"}
+        with self.session.get(url, headers=headers, stream=True, timeout=self.timeout) as r:
+            r.raise_for_status()
+            if r.status_code == 206:
+                match = re.search(r'/(\d+)$', r.headers.get('content-range', ''))
+                if match:
+                    return int(match.group(1)), True
+            return int(r.headers.get('content-length', 0)), False
+
+    def plan(self, size):
+        """Разбивает [0, size) на диапазоны (start, end) включительно."""
+        count = min(self.segments, max(1, size // MIN_SEGMENT_SIZE))
+        step = size // count
+        ranges = []
+        for i in range(count):
+            start = i * step
+            end = size - 1 if i == count - 1 else start + step - 1
+            ranges.append((start, end))
+        return ranges
+
+    def download(self, url, path, progress=None):
+        """Скачивает url в path. progress(total, done) вызывается по мере загрузки."""
+        size, ranged = self.probe(url)
+        if not size or not ranged:
+            return self._download_stream(url, path, size, progress)
+
+        ranges = self.plan(size)
+        parts = [f"{path}.part{i}" for i in range(len(ranges))]
+        manifest = f"{path}.parts.json"
+        self._check_manifest(manifest, size, len(ranges), parts)
+
+        done = sum(os.path.getsize(p) for p in parts if os.path.exists(p))
+        counter = _Progress(size, done, progress)
+        counter.flush()
+
+        with ThreadPoolExecutor(max_workers=len(ranges), thread_name_prefix="ytrd-segment") as pool:
+            futures = [pool.submit(self._fetch_range, url, part, start, end, counter)
+                       for part, (start, end) in zip(parts, ranges)]
+            for future in futures:
+                future.result()
+        counter.flush()
+
+        # Склеиваем сегменты в итоговый файл
+        with open(path, 'wb') as out:
+            for part in parts:
+                with open(part, 'rb') as f:
+                    self._copy(f, out)
+        for p in parts + [manifest]:
+            try: os.remove(p)
+            except OSError: pass
+        return size
+
+    def _check_manifest(self, manifest, size, count, parts):
+        """Сбрасывает сегменты от прошлой попытки, если они относятся к другому файлу или разбиению."""
+        state = {"size": size, "segments": count}
+        try:
+            with open(manifest, 'r', encoding='utf-8') as f:
+                if json.load(f) == state:
+                    return
+        except (OSError, ValueError):
+            pass
+        for p in parts:
+            try: os.remove(p)
+            except OSError: pass
+        with open(manifest, 'w', encoding='utf-8') as f:
+            json.dump(state, f)
+
+    def _fetch_range(self, url, part, start, end, counter):
+        length = end - start + 1
+        done = os.path.getsize(part) if os.path.exists(part) else 0
+        if done >= length:
+            return
+        headers = {"Range": f"bytes={start + done}-{end}", "Accept-Encoding": "identity"}
+        with self.session.get(url, headers=headers, stream=True, timeout=self.timeout) as r:
+            r.raise_for_status()
+            if r.status_code != 206:
+                raise requests.exceptions.RequestException("Сервер перестал поддерживать Range-запросы")
+            with open(part, 'ab') as f:
+                self._copy_response(r, f, counter)
+
+    def _download_stream(self, url, path, size, progress):
+        """Обычная загрузка одним потоком (сервер не поддерживает Range)."""
+        counter = _Progress(size, 0, progress)
+        with self.session.get(url, headers={"Accept-Encoding": "identity"}, stream=True, timeout=self.timeout) as r:
+            r.raise_for_status()
+            counter.total = int(r.headers.get('content-length', 0)) or size
+            with open(path, 'wb') as f:
+                self._copy_response(r, f, counter)
+        counter.flush()
+        return counter.done
+
+    def _copy_response(self, response, dst, counter):
+        # Обрыв соединения при чтении r.raw приходит исключением urllib3, а не requests
+        try:
+            self._copy(response.raw, dst, counter)
+        except Urllib3Error as e:
+            raise requests.exceptions.ConnectionError(e)
+
+    def _copy(self, src, dst, counter=None):
+        """Копирует поток через один переиспользуемый буфер."""
+        buf = bytearray(self.chunk_size)
+        view = memoryview(buf)
+        while True:
+            n = src.readinto(view)
+            if not n:
+                break
+            dst.write(view[:n])
+            if counter:
+                counter.add(n)
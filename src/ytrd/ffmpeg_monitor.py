@@ -0,0 +1,120 @@
+"""Чтение прогресса FFmpeg (`-progress pipe:1`) в отдельном потоке.
+
+Поток блокируется на чтении вывода FFmpeg и не крутит процессор в ожидании. Блоки
+key=value собираются в события ProgressEvent и раздаются подписчикам (прогресс-бар,
+статистика пакета). Остальные строки (сообщения об ошибках) хранятся в кольцевом буфере
+последних LOG_LINES строк.
+"""
+import threading
+from collections import deque
+from dataclasses import dataclass
+from typing import Optional
+
+LOG_LINES = 20  # Сколько последних строк лога FFmpeg хранить для вывода при ошибке
+
+# Ключи, которые FFmpeg пишет в блок прогресса (плюс stream_N_M_q)
+PROGRESS_KEYS = {
+    'frame', 'fps', 'bitrate', 'total_size', 'out_time_us', 'out_time_ms', 'out_time',
+    'dup_frames', 'drop_frames', 'speed', 'progress',
+}
+
+@dataclass
+class ProgressEvent:
+    out_time: float = 0.0               # Обработано секунд выходного файла
+    speed: Optional[float] = None       # Скорость относительно реального времени (2.5 = x2.5)
+    fps: Optional[float] = None
+    bitrate: Optional[float] = None     # кбит/с
+    total_size: Optional[int] = None    # Байт записано в выходной файл
+    frame: Optional[int] = None
+    finished: bool = False              # Последний блок (progress=end)
+
+def _number(value, cast=float, suffix=""):
+    """Число из значения FFmpeg ('N/A', '1.5x', '1234.5kbits/s') или None."""
+    if value is None:
+        return None
+    value = value.strip()
+    if suffix and value.endswith(suffix):
+        value = value[:-len(suffix)]
+    try:
+        return cast(value)
+    except ValueError:
+        return None
+
+def _parse_clock(value):
+    """'00:01:05.250000' -> 65.25"""
+    try:
+        h, m, s = value.strip().split(':')
+        return int(h) * 3600 + int(m) * 60 + float(s)
+    except (AttributeError, ValueError):
+        return None
+
+def parse_progress(fields):
+    """Собирает ProgressEvent из словаря key=value одного блока прогресса."""
+    out_time = None
+    # out_time_ms у FFmpeg тоже в микросекундах (историческая ошибка в названии)
+    for key in ('out_time_us', 'out_time_ms'):
+        us = _number(fields.get(key), int)
+        if us is not None and us >= 0:
+            out_time = us / 1_000_000
+            break
+    if out_time is None:
+        out_time = _parse_clock(fields.get('out_time')) or 0.0
+    return ProgressEvent(
+        out_time=max(0.0, out_time),
+        speed=_number(fields.get('speed'), float, "x"),
+        fps=_number(fields.get('fps')),
+        bitrate=_number(fields.get('bitrate'), float, "kbits/s"),
+        total_size=_number(fields.get('total_size'), int),
+        frame=_number(fields.get('frame'), int),
+        finished=fields.get('progress') == 'end',
+    )
+
+class FFmpegMonitor:
+    """Следит за выводом запущенного процесса FFmpeg (stdout вместе с stderr, текстовый режим)."""
+
+    def __init__(self, proc, log_lines=LOG_LINES):
+        self.proc = proc
+        self.log = deque(maxlen=log_lines)
+        self.last = None  # Последнее событие прогресса
+        self._subscribers = []
+        self._thread = threading.Thread(target=self._read, name="ytrd-ffmpeg-monitor", daemon=True)
+
+    def subscribe(self, callback):
+        """Добавляет подписчика: callback(ProgressEvent) вызывается из потока монитора."""
+        self._subscribers.append(callback)
+        return callback
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def wait(self):
+        """Ждет завершения FFmpeg и чтения всего вывода. Возвращает код возврата."""
+        rc = self.proc.wait()
+        self._thread.join()
+        return rc
+
+    def _read(self):
+        fields = {}
+        # Итерация по файлу блокируется до следующей строки и заканчивается на EOF
+        for line in self.proc.stdout:
+            line = line.strip()
+            if not line:
+                continue
+            key, sep, value = line.partition('=')
+            if sep and (key in PROGRESS_KEYS or key.startswith('stream_')):
+                fields[key] = value
+                if key == 'progress':
+                    self._emit(parse_progress(fields))
+                    fields = {}
+            else:
+                self.log.append(line)
+
+    def _emit(self, event):
+        self.last = event
+        for callback in self._subscribers:
+            try:
+                callback(event)
+            except Exception:
+                # Ошибка подписчика не должна останавливать чтение: иначе FFmpeg встанет на полном буфере
+                pass
@@ -0,0 +1,91 @@
+"""Перемещение и копирование готовых файлов без лишнего копирования данных.
+
+move_file сначала пробует атомарное переименование: на том же разделе диска данные
+не копируются вовсе (кроме файлов с жесткими ссылками из кэша). Между разделами файл копируется во временный файл рядом с dst
+и затем переименовывается, поэтому в папке назначения не бывает недописанных файлов.
+Для копирования пробуются по очереди: клонирование блоков (reflink: Btrfs, XFS и др.),
+os.copy_file_range (копирование внутри ядра) и обычное буферизованное копирование.
+"""
+import errno
+import os
+import shutil
+import sys
+
+FICLONE = 0x40049409            # ioctl клонирования файла в Linux
+COPY_CHUNK = 64 * 1024 * 1024   # Байт за один вызов copy_file_range
+BUFFER_SIZE = 1024 * 1024       # Буфер обычного копирования
+
+# Ошибки, после которых copy_file_range просто не подходит для этой пары файлов
+_RANGE_UNSUPPORTED = {errno.EXDEV, errno.ENOSYS, errno.EINVAL, errno.EOPNOTSUPP, errno.EPERM, errno.EBADF}
+
+def _reflink(src_fd, dst_fd):
+    if not sys.platform.startswith('linux'):
+        return False
+    try:
+        import fcntl
+        fcntl.ioctl(dst_fd, FICLONE, src_fd)
+        return True
+    except (ImportError, OSError):
+        return False
+
+def _copy_file_range(src_fd, dst_fd, size):
+    if not hasattr(os, 'copy_file_range'):
+        return False
+    copied = 0
+    try:
+        while copied < size:
+            n = os.copy_file_range(src_fd, dst_fd, min(COPY_CHUNK, size - copied))
+            if n == 0:
+                break
+            copied += n
+    except OSError as e:
+        if copied == 0 and e.errno in _RANGE_UNSUPPORTED:
+            return False
+        raise
+    return copied == size
+
+def copy_file(src, dst):
+    """Копирует содержимое src в dst. Возвращает способ: 'reflink', 'copy_file_range' или 'copy'."""
+    with open(src, 'rb') as fsrc, open(dst, 'wb') as fdst:
+        size = os.fstat(fsrc.fileno()).st_size
+        if _reflink(fsrc.fileno(), fdst.fileno()):
+            return 'reflink'
+        if _copy_file_range(fsrc.fileno(), fdst.fileno(), size):
+            return 'copy_file_range'
+        # Начинаем заново: copy_file_range мог успеть скопировать часть
+        fsrc.seek(0)
+        fdst.seek(0)
+        fdst.truncate()
+        shutil.copyfileobj(fsrc, fdst, BUFFER_SIZE)
+        return 'copy'
+
+def move_file(src, dst):
+    """Перемещает src в dst (существующий dst заменяется).
+
+    Возвращает способ: 'rename' (данные не копировались) или способ копирования из copy_file.
+    Файл, у которого есть другие жесткие ссылки (например, запись кэша), копируется:
+    иначе dst и кэш останутся одним файлом, и правка одного незаметно изменит другой.
+    """
+    if os.stat(src).st_nlink <= 1:
+        try:
+            os.replace(src, dst)
+            return 'rename'
+        except OSError as e:
+            if e.errno != errno.EXDEV:
+                raise
+    tmp = os.path.join(os.path.dirname(os.path.abspath(dst)), f".{os.path.basename(dst)}.ytrd-tmp")
+    try:
+        method = copy_file(src, tmp)
+        shutil.copymode(src, tmp)
+        os.replace(tmp, dst)
+    except BaseException:
+        try:
+            os.remove(tmp)
+        except OSError:
+            pass
+        raise
+    try:
+        os.remove(src)
+    except OSError:
+        pass
+    return method
@@ -0,0 +1,45 @@
+"""Отложенный импорт тяжелых зависимостей.
+
+yt_dlp, requests и tqdm импортируются только при первом обращении к ним, поэтому
+`ytrd --version`, `--help` и ошибки в аргументах не платят за их загрузку
+(особенно заметно на Termux).
+"""
+import importlib
+
+class LazyModule:
+    """Модуль, который импортируется при первом обращении к любому его атрибуту."""
+
+    def __init__(self, name):
+        self._name = name
+        self._module = None
+
+    def _load(self):
+        if self._module is None:
+            self._module = importlib.import_module(self._name)
+        return self._module
+
+    def __getattr__(self, attr):
+        return getattr(self._load(), attr)
+
+    def __repr__(self):
+        state = "loaded" if self._module is not None else "not loaded"
+        return f"<lazy module '{self._name}' ({state})>"
+
+class LazyObject:
+    """Объект из модуля (например, класс tqdm.tqdm), импортируемый при первом вызове или обращении."""
+
+    def __init__(self, module_name, attr):
+        self._module = LazyModule(module_name)
+        self._attr = attr
+
+    def _load(self):
+        return getattr(self._module, self._attr)
+
+    def __call__(self, *args, **kwargs):
+        return self._load()(*args, **kwargs)
+
+    def __getattr__(self, attr):
+        return getattr(self._load(), attr)
+
+def lazy_import(name):
+    return LazyModule(name)
@@ -3,21 +3,34 @@ import subprocess
 import sys
 import shutil
 import re
-import requests
 import argparse
 import json
-import yt_dlp
+import copy
 import socket
 import shlex
 import functools
+import itertools
 import time
 import glob
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
 from . import vot
-from tqdm import tqdm
+from . import cache
+from . import metrics
+from .workspace import Workspace, default_work_dir, reclaim_stale
+from .fileops import move_file
+from .retry import RetryPolicy, is_permanent
+from .ffmpeg_monitor import FFmpegMonitor
+from .lazy import lazy_import, LazyObject
 from pathlib import Path
 from ytrd import __version__
 import platform
 
+# Тяжелые зависимости импортируются при первом использовании (быстрый --version/--help)
+requests = lazy_import("requests")
+yt_dlp = lazy_import("yt_dlp")
+tqdm = LazyObject("tqdm", "tqdm")
+
 # --- НАСТРОЙКИ ---
 def get_default_output_dir():
     """Возвращает путь к папке загрузок в зависимости от ОС."""
@@ -31,8 +44,6 @@ def get_default_output_dir():
     return str(Path.home() / "Downloads")
 
 OUTPUT_DIR = get_default_output_dir()
-TEMP_VIDEO = "temp_video.mp4"
-TEMP_AUDIO = "temp_audio.mp3"
 TERMUX_PREFIX = "/data/data/com.termux/files/usr"
 TERMUX_BIN = os.path.join(TERMUX_PREFIX, "bin")
 
@@ -46,14 +57,33 @@ YELLOW = "\033[93m"
 RED = "\033[91m"
 RESET = "\033[0m"
 
+STREAM_CHUNK_SIZE = 256 * 1024
+
 CLEAN_BAR = "{l_bar}{bar}| {n_fmt}/{total_fmt} [{rate_fmt}]"
 
-def ask_to_retry(error_message):
-    """Выводит сообщение об ошибке и спрашивает пользователя о повторной попытке."""
-    print(f"\n{RED}❌ {error_message}{RESET}")
+# Раскладка MP4: где лежит индекс (moov) и сколько раз пишется файл. Для MKV не применяется.
+MP4_LAYOUTS = ('reserve', 'faststart', 'fragmented', 'none')
+MP4_LAYOUT = 'reserve'
+MOOV_BYTES_PER_SAMPLE = 16      # Запас индекса на один кадр (размер, время, смещение, порядок)
+MOOV_MAX_FPS = 60               # Частота кадров видео, под которую резервируется индекс
+AAC_FRAMES_PER_SEC = 48000 / 1024
+
+# Оригинальное аудио в режиме "Только аудио": copy — исходная дорожка без перекодирования
+AUDIO_FORMATS = ('copy', 'mp3')
+AUDIO_FORMAT = 'copy'
+AUDIO_SELECTOR = 'bestaudio/best'
+AUDIO_CONTAINERS = ('m4a', 'mp3', 'opus', 'ogg', 'flac', 'wav')
+# Контейнер для кодека дорожки при копировании потока (как у FFmpegExtractAudioPP в yt-dlp)
+COPY_EXTENSIONS = {'mp4a': 'm4a', 'aac': 'm4a', 'opus': 'opus', 'vorbis': 'ogg', 'mp3': 'mp3', 'flac': 'flac'}
+
+# Политика повторов после ошибок. Настраивается из CLI; по умолчанию вопросов пользователю не задает.
+RETRY_POLICY = RetryPolicy()
+
+def prompt_retry(question):
+    """Спрашивает пользователя о повторной попытке."""
     while True:
         try:
-            choice = input(f"{YELLOW}Попробовать снова? (y/n): {RESET}").lower().strip()
+            choice = input(f"{YELLOW}{question} (y/n): {RESET}").lower().strip()
             if choice in ('y', 'yes', 'д', 'да'):
                 return True
             if choice in ('n', 'no', 'н', 'нет'):
@@ -61,6 +91,39 @@ def ask_to_retry(error_message):
         except (KeyboardInterrupt, EOFError):
             return False
 
+def ask_to_retry(error_message, attempt=1, started=None):
+    """Выводит сообщение об ошибке и решает, повторять ли попытку.
+
+    По умолчанию решение принимает RETRY_POLICY (пауза с backoff перед повтором),
+    вопрос пользователю задается только в режиме --ask-retry.
+    """
+    print(f"\n{RED}❌ {error_message}{RESET}")
+    if RETRY_POLICY.interactive:
+        retry = prompt_retry("Попробовать снова?")
+        if retry:
+            metrics.add(retries=1)
+        return retry
+
+    delay = RETRY_POLICY.next_delay(attempt, started if started is not None else time.monotonic())
+    if delay is None:
+        print(f"{RED}Попытки исчерпаны ({attempt}/{RETRY_POLICY.max_attempts}).{RESET}")
+        return False
+    print(f"{YELLOW}Повтор {attempt + 1}/{RETRY_POLICY.max_attempts} через {delay:.0f} с...{RESET}")
+    metrics.add(retries=1)
+    time.sleep(delay)
+    return True
+
+def ask_to_restart(error_message, restarts):
+    """Решает, начинать ли загрузку заново после ошибки, которую простым повтором не исправить."""
+    print(f"\n{RED}❌ Критическая ошибка файла ({error_message}).{RESET}")
+    if RETRY_POLICY.interactive:
+        restart = prompt_retry("Очистить временные файлы и скачать заново?")
+    else:
+        restart = restarts < RETRY_POLICY.permanent_restarts
+    if restart:
+        metrics.add(retries=1)
+    return restart
+
 def ask_yes_no(question):
     """Задает вопрос и ждет ответа y/n."""
     while True:
@@ -77,13 +140,16 @@ def retry_on_network_error(func):
     """Декоратор для повторных попыток выполнения функции при сетевых ошибках."""
     @functools.wraps(func)
     def wrapper(*args, **kwargs):
+        started = time.monotonic()
+        attempt = 0
         while True:
+            attempt += 1
             try:
                 return func(*args, **kwargs)
             except (OSError, requests.exceptions.RequestException, yt_dlp.utils.DownloadError) as e:
                 error_msg = getattr(e, 'msg', str(e))
-                if not ask_to_retry(f"Сетевая ошибка в '{func.__name__}': {error_msg}"):
-                    print(f"{RED}Завершение работы по требованию пользователя.{RESET}")
+                if not ask_to_retry(f"Сетевая ошибка в '{func.__name__}': {error_msg}", attempt, started):
+                    print(f"{RED}Завершение работы.{RESET}")
                     cleanup(True)
                     sys.exit(1)
     return wrapper
@@ -92,13 +158,21 @@ def retry_on_network_error(func):
 def check_internet():
     """Проверяет наличие интернет-соединения."""
     # Декоратор обработает исключение OSError
-    socket.create_connection(("8.8.8.8", 53), timeout=5)
+    socket.create_connection(("8.8.8.8", 53), timeout=5).close()
+
+def check_connection():
+    try:
+        check_internet()
+    except Exception as e:
+        print(f"{RED}❌ Ошибка подключения: {e}{RESET}")
+        sys.exit(1)
 
 def check_write_permissions(path):
-    # Если папка не существует, пробуем создать
+    # Если папка не существует, пробуем создать. exist_ok: проверка идет в фоне,
+    # а основной поток в это же время создает в папке сохранения рабочую папку задания.
     if not os.path.exists(path):
         try:
-            os.makedirs(path)
+            os.makedirs(path, exist_ok=True)
         except OSError as e:
             print(f"{RED}❌ Не удалось создать папку {path}: {e}{RESET}")
             sys.exit(1)
@@ -112,47 +186,87 @@ def validate_url(url):
         print(f"{RED}❌ Ссылка не похожа на YouTube.{RESET}")
         sys.exit(1)
 
+@functools.lru_cache(maxsize=None)
 def get_binary_path(tool_name):
+    # Результат кэшируется на весь процесс: PATH во время работы не меняется
     path = shutil.which(tool_name)
     if path: return path
     termux_path = os.path.join(TERMUX_BIN, tool_name)
     if os.path.exists(termux_path): return termux_path
     return None
 
+@functools.lru_cache(maxsize=None)
+def get_tool_version(tool_name):
+    """Первая строка `<tool> -version` (один запуск на процесс) или None, если утилита не запускается."""
+    path = get_binary_path(tool_name)
+    if path is None:
+        return None
+    try:
+        result = subprocess.run([path, "-version"], capture_output=True, text=True, timeout=15)
+    except (OSError, subprocess.SubprocessError):
+        return None
+    if result.returncode != 0:
+        return None
+    return (result.stdout.splitlines() or [""])[0]
+
 def install_check():
     required = ['ffmpeg']
     for tool in required:
         if get_binary_path(tool) is None:
             print(f"{RED}❌ Не найден: {tool}{RESET}")
             sys.exit(1)
+        if get_tool_version(tool) is None:
+            print(f"{RED}❌ Не запускается: {get_binary_path(tool)}{RESET}")
+            sys.exit(1)
+
+def start_preflight(args):
+    """Запускает проверки окружения в фоне, чтобы анализ видео начинался сразу.
+
+    Возвращает список futures; ошибки проверок проявятся в finish_preflight().
+    """
+    checks = [install_check, functools.partial(check_write_permissions, args.output)]
+    if not args.skip_net_check:
+        checks.append(check_connection)
+    pool = ThreadPoolExecutor(max_workers=len(checks), thread_name_prefix="ytrd-preflight")
+    futures = [pool.submit(check) for check in checks]
+    pool.shutdown(wait=False)
+    return futures
+
+def finish_preflight(futures):
+    """Дожидается фоновых проверок. Проверка, завершившаяся sys.exit, завершает программу здесь."""
+    for future in futures:
+        future.result()
+
+# Рабочая папка текущего задания (одиночный режим). Временные файлы живут только в ней.
+CURRENT_WORKSPACE = None
+KEEP_TEMP = False  # --keep-temp: оставлять рабочую папку после ошибки
+TRANSLATION_STOP = None  # Флаг остановки фонового ожидания перевода (см. start_translation)
 
 def cleanup(error=False):
-    # Если произошла ошибка, не удаляем файлы для отладки
-    if error:
-        #print(f"{YELLOW}⚠️ Временные файлы оставлены для проверки: {TEMP_VIDEO}, {TEMP_AUDIO}{RESET}")
+    # Фоновое ожидание перевода больше не нужно (выход по ошибке, Ctrl+C или конец задания)
+    if TRANSLATION_STOP is not None:
+        TRANSLATION_STOP.set()
+    if CURRENT_WORKSPACE is None:
         return
-    try:
-        # Удаляем все временные файлы видео и аудио
-        for f in glob.glob("temp_video*"):
-            try: os.remove(f)
-            except OSError: pass
-            
-        for f in glob.glob("temp_audio*"):
-            try: os.remove(f)
-            except OSError: pass
-    except Exception: pass
+    # С --keep-temp после ошибки файлы остаются для проверки
+    if error and KEEP_TEMP:
+        print(f"{YELLOW}⚠️ Временные файлы оставлены для проверки: {CURRENT_WORKSPACE.path}{RESET}")
+        CURRENT_WORKSPACE.release()
+        return
+    # Удаляем только рабочую папку своего задания: другие процессы ytrd не затрагиваются
+    CURRENT_WORKSPACE.cleanup()
 
-def clean_video_partials():
-    """Удаляет все временные файлы видео (но оставляет аудио перевода)."""
-    try:
-        # Удаляем temp_video.* (mp4, mkv, .part и т.д.)
-        for f in glob.glob("temp_video*"):
-            # Не трогаем перевод (temp_audio.mp3)
-            if "temp_audio" in f: continue
-            try:
-                os.remove(f)
-            except OSError: pass
-    except Exception: pass
+def clean_video_partials(video_path):
+    """Удаляет все временные файлы видео задания (но оставляет аудио перевода)."""
+    # Удаляем video.* (mp4, mkv, .part и т.д.) рядом с путем видео
+    for f in glob.glob(glob.escape(os.path.splitext(video_path)[0]) + "*"):
+        try:
+            os.remove(f)
+        except OSError: pass
+
+def is_russian(language):
+    """Проверяет, что язык видео определен как русский."""
+    return bool(language) and (language.startswith('ru') or language == 'Russian')
 
 def clean_name(name):
     if not name: return "Video_Dubbed"
@@ -164,28 +278,115 @@ class Logger:
     def warning(self, msg): pass
     def error(self, msg): print(f"{RED}{msg}{RESET}")
 
+class JobCancelled(Exception):
+    """Задание отменено (ytrd serve): текущая стадия прервана."""
+
+class VideoSession:
+    """Один экземпляр YoutubeDL и один info-словарь на всё задание.
+
+    Видео анализируется один раз (extract_info без выбора формата), а стадии загрузки
+    выбирают формат и скачивают по уже полученному словарю через process_ie_result,
+    без повторных запросов к экстрактору и плееру YouTube.
+    cancel (threading.Event) прерывает идущую загрузку: yt-dlp получает DownloadCancelled.
+    """
+
+    def __init__(self, url, cancel=None):
+        self.url = url
+        self.cancel = cancel
+        self.info = None
+        self.progress_hook = None
+        self._ydl = None
+        self._selectors = {}
+
+    @property
+    def ydl(self):
+        if self._ydl is None:
+            self._ydl = yt_dlp.YoutubeDL({
+                'quiet': True,
+                'no_warnings': True,
+                'logger': Logger(),
+                'progress_hooks': [self._on_progress],
+                # Важно: nopart=True предотвращает создание .part файлов.
+                # Это критично для Windows, так как переименование .part файла может вызвать ошибку доступа (WinError 32),
+                # если файл всё еще удерживается антивирусом или системой.
+                'nopart': True,
+                'ffmpeg_location': get_binary_path('ffmpeg') or 'ffmpeg',
+                'retries': 10,
+                'fragment_retries': 10,
+                'retry_sleep': 5,
+            })
+        return self._ydl
+
+    def _on_progress(self, d):
+        if self.cancel is not None and self.cancel.is_set():
+            raise yt_dlp.utils.DownloadCancelled("задание отменено")
+        if self.progress_hook:
+            self.progress_hook(d)
+
+    def extract(self):
+        """Возвращает info-словарь видео; сетевой анализ выполняется только при первом вызове."""
+        if self.info is None:
+            self.info = self.ydl.extract_info(self.url, download=False, process=False)
+        return self.info
+
+    def process(self, download, progress_hook=None, outtmpl=None, **params):
+        """Выбирает формат (и скачивает, если download=True) по уже полученному info-словарю."""
+        ydl = self.ydl
+        fmt = params.pop('format', None)
+        ydl.params.update(params)
+        # yt-dlp компилирует params['format'] один раз в __init__ и потом его не читает,
+        # поэтому селектор выставляется на каждый вызов (None — формат yt-dlp по умолчанию)
+        if fmt and fmt not in self._selectors:
+            self._selectors[fmt] = ydl.build_format_selector(fmt)
+        ydl.format_selector = self._selectors.get(fmt)
+        if outtmpl:
+            ydl.params['outtmpl']['default'] = outtmpl
+        self.progress_hook = progress_hook
+        try:
+            # process_ie_result дописывает поля в словарь, поэтому работаем с копией
+            return ydl.process_ie_result(copy.deepcopy(self.extract()), download=download)
+        finally:
+            self.progress_hook = None
+
+    def close(self):
+        if self._ydl is not None:
+            self._ydl.close()
+            self._ydl = None
+            self._selectors = {}
+
+def summarize_info(info):
+    """Извлекает из info-словаря доступные разрешения, название, автора, длительность и язык."""
+    formats = info.get('formats', [])
+    heights = set()
+    for f in formats:
+        h = f.get('height')
+        if h and h > 144:
+            # Фильтруем раскадровки и не-видео форматы
+            vcodec = f.get('vcodec')
+            if vcodec == 'none': continue 
+            if 'storyboard' in (f.get('format_note') or ''): continue
+            
+            heights.add(h)
+    return sorted(list(heights), reverse=True), info.get('title', 'Video'), info.get('uploader', 'Unknown'), info.get('duration', 0), info.get('language')
+
+@metrics.timed("analysis")
 @retry_on_network_error
-def get_available_qualities(url):
+def get_available_qualities(url, session=None):
     """Получает доступные разрешения видео, его название и автора."""
+    info_cache = cache.get_info_cache()
+    video_id = vot.get_video_id(url)
+    info = info_cache.get(video_id)
+    if info is not None:
+        return summarize_info(info)
+
     print(f"{YELLOW}Анализ...{RESET}")
-    opts = {'quiet': True, 'no_warnings': True, 'logger': Logger()}
-    with yt_dlp.YoutubeDL(opts) as ydl:
-        info = ydl.extract_info(url, download=False)
-        formats = info.get('formats', [])
-        heights = set()
-        for f in formats:
-            h = f.get('height')
-            if h and h > 144:
-                # Фильтруем раскадровки и не-видео форматы
-                vcodec = f.get('vcodec')
-                if vcodec == 'none': continue 
-                if 'storyboard' in (f.get('format_note') or ''): continue
-                
-                heights.add(h)
-        return sorted(list(heights), reverse=True), info.get('title', 'Video'), info.get('uploader', 'Unknown'), info.get('duration', 0), info.get('language')
-
-def download_video(url, path, quality_height=None):
-    """Скачивает видео с YouTube с помощью yt-dlp с логикой повтора."""
+    session = session or VideoSession(url)
+    info = session.extract()
+    info_cache.put(video_id or info.get('id'), info)
+    return summarize_info(info)
+
+def select_format(quality_height=None):
+    """Возвращает строку выбора формата yt-dlp и контейнер ('mp4' или 'mkv') для качества."""
     # Определяем порог для High-Res (всё, что выше 1080p, считаем High-Res)
     is_high_res = quality_height and quality_height > 1080
     
@@ -194,8 +395,6 @@ def download_video(url, path, quality_height=None):
         # Убираем ограничение ext=mp4 для видео
         fmt_str = f'bestvideo[height={quality_height}]+bestaudio[ext=m4a]/best[height={quality_height}]/best'
         ext = 'mkv'
-        # Явно меняем расширение пути, чтобы yt-dlp не создал temp_video.mp4.mkv
-        path = os.path.splitext(path)[0] + '.mkv'
     elif quality_height:
         # Для 1080p и ниже стараемся брать MP4 (H.264) для совместимости.
         # Format 397 (AV1) в MP4 может вызывать ошибки постпроцессинга на старых ffmpeg.
@@ -212,10 +411,71 @@ def download_video(url, path, quality_height=None):
         # По умолчанию тоже стараемся avc, если это mp4
         fmt_str = 'bestvideo[ext=mp4][vcodec^=avc]+bestaudio[ext=m4a]/bestvideo[ext=mp4]+bestaudio[ext=m4a]/best[ext=mp4]/best'
         ext = 'mp4'
+    return fmt_str, ext
+
+@retry_on_network_error
+def resolve_source_streams(url, quality_height=None, session=None):
+    """Находит прямые ссылки на выбранные потоки видео и аудио без скачивания.
+
+    Возвращает словарь с video_url, audio_url (None, если формат содержит и видео, и звук),
+    http-заголовками, контейнером и высотой кадра. None — если потоки нельзя читать напрямую
+    (например, DASH/HLS из фрагментов), тогда видео нужно скачивать обычным способом.
+    None и для форматов, которые yt-dlp качает частями (http_chunk_size, так у YouTube):
+    одним запросом на весь файл сервер такие потоки сильно ограничивает по скорости.
+    """
+    fmt_str, ext = select_format(quality_height)
+    session = session or VideoSession(url)
+    info = session.process(download=False, format=fmt_str)
+
+    formats = info.get('requested_formats') or [info]
+    for f in formats:
+        if f.get('protocol') not in ('http', 'https') or not f.get('url'):
+            return None
+        if (f.get('downloader_options') or {}).get('http_chunk_size'):
+            return None
+
+    video = formats[0]
+    audio = formats[1] if len(formats) > 1 else None
+    return {
+        'video_url': video['url'],
+        'audio_url': audio['url'] if audio else None,
+        'headers': video.get('http_headers') or {},
+        'ext': ext,
+        'height': info.get('height') or video.get('height') or 0,
+    }
+
+@retry_on_network_error
+def select_video_format(session, fmt_str, ext):
+    """Выбирает формат по info-словарю задания, ничего не скачивая."""
+    return session.process(download=False, format=fmt_str, merge_output_format=ext)
+
+@metrics.timed("video_download")
+def download_video(url, path, quality_height=None, session=None):
+    """Скачивает видео с YouTube с помощью yt-dlp с логикой повтора."""
+    session = session or VideoSession(url)
+    fmt_str, ext = select_format(quality_height)
+    if ext == 'mkv':
+        # Явно меняем расширение пути, чтобы yt-dlp не создал temp_video.mp4.mkv
+        path = os.path.splitext(path)[0] + '.mkv'
+
+    # Кэш исходников (если включен): то же видео в том же формате не качаем повторно
+    media_cache = cache.get_media_cache()
+    video_id = vot.get_video_id(url)
+    if media_cache.enabled:
+        selected = select_video_format(session, fmt_str, ext)
+        cached = media_cache.get(video_id, selected.get('format_id'), ext)
+        if cached:
+            cache.link_or_copy(cached, path)
+            print(f"{GREEN}✅ Видео взято из кэша.{RESET}")
+            return selected.get('duration', 0), selected.get('height', 0), path
 
     pbar = None
+    started = time.monotonic()
+    attempt = 0
+    restarts = 0
     
     while True:
+        attempt += 1
         try:
             pbar = tqdm(total=0, unit='B', unit_scale=True, unit_divisor=1024, 
                         desc=f"[{quality_height if quality_height else 'Best'}p]", 
@@ -235,30 +495,13 @@ def download_video(url, path, quality_height=None):
                         pbar.n = pbar.total
                         pbar.refresh()
 
-            opts = {
-                'format': fmt_str,
-                'outtmpl': path,
-                'quiet': True,
-                'no_warnings': True,
-                'logger': Logger(),
-                'progress_hooks': [hook],
-                'merge_output_format': ext,
-                # Важно: nopart=True предотвращает создание .part файлов.
-                # Это критично для Windows, так как переименование .part файла может вызвать ошибку доступа (WinError 32),
-                # если файл всё еще удерживается антивирусом или системой.
-                'nopart': True,
-                'nopart': True,
-                'ffmpeg_location': get_binary_path('ffmpeg') or 'ffmpeg',
-                'retries': 10,
-                'fragment_retries': 10,
-                'retry_sleep': 5,
-            }
-
-            with yt_dlp.YoutubeDL(opts) as ydl:
-                info = ydl.extract_info(url, download=True)
-                if pbar and not pbar.disable:
-                    pbar.close()
-                return info.get('duration', 0), info.get('height', 0), path
+            info = session.process(download=True, progress_hook=hook, outtmpl=path,
+                                   format=fmt_str, merge_output_format=ext)
+            if pbar and not pbar.disable:
+                pbar.close()
+            metrics.add_file_bytes(path)
+            media_cache.put(video_id, info.get('format_id'), path)
+            return info.get('duration', 0), info.get('height', 0), path
 
         except (OSError, requests.exceptions.RequestException, yt_dlp.utils.DownloadError, ValueError) as e:
             if pbar and not pbar.disable:
@@ -273,46 +516,51 @@ def download_video(url, path, quality_height=None):
                 return 0, (quality_height if quality_height else 0), path
 
             error_msg = getattr(e, 'msg', str(e))
-            error_msg = getattr(e, 'msg', str(e))
             
             # Если ошибка 416 (Range Not Satisfiable) или проблемы с кодеком, то продолжение невозможно.
-            # Нужно удалить частично скачанные/битые файлы перед повтором.
-            is_critical = "416" in error_msg or "codec parameters" in error_msg
-            
-            if is_critical or not ask_to_retry(f"Сетевая ошибка при скачивании видео: {error_msg}"):
-                if is_critical:
-                    # Если ошибка критическая для файла, спрашиваем пользователя о ПЕРЕЗАПУСКЕ с нуля
-                    if ask_to_retry(f"Критическая ошибка файла ({error_msg}).\n{YELLOW}Очистить временные файлы и скачать заново?"):
-                        print(f"{YELLOW}Очистка временных файлов видео...{RESET}")
-                        clean_video_partials()
-                        continue
-                
-                print(f"{RED}Завершение работы по требованию пользователя.{RESET}")
-                cleanup(True)
-                sys.exit(1)
-                print(f"{RED}Завершение работы по требованию пользователя.{RESET}")
-                cleanup(True)
-                sys.exit(1)
-
-
-def download_audio(url, path):
-    """Скачивает аудиодорожку перевода с логикой повтора."""
+            # Нужно удалить частично скачанные/битые файлы и начать загрузку с нуля.
+            if is_permanent(e):
+                if ask_to_restart(error_msg, restarts):
+                    print(f"{YELLOW}Очистка временных файлов видео...{RESET}")
+                    clean_video_partials(path)
+                    restarts += 1
+                    continue
+            elif ask_to_retry(f"Сетевая ошибка при скачивании видео: {error_msg}", attempt, started):
+                continue
+
+            print(f"{RED}Завершение работы.{RESET}")
+            cleanup(True)
+            sys.exit(1)
+
+
+@metrics.timed("translation_download")
+def download_audio(url, path, exit_on_error=True):
+    """Скачивает аудиодорожку перевода с логикой повтора.
+
+    Загрузка идет несколькими сегментами; при повторе уже скачанные байты не качаются заново.
+    exit_on_error=False — неустранимая ошибка не завершает процесс, а передается вызывающему
+    (из фонового потока рабочую папку удалять нельзя: в нее еще пишется видео).
+    """
+    from .downloader import SegmentedDownloader
     pbar = None
+    downloader = SegmentedDownloader()
+    started = time.monotonic()
+    attempt = 0
+    restarts = 0
     while True:
+        attempt += 1
         try:
-            r = requests.get(url, stream=True, timeout=15)
-            r.raise_for_status()
-            size = int(r.headers.get('content-length', 0))
-            
-            pbar = tqdm(total=size, unit='iB', unit_scale=True, desc="Загрузка", 
+            pbar = tqdm(total=0, unit='iB', unit_scale=True, desc="Загрузка", 
                       dynamic_ncols=True, colour='green', bar_format=CLEAN_BAR)
-            
-            with open(path, 'wb') as f:
-                for chunk in r.iter_content(1024):
-                    pbar.update(len(chunk))
-                    f.write(chunk)
-            
+
+            def progress(total, done):
+                if total: pbar.total = total
+                pbar.n = done
+                pbar.refresh()
+
+            downloader.download(url, path, progress)
             pbar.close()
+            metrics.add_file_bytes(path)
             return # Успешное завершение
 
         except (OSError, requests.exceptions.RequestException) as e:
@@ -320,32 +568,42 @@ def download_audio(url, path):
                 pbar.close()
 
             error_msg = str(e)
-            if not ask_to_retry(f"Сетевая ошибка при скачивании аудио: {error_msg}"):
-                print(f"{RED}Завершение работы по требованию пользователя.{RESET}")
-                cleanup(True)
-                sys.exit(1)
-
-def download_youtube_audio(url, path):
-    """Скачивает аудио с YouTube в формате MP3."""
-    # Убираем расширение из пути для outtmpl, так как конвертер добавит .mp3
+            if is_permanent(e):
+                # Уже скачанные сегменты не подходят — начинаем с нуля
+                if ask_to_restart(error_msg, restarts):
+                    for f in glob.glob(glob.escape(path) + ".part*"):
+                        try: os.remove(f)
+                        except OSError: pass
+                    restarts += 1
+                    continue
+            elif ask_to_retry(f"Сетевая ошибка при скачивании аудио: {error_msg}", attempt, started):
+                continue
+
+            if not exit_on_error:
+                raise
+            print(f"{RED}Завершение работы.{RESET}")
+            cleanup(True)
+            sys.exit(1)
+
+def audio_extension(session, audio_format=AUDIO_FORMAT):
+    """Расширение файла оригинального аудио: при copy — контейнер исходной дорожки, иначе audio_format."""
+    if audio_format != 'copy':
+        return audio_format
+    selected = select_video_format(session, AUDIO_SELECTOR, None)
+    if selected.get('ext') in AUDIO_CONTAINERS:
+        return selected['ext']
+    # Например, opus в webm: дорожка переносится в свой контейнер без перекодирования
+    return COPY_EXTENSIONS.get((selected.get('acodec') or '').split('.')[0], 'mp3')
+
+def download_youtube_audio(url, path, session=None, audio_format=AUDIO_FORMAT):
+    """Скачивает оригинальное аудио с YouTube. Возвращает путь к файлу или None.
+
+    copy — исходная дорожка (m4a/opus) сохраняется копированием потока, меняется только
+    контейнер; mp3 — перекодирование в MP3 192 кбит/с.
+    """
+    # Убираем расширение из пути для outtmpl: расширение выберет yt-dlp (и конвертер)
     base_path = os.path.splitext(path)[0]
-    
-    opts = {
-        'format': 'bestaudio/best',
-        'outtmpl': base_path + '.%(ext)s',
-        'quiet': True,
-        'no_warnings': True,
-        'logger': Logger(),
-        'postprocessors': [{
-            'key': 'FFmpegExtractAudio',
-            'preferredcodec': 'mp3',
-            'preferredquality': '192',
-        }],
-        'ffmpeg_location': get_binary_path('ffmpeg') or 'ffmpeg',
-        'retries': 10,
-        'fragment_retries': 10,
-        'retry_sleep': 5,
-    }
+    session = session or VideoSession(url)
 
     # Прогресс-бар (упрощенный, так как тут нет merge)
     pbar = tqdm(total=0, unit='B', unit_scale=True, unit_divisor=1024, 
@@ -363,17 +621,19 @@ def download_youtube_audio(url, path):
             if pbar.total: pbar.n = pbar.total
             pbar.refresh()
 
-    opts['progress_hooks'] = [hook]
-
     try:
-        with yt_dlp.YoutubeDL(opts) as ydl:
-            ydl.download([url])
-            pbar.close()
-            return True
+        from yt_dlp.postprocessor import FFmpegExtractAudioPP
+        ydl = session.ydl
+        codec = 'best' if audio_format == 'copy' else audio_format
+        ydl.add_post_processor(FFmpegExtractAudioPP(ydl, preferredcodec=codec, preferredquality='192'), when='post_process')
+        info = session.process(download=True, progress_hook=hook, outtmpl=base_path + '.%(ext)s', format=AUDIO_SELECTOR)
+        pbar.close()
+        downloads = info.get('requested_downloads') or [info]
+        return downloads[0].get('filepath') or path
     except Exception as e:
         pbar.close()
         print(f"{RED}❌ Ошибка скачивания аудио: {e}{RESET}")
-        return False
+        return None
 
 def ask_merge_mode():
     """Спрашивает пользователя о режиме объединения аудио."""
@@ -390,15 +650,56 @@ def ask_merge_mode():
         except (KeyboardInterrupt, EOFError):
             return 2
 
-def build_ffmpeg_command(mode, final_path, is_mkv=False):
+def source_input_args(path, headers=None):
+    """Опции FFmpeg для сетевого входа: переподключение при обрыве и http-заголовки источника."""
+    if not re.match(r'https?://', path or ''):
+        return []
+    args = ['-reconnect', '1', '-reconnect_streamed', '1', '-reconnect_delay_max', '5']
+    if headers:
+        args += ['-headers', ''.join(f"{k}: {v}\r\n" for k, v in headers.items())]
+    return args
+
+def mp4_layout_args(layout, duration=None, audio_tracks=1):
+    """Флаги мультиплексора MP4 для раскладки layout.
+
+    reserve    — место под индекс резервируется в начале файла (-moov_size): файл пишется
+                 один раз и сразу пригоден для просмотра по сети. Без длительности — как faststart.
+    faststart  — индекс переносится в начало после записи (второй полный проход по файлу).
+    fragmented — фрагментированный MP4 для потоковых потребителей, одна запись.
+    none       — индекс в конце файла, одна запись.
+    """
+    if layout == 'reserve':
+        if not duration:
+            return ['-movflags', '+faststart']
+        samples = float(duration) * (MOOV_MAX_FPS + AAC_FRAMES_PER_SEC * audio_tracks)
+        return ['-moov_size', str(int(samples * MOOV_BYTES_PER_SAMPLE) + 64 * 1024)]
+    if layout == 'faststart':
+        return ['-movflags', '+faststart']
+    if layout == 'fragmented':
+        return ['-movflags', '+frag_keyframe+empty_moov+default_base_moof']
+    return []
+
+def build_ffmpeg_command(mode, final_path, video_path, audio_path, is_mkv=False,
+                         orig_audio_path=None, source_headers=None, layout=MP4_LAYOUT, duration=None):
+    """Собирает команду FFmpeg.
+
+    Входы: 0 — видео (и оригинальный звук), 1 — перевод. Если оригинальный звук идет
+    отдельным потоком (orig_audio_path, например прямая ссылка на DASH-аудио), он становится входом 2.
+    layout и duration задают раскладку MP4 (mp4_layout_args); duration — известная длительность видео.
+    """
     ffmpeg_exec = get_binary_path('ffmpeg') or 'ffmpeg'
     
     base_cmd = [
         ffmpeg_exec, '-y',
         '-loglevel', 'quiet', '-progress', 'pipe:1',
-        '-threads', '0', '-i', TEMP_VIDEO, '-i', TEMP_AUDIO
+        '-threads', '0',
+        *source_input_args(video_path, source_headers), '-i', video_path,
+        '-i', audio_path
     ]
-    
+    orig = '0:a'
+    if orig_audio_path:
+        base_cmd += [*source_input_args(orig_audio_path, source_headers), '-i', orig_audio_path]
+        orig = '2:a'
     
     # Mode 1: Translation audio ONLY (or primary), Original might be mapped but muted or not mapped? 
     # Let's interpret "Аудио с переводом" as replacement or just track 1.
@@ -411,7 +712,7 @@ def build_ffmpeg_command(mode, final_path, is_mkv=False):
         # [0:a]volume=0.2[orig] - берет звук из видео (0), уменьшает громкость до 20%, называет поток [orig]
         # [1:a]volume=1.2[dub]  - берет звук перевода (1), увеличивает громкость до 120%, называет поток [dub]
         # [orig][dub]amix...    - смешивает оба потока. duration=shortest обрезает по самой короткой дорожке (обычно видео)
-        filter_complex = "[0:a]volume=0.2[orig];[1:a]volume=1.2[dub];[orig][dub]amix=inputs=2:duration=shortest[out]"
+        filter_complex = f"[{orig}]volume=0.2[orig];[1:a]volume=1.2[dub];[orig][dub]amix=inputs=2:duration=shortest[out]"
         cmd_end = [
             '-filter_complex', filter_complex,
             '-map', '0:v',        # Берем видео из источника 0 (оригинал)
@@ -424,7 +725,7 @@ def build_ffmpeg_command(mode, final_path, is_mkv=False):
     elif mode == 3: # Режим 3: Две дорожки (Dual)
         cmd_end = [
             '-map', '0:v',        # Видео оригинала
-            '-map', '0:a',        # Аудио оригинала (Дорожка 1)
+            '-map', orig,         # Аудио оригинала (Дорожка 1)
             '-map', '1:a',        # Аудио перевода (Дорожка 2)
             '-c', 'copy',         # Всё копируем без перекодирования
             '-metadata:s:a:0', 'title=Original',
@@ -441,22 +742,71 @@ def build_ffmpeg_command(mode, final_path, is_mkv=False):
         cmd_end = [
             '-map', '0:v', 
             '-map', '1:a', 
-            '-map', '0:a?', # Опционально оригинал, если есть?
+            '-map', f'{orig}?', # Опционально оригинал, если есть?
             '-c', 'copy',
         ]
         
-    if False: # args.fast removed from helper signature, assume passed globally or ignored here? 
-        # We need args here if we want to support faststart. 
-        # Let's assume we add it always or pass args.
-        pass
-        
-    cmd_end.extend(['-movflags', '+faststart']) # Always useful
+    if not is_mkv:
+        # В MKV индекс устроен иначе, флаги MP4 к нему не относятся
+        cmd_end.extend(mp4_layout_args(layout, duration, audio_tracks=2 if mode == 3 else 1))
     
     cmd_end.append(final_path)
     
     return base_cmd + cmd_end
 
-def run_ffmpeg(cmd_list, duration, mode_name="FFmpeg"):
+class StreamInputError(Exception):
+    """Поток, который передавался в stdin FFmpeg, оборвался: результат сборки неполный."""
+
+class MoovSizeError(StreamInputError):
+    """Места под индекс MP4 (-moov_size) не хватило, а вход из stdin повторить нельзя."""
+
+def feed_stdin(proc, chunks, errors=None):
+    """Пишет поток байтов (например, аудио перевода из сети) в stdin процесса FFmpeg.
+
+    Если оборвался сам поток, ошибка добавляется в errors, а FFmpeg останавливается:
+    иначе он увидит обычный конец входа и соберет файл с обрезанным звуком.
+    """
+    source = iter(chunks)
+    try:
+        while True:
+            try:
+                chunk = next(source)
+            except StopIteration:
+                break
+            except (OSError, ValueError, requests.exceptions.RequestException) as e:
+                if errors is not None:
+                    errors.append(e)
+                proc.kill()
+                break
+            if chunk:
+                proc.stdin.buffer.write(chunk)
+    except (OSError, ValueError):
+        # FFmpeg завершился раньше (BrokenPipe) — ошибку покажет код возврата FFmpeg
+        pass
+    finally:
+        try: proc.stdin.close()
+        except (OSError, ValueError): pass
+
+@retry_on_network_error
+def open_audio_stream(url):
+    """Открывает потоковую загрузку аудио перевода для передачи в FFmpeg без временного файла."""
+    r = requests.get(url, stream=True, timeout=15)
+    r.raise_for_status()
+    return r
+
+@metrics.timed("ffmpeg")
+def run_ffmpeg(cmd_list, duration, mode_name="FFmpeg", stdin_chunks=None, on_progress=None, cancel=None):
+    """Запускает FFmpeg с прогресс-баром. stdin_chunks — байты для входа 'pipe:0', если он используется.
+
+    on_progress(ProgressEvent) — дополнительный подписчик на события прогресса (например, статистика пакета).
+    Если поток stdin_chunks оборвался, FFmpeg останавливается и выбрасывается StreamInputError;
+    если при входе из stdin не хватило места под индекс — MoovSizeError (собирать заново из файла).
+    cancel (threading.Event) останавливает FFmpeg на ближайшем событии прогресса, тогда — JobCancelled.
+    """
+    # Повторная сборка (см. -moov_size) идет внутри _run_ffmpeg и считается той же стадией, один раз
+    return _run_ffmpeg(cmd_list, duration, mode_name, stdin_chunks, on_progress, cancel)
+
+def _run_ffmpeg(cmd_list, duration, mode_name, stdin_chunks, on_progress, cancel=None):
     # Для отладки заменяем quiet на error
     try:
         idx = cmd_list.index('-loglevel')
@@ -469,51 +819,38 @@ def run_ffmpeg(cmd_list, duration, mode_name="FFmpeg"):
         # shell=False - это более безопасный способ
         # stderr=subprocess.STDOUT объединяет потоки, чтобы избежать deadlocks при переполнении буфера stderr
         proc = subprocess.Popen(cmd_list, stdout=subprocess.PIPE, stderr=subprocess.STDOUT, 
+                                stdin=subprocess.PIPE if stdin_chunks is not None else None,
                                 universal_newlines=True, shell=False, bufsize=1, 
                                 encoding='utf-8', errors='replace')
+        stream_errors = []
+        feeder = None
+        if stdin_chunks is not None:
+            feeder = threading.Thread(target=feed_stdin, args=(proc, stdin_chunks, stream_errors), daemon=True)
+            feeder.start()
         
-        fmt = "{l_bar}{bar}| {n_fmt}/{total_fmt}s"
-        duration = int(duration) if duration else 100
+        fmt = "{l_bar}{bar}| {n:.0f}/{total:.0f}s{postfix}"
+        duration = float(duration) if duration else 100.0
         pbar = tqdm(total=duration, unit="s", desc=f"[{mode_name}]", dynamic_ncols=True, colour='yellow', bar_format=fmt)
-        
-        last = 0
-        full_log = [] # Сохраняем весь вывод для отладки в случае ошибки
-        
-        # Читаем stdout (который теперь включает и stderr)
-        while True:
-            line = proc.stdout.readline()
-            if not line:
-                if proc.poll() is not None: break
-                continue
-                
-            full_log.append(line)
-            line_str = line.strip()
-            if not line_str: continue
-
-            # Парсинг времени
-            current_sec = None
-            if "out_time_us=" in line_str:
-                try:
-                    us = int(line_str.split('=')[1].strip())
-                    current_sec = us // 1000000
-                except (ValueError, IndexError): pass
-            elif "out_time=" in line_str: # Fallback
-                try:
-                    # out_time=00:00:05.123456
-                    t_str = line_str.split('=')[1].strip()
-                    parts = t_str.split(':')
-                    if len(parts) == 3:
-                        h, m, s = int(parts[0]), int(parts[1]), float(parts[2])
-                        current_sec = int(h * 3600 + m * 60 + s)
-                except (ValueError, IndexError): pass
-
-            if current_sec is not None:
-                if current_sec > duration: current_sec = duration
-                if current_sec > last:
-                    pbar.update(current_sec - last)
-                    last = current_sec
-        
-        rc = proc.poll()
+
+        def update_bar(event):
+            current = min(event.out_time, duration)
+            if current > pbar.n:
+                pbar.n = current
+            if event.speed:
+                pbar.set_postfix_str(f"x{event.speed:.1f}", refresh=False)
+            pbar.refresh()
+
+        # Вывод читает отдельный поток монитора; здесь просто ждем завершения процесса
+        monitor = FFmpegMonitor(proc)
+        monitor.subscribe(update_bar)
+        if on_progress:
+            monitor.subscribe(on_progress)
+        if cancel is not None:
+            def stop_on_cancel(event):
+                if cancel.is_set() and proc.poll() is None:
+                    proc.terminate()
+            monitor.subscribe(stop_on_cancel)
+        rc = monitor.start().wait()
         if rc == 0:
             # Принудительно завершаем прогресс-бар перед закрытием
             if pbar.total and pbar.n < pbar.total:
@@ -521,13 +858,36 @@ def run_ffmpeg(cmd_list, duration, mode_name="FFmpeg"):
                 pbar.refresh()
         
         pbar.close()
+        if monitor.last is not None and monitor.last.total_size:
+            metrics.add(bytes=monitor.last.total_size)
+        if feeder is not None:
+            feeder.join(timeout=5)
+        if rc != 0 and cancel is not None and cancel.is_set():
+            # Недособранный файл в папке назначения не оставляем
+            try: os.remove(cmd_list[-1])
+            except OSError: pass
+            raise JobCancelled("сборка остановлена")
+        if stream_errors:
+            raise StreamInputError(stream_errors[0])
         
+        if rc != 0 and '-moov_size' in cmd_list and \
+                any("reserved_moov_size is too small" in line for line in monitor.log):
+            if stdin_chunks is not None:
+                # Данные stdin уже прочитаны: повторить сборку можно только из скачанного файла
+                raise MoovSizeError("не хватило места под индекс MP4")
+            # Оценки места под индекс не хватило: собираем заново, индекс переносится вторым проходом
+            print(f"{YELLOW}⚠️ Не хватило места под индекс MP4, повторная сборка с faststart...{RESET}")
+            metrics.add(retries=1)
+            idx = cmd_list.index('-moov_size')
+            cmd_list[idx:idx + 2] = ['-movflags', '+faststart']
+            return _run_ffmpeg(cmd_list, duration, mode_name, None, on_progress, cancel)
+
         if rc != 0:
             print(f"\n{RED}❌ Ошибка FFmpeg (код {rc}):{RESET}")
             # shlex.join корректно преобразует список в строку для отображения
             print(f"{YELLOW}Команда:{RESET} {shlex.join(cmd_list)}")
             print(f"{RED}Лог выполнения:{RESET}")
-            print("".join(full_log[-20:])) # Печатаем последние 20 строк лога
+            print("\n".join(monitor.log)) # Последние строки лога FFmpeg
             cleanup(error=True)
             sys.exit(1)
             
@@ -538,8 +898,53 @@ def run_ffmpeg(cmd_list, duration, mode_name="FFmpeg"):
 
 
 
-def get_user_input_and_info(args):
-    """Получает URL, анализирует видео и спрашивает качество."""
+def can_mix_parallel(args, mode, duration, audio_path, sources=None):
+    """Можно ли собрать Mix параллельными сегментами: нужны локальные файлы и достаточно длинное видео."""
+    from .parallel_mix import MIN_SEGMENT_SEC
+    return (mode == 2 and args.mix_segments > 1 and not sources
+            and audio_path != 'pipe:0' and (duration or 0) >= 2 * MIN_SEGMENT_SEC)
+
+@metrics.timed("ffmpeg")
+def run_parallel_mix(final_path, video_path, audio_path, duration, segments, workdir, is_mkv=False, mode_name="MIX",
+                     layout=MP4_LAYOUT):
+    """Режим Mix с параллельным кодированием звука сегментами (для длинных видео)."""
+    from .parallel_mix import mix_parallel, MixError
+    ffmpeg_exec = get_binary_path('ffmpeg') or 'ffmpeg'
+    fmt = "{l_bar}{bar}| {n:.0f}/{total:.0f}s{postfix}"
+    pbar = tqdm(total=float(duration), unit="s", desc=f"[{mode_name}]", dynamic_ncols=True, colour='yellow', bar_format=fmt)
+
+    def update_bar(seconds):
+        pbar.n = min(seconds, pbar.total)
+        pbar.refresh()
+
+    try:
+        count = mix_parallel(ffmpeg_exec, video_path, audio_path, final_path, duration, workdir, segments,
+                             is_mkv=is_mkv, on_progress=update_bar, mux_args=mp4_layout_args(layout, duration))
+        pbar.set_postfix_str(f"сегментов: {count}", refresh=False)
+        metrics.add_file_bytes(final_path)
+        pbar.n = pbar.total
+        pbar.refresh()
+    except MixError as e:
+        pbar.close()
+        print(f"\n{RED}❌ Ошибка FFmpeg: {e}{RESET}")
+        print(f"{YELLOW}Команда:{RESET} {shlex.join(e.cmd)}")
+        print(f"{RED}Лог выполнения:{RESET}")
+        print("\n".join(e.log))
+        cleanup(error=True)
+        sys.exit(1)
+    except (OSError, ValueError) as e:
+        pbar.close()
+        print(f"\n{RED}❌ Ошибка параллельной сборки: {e}{RESET}")
+        cleanup(error=True)
+        sys.exit(1)
+    pbar.close()
+
+
+def get_user_input_and_info(args, preflight=()):
+    """Получает URL, анализирует видео и спрашивает качество.
+
+    Анализ идет параллельно с фоновыми проверками preflight; их результат ждем перед выбором качества.
+    """
     url = args.url
     if not url:
         try:
@@ -552,16 +957,14 @@ def get_user_input_and_info(args):
         sys.exit(1)
         
     validate_url(url)
-    try:
-        check_internet()
-    except Exception as e:
-        print(f"{RED}❌ Ошибка подключения: {e}{RESET}")
-        sys.exit(1)
 
     selected_quality = args.quality
     
     # Всегда получаем информацию о видео (включая duration)
-    qualities, title, uploader, duration, language = get_available_qualities(url)
+    # Один YoutubeDL и один анализ на всё задание: загрузка переиспользует полученный info-словарь
+    session = VideoSession(url)
+    qualities, title, uploader, duration, language = get_available_qualities(url, session)
+    finish_preflight(preflight)
     
     # Если качество указано аргументом, но его нет в списке доступных — сбрасываем выбор
     if selected_quality and selected_quality not in qualities:
@@ -589,42 +992,138 @@ def get_user_input_and_info(args):
         except (ValueError, IndexError, EOFError, KeyboardInterrupt):
             pass 
     
-    return url, selected_quality, title, uploader, duration, language
+    return url, selected_quality, title, uploader, duration, language, session
+
+def report_translation_result(result, prefix=""):
+    """Печатает итог ожидания перевода. Возвращает URL аудио перевода или None."""
+    if result.ready:
+        tqdm.write(f"{GREEN}✅ {prefix}Перевод готов! (ожидание {result.waited:.0f} с, запросов: {result.polls}){RESET}")
+        return result.audio_url
+    if result.status == "Cancelled":
+        return None
+    if result.status == "Ready":
+        tqdm.write(f"{RED}❌ {prefix}Ошибка: Статус Ready, но нет URL.{RESET}")
+    elif result.status == "Timeout":
+        tqdm.write(f"{RED}❌ {prefix}Время ожидания перевода истекло.{RESET}")
+    elif result.status == "Error":
+        tqdm.write(f"{RED}❌ {prefix}Ошибка API перевода: {result.message}{RESET}")
+    else:
+        tqdm.write(f"{RED}❌ {prefix}Неизвестный статус или ошибка: {result.message}{RESET}")
+    return None
+
+def fetch_cached_translation(url, path):
+    """Кладет в path дорожку перевода из локального кэша. True — если она там была."""
+    cached = cache.get_translation_store().get(vot.get_video_id(url))
+    if not cached:
+        return False
+    try:
+        cache.link_or_copy(cached, path)
+    except OSError:
+        return False
+    tqdm.write(f"{GREEN}✅ Перевод взят из кэша.{RESET}")
+    return True
+
+def store_translation(url, path):
+    """Сохраняет скачанную дорожку перевода в локальный кэш."""
+    cache.get_translation_store().put(vot.get_video_id(url), path)
+
+@metrics.timed("translation_wait")
+def wait_for_translation(url, duration, stop=None):
+    """Опрашивает API перевода до готовности. Возвращает URL аудио перевода или None.
+
+    stop (threading.Event) прерывает ожидание между запросами.
+    """
+    from .poller import poll_translation
 
-def get_translation_audio(url, duration, step_label="[1/3]"):
+    store = cache.get_translation_store()
+    video_id = vot.get_video_id(url)
+    audio_url = store.get_url(video_id)
+    if audio_url:
+        tqdm.write(f"{GREEN}✅ Перевод готов (ссылка из кэша).{RESET}")
+        return audio_url
+
+    def on_wait(polls, waited, delay):
+        tqdm.write(f"{YELLOW}⏳ Перевод в процессе... (прошло {waited:.0f} с, следующая проверка через {delay:.0f} с){RESET}")
+
+    result = poll_translation(url, duration, on_wait, stop=stop)
+    metrics.add(polls=result.polls)
+    audio_url = report_translation_result(result)
+    store.put_url(video_id, audio_url)
+    return audio_url
+
+def get_translation_audio(url, duration, path, step_label="[1/3]"):
     """Использует vot.py для получения перевода, ожидает готовности и скачивает."""
-    print(f"\n{YELLOW}{step_label} Запрос перевода...{RESET}")
+    if step_label:
+        print(f"\n{YELLOW}{step_label} Запрос перевода...{RESET}")
+
+    if fetch_cached_translation(url, path):
+        return True
     
-    # Поллинг (максимум 5 минут)
-    max_attempts = 30 # 30 * 10 сек = 5 минут
-    for attempt in range(max_attempts):
-        result = vot.translate_video(url, duration)
-        
-        if not result.get("success"):
-            print(f"{RED}❌ Ошибка API перевода: {result.get('message')}{RESET}")
-            return False
-            
-        status = result.get("status")
-        if status == "Ready":
-            audio_url = result.get("url")
-            if audio_url:
-                print(f"{GREEN}✅ Перевод готов!{RESET}")
-                download_audio(audio_url, TEMP_AUDIO)
-                return True
-            else:
-                 print(f"{RED}❌ Ошибка: Статус Ready, но нет URL.{RESET}")
-                 return False
-                 
-        elif status == "Waiting":
-            print(f"{YELLOW}⏳ Перевод в процессе... (Попытка {attempt+1}/{max_attempts}){RESET}")
-            time.sleep(10) # Ждем 10 секунд
-            
-        else:
-             print(f"{RED}❌ Неизвестный статус или ошибка: {result.get('message')}{RESET}")
-             return False
+    audio_url = wait_for_translation(url, duration)
+    if not audio_url:
+        return False
+
+    download_audio(audio_url, path)
+    store_translation(url, path)
+    return True
+
+def start_translation(url, duration, path=None):
+    """Запускает ожидание перевода (и загрузку в path, если он задан) в фоновом потоке-демоне.
+
+    Возвращает Future: URL аудио перевода (без path) или True/False. Ошибка загрузки не
+    завершает процесс из фонового потока, а попадает в Future (см. await_translation).
+    cleanup() останавливает ожидание, поэтому выход по ошибке или Ctrl+C его не ждет.
+    """
+    global TRANSLATION_STOP
+    TRANSLATION_STOP = stop = threading.Event()
+    future = Future()
+
+    def run():
+        try:
+            audio_url = wait_for_translation(url, duration, stop)
+            if path is not None and audio_url:
+                download_audio(audio_url, path, exit_on_error=False)
+                store_translation(url, path)
+            future.set_result(audio_url if path is None else bool(audio_url))
+        except BaseException as e:
+            future.set_exception(e)
+
+    threading.Thread(target=run, name="ytrd-translate", daemon=True).start()
+    return future
+
+def await_translation(future):
+    """Дожидается фонового перевода. Ошибка загрузки завершает процесс уже из главного потока."""
+    try:
+        return future.result()
+    except (OSError, requests.exceptions.RequestException) as e:
+        print(f"{RED}❌ Не удалось скачать перевод: {e}{RESET}")
+        print(f"{RED}Завершение работы.{RESET}")
+        cleanup(True)
+        sys.exit(1)
 
-    print(f"{RED}❌ Время ожидания перевода истекло.{RESET}")
-    return False
+def next_free_path(path):
+    """Возвращает свободное имя вида 'name (N).ext', если файл уже существует."""
+    if not os.path.exists(path):
+        return path
+    base, ext = os.path.splitext(path)
+    counter = 1
+    new_path = f"{base} ({counter}){ext}"
+    while os.path.exists(new_path):
+        counter += 1
+        new_path = f"{base} ({counter}){ext}"
+    return new_path
+
+@metrics.timed("finalize")
+def save_output(src, dst):
+    """Переносит готовый файл из рабочей папки в папку назначения.
+
+    На том же разделе диска это переименование без копирования данных (рабочая папка
+    по умолчанию создается рядом с папкой назначения). Возвращает способ переноса.
+    """
+    method = move_file(src, dst)
+    if method != 'rename':
+        metrics.add_file_bytes(dst)
+    return method
 
 def handle_existing_file(path):
     """Проверяет существование файла и спрашивает пользователя, что делать."""
@@ -644,14 +1143,7 @@ def handle_existing_file(path):
             if choice == '1':
                 return path
             elif choice == '2':
-                base, ext = os.path.splitext(path)
-                counter = 1
-                new_path = f"{base} ({counter}){ext}"
-                while os.path.exists(new_path):
-                    counter += 1
-                    new_path = f"{base} ({counter}){ext}"
-                #print(f"{GREEN}Новое имя: {new_path}{RESET}")
-                return new_path
+                return next_free_path(path)
             elif choice == '3':
                 print(f"{YELLOW}Отмена операции.{RESET}")
                 cleanup()
@@ -681,13 +1173,92 @@ def validate_args(args):
         args.quality = None
         args.audio = False
 
+def read_url_list(path):
+    """Читает ссылки из файла (или из stdin, если path == '-') по мере чтения.
+
+    В строке может быть несколько ссылок через пробел; пустые строки и строки с # пропускаются.
+    Возвращает итератор: из канала (cat links.txt | ytrd -i -) задания начинаются до конца ввода.
+    """
+    if path == '-':
+        return _iter_url_lines(sys.stdin, path)
+    try:
+        stream = open(path, 'r', encoding='utf-8-sig')
+    except OSError as e:
+        print(f"{RED}❌ Не удалось прочитать список ссылок {path}: {e}{RESET}")
+        sys.exit(1)
+    return _iter_url_lines(stream, path)
+
+def _iter_url_lines(stream, path):
+    try:
+        for line in stream:
+            line = line.strip()
+            if line and not line.startswith('#'):
+                yield from line.split()
+    except (OSError, UnicodeDecodeError) as e:
+        # Уже поставленные задания доработают, остаток списка пропускается
+        print(f"{RED}❌ Ошибка чтения списка ссылок {path}: {e}{RESET}")
+    finally:
+        if stream is not sys.stdin:
+            stream.close()
+
+def unique_video_urls(urls, skipped):
+    """Приводит ссылки к виду https://www.youtube.com/watch?v=ID и убирает повторы одного видео.
+
+    youtu.be/ID, watch?v=ID и shorts/ID считаются одним видео. Ссылки обрабатываются лениво;
+    отброшенные сразу печатаются и добавляются в skipped парами (исходная ссылка, причина).
+    """
+    seen = set()
+    for url in urls:
+        video_id = vot.get_video_id(url)
+        if not video_id:
+            reason = "не ссылка на видео YouTube"
+        elif video_id in seen:
+            reason = f"повтор видео {video_id}"
+        else:
+            seen.add(video_id)
+            yield f"https://www.youtube.com/watch?v={video_id}"
+            continue
+        skipped.append((url, reason))
+        print(f"{YELLOW}⚠️ Пропуск {url}: {reason}{RESET}")
+
+def run_batch(urls, args, preflight=(), skipped=()):
+    """Обрабатывает несколько ссылок конвейером без вопросов пользователю.
+
+    urls может быть итератором: задания ставятся по мере поступления ссылок.
+    skipped — отброшенные ссылки (повторы, не YouTube), в том числе пополняемые
+    во время чтения urls; попадают в итоговый отчет.
+    """
+    from .pipeline import BatchPipeline
+
+    # Воркеры пакета не могут задавать вопросы: повторы только по политике
+    RETRY_POLICY.interactive = False
+    finish_preflight(preflight)
+
+    pipeline = BatchPipeline(
+        args,
+        translate_workers=args.translate_workers,
+        download_workers=args.download_workers,
+        ffmpeg_workers=args.ffmpeg_workers,
+    )
+    jobs = pipeline.run(urls)
+    if not jobs:
+        print(f"{RED}❌ Нет ссылок на видео YouTube.{RESET}")
+        sys.exit(1)
+    pipeline.print_summary(jobs)
+    pipeline.print_report(jobs, skipped)
+    metrics.export([job.metrics for job in jobs], pipeline.elapsed)
+    if any(job.status == "failed" for job in jobs):
+        sys.exit(1)
+
 def core_logic():
+    global CURRENT_WORKSPACE, KEEP_TEMP
     epilog_text = """
 Примеры использования:
   ytrd https://youtu.be/VIDEO_ID          # Интерактивный режим
   ytrd https://youtu.be/VIDEO_ID -m       # Режим смешивания (оригинал 20% + перевод 120%).
   ytrd https://youtu.be/VIDEO_ID -d       # Режим двух дорожек (Dual)
   ytrd https://youtu.be/VIDEO_ID -q 1080  # Скачать 1080p
+  ytrd serve --port 8765                  # Сервер с HTTP API заданий
     """
     
     parser = argparse.ArgumentParser(
@@ -705,26 +1276,102 @@ def core_logic():
     parser.add_argument("-h", "--help", action="help", help="Показать это сообщение справки и выйти")
     parser.add_argument("-v", "--version", action="version", version=f"ytrd {__version__}", help="Показать версию программы и выйти")
     
-    parser.add_argument("url", nargs="?", help="Ссылка на видео YouTube.\nЕсли не указана, скрипт запросит её при запуске.")
+    parser.add_argument("url", nargs="*", help="Ссылка на видео YouTube.\nЕсли не указана, скрипт запросит её при запуске.\nНесколько ссылок обрабатываются в пакетном режиме.\n'serve' — запустить сервер с HTTP API заданий.")
     parser.add_argument("-o", "--output", default=OUTPUT_DIR, help=f"Папка для сохранения видео.\nПо умолчанию: {OUTPUT_DIR}")
     parser.add_argument("-m", "--mix", action="store_true", help="Режим смешивания (Mix).\nЕсли указан, оригинальная дорожка будет приглушена (20%%),\nа перевод наложен поверх (120%%).")
     parser.add_argument("-d", "--dual", action="store_true", help="Режим двух дорожек (Dual).\nСохраняет оригинальное аудио и перевод как отдельные переключаемые дорожки.")
     parser.add_argument("-q", "--quality", type=int, help="Предпочитаемое качество видео (высота строки).\nПример: 1080, 720, 480.\nЕсли не указано, будет предложен выбор.")
     parser.add_argument("-a", "--audio", action="store_true", help="Режим 'Только аудио'.\nСкачивает только переведенную аудиодорожку (mp3).")
+
+    parser.add_argument("--cache-dir", default=None, help=f"Папка локального кэша.\nПо умолчанию: {cache.get_cache_dir()}")
+    parser.add_argument("--info-cache-ttl", type=int, default=cache.DEFAULT_INFO_TTL, metavar="SEC", help="Сколько секунд хранить результаты анализа видео (0 — не кэшировать).\nПо умолчанию: %(default)s")
+    parser.add_argument("--translation-cache-mb", type=int, default=cache.DEFAULT_TRANSLATION_BYTES // (1024 * 1024), metavar="MB", help="Сколько места отдать под кэш дорожек перевода (0 — не кэшировать).\nПо умолчанию: %(default)s")
+    parser.add_argument("--translation-url-ttl", type=int, default=cache.DEFAULT_TRANSLATION_URL_TTL, metavar="SEC", help="Сколько секунд переиспользовать ссылку на готовый перевод.\nПо умолчанию: %(default)s")
+    parser.add_argument("--media-cache-gb", type=float, default=0, metavar="GB", help="Кэшировать скачанные исходные видео (объем в ГБ, 0 — выключено).\nПозволяет пересобрать видео в другом режиме без повторной загрузки.")
+    parser.add_argument("--work-dir", default=None, help="Где создавать рабочие папки заданий для временных файлов.\nПо умолчанию: скрытая папка .ytrd-work в папке сохранения (тот же диск,\nготовый файл переносится без копирования).")
+    parser.add_argument("--keep-temp", action="store_true", help="Не удалять рабочую папку задания после ошибки (для отладки).\nТакие папки удаляются при запусках ytrd через сутки.")
+    parser.add_argument("--skip-net-check", action="store_true", help="Не проверять подключение к интернету перед началом работы\n(анализ видео все равно выявит отсутствие сети).")
+    retry_group = parser.add_argument_group('Повторы при ошибках')
+    retry_group.add_argument("--retries", type=int, default=RetryPolicy.max_attempts, metavar="N", help="Сколько всего попыток делать при сетевой ошибке. По умолчанию: %(default)s")
+    retry_group.add_argument("--retry-deadline", type=float, default=0, metavar="SEC", help="Предельное время повторов одной стадии (0 — без ограничения).")
+    retry_group.add_argument("--ask-retry", action="store_true", help="Спрашивать о повторе после ошибки вместо автоматических повторов.")
+
+    parser.add_argument("--direct", action="store_true", help="Сборка за один проход: FFmpeg читает видео и оригинальный звук\nпрямо из источника, без промежуточного временного видео.\nДля потоков, которые источник отдает только частями (как YouTube),\nвидео скачивается обычным способом: иначе скорость ограничивается.")
+    parser.add_argument("--mix-segments", type=int, default=0, metavar="N", help="Режим Mix для длинных видео: кодировать звук N сегментами\nв параллельных процессах FFmpeg (0 — выключено).")
+    parser.add_argument("--audio-format", choices=AUDIO_FORMATS, default=AUDIO_FORMAT, help="Оригинальное аудио в режиме 'Только аудио': copy — дорожка YouTube (m4a/opus) без перекодирования (по умолчанию); mp3 — перекодирование в MP3.")
+    parser.add_argument("--mp4-layout", choices=MP4_LAYOUTS, default=MP4_LAYOUT, help="Раскладка итогового MP4: reserve — место под индекс в начале файла, одна запись (по умолчанию); faststart — перенос индекса вторым проходом; fragmented — фрагментированный MP4 для потоковых плееров; none — индекс в конце. Для MKV не применяется.")
+    parser.add_argument("--stream-audio", action="store_true", help="Передавать аудио перевода в FFmpeg напрямую из сети,\nбез временного файла. Сборка начинается до окончания загрузки аудио.")
+
+    metrics_group = parser.add_argument_group('Метрики')
+    metrics_group.add_argument("--metrics-json", metavar="PATH", help="Записать метрики стадий (время, байты, повторы, запросы к API) в JSON.\nС {id} или {index} в имени — отдельный файл на каждое задание.")
+    metrics_group.add_argument("--metrics-prom", metavar="PATH", help="Записать метрики в текстовый файл Prometheus\n(для textfile collector в node_exporter).")
+
+    batch_group = parser.add_argument_group('Пакетный режим')
+    batch_group.add_argument("-i", "--input", metavar="FILE", help="Файл со списком ссылок ('-' — читать из stdin).\nПовторы одного видео (youtu.be/ID, watch?v=ID, shorts/ID) обрабатываются один раз.")
+    batch_group.add_argument("--translate-workers", type=int, default=4, metavar="N", help="Число параллельных запросов анализа и API перевода. По умолчанию: 4")
+    batch_group.add_argument("--download-workers", type=int, default=2, metavar="N", help="Число параллельных загрузок. По умолчанию: 2")
+    batch_group.add_argument("--ffmpeg-workers", type=int, default=1, metavar="N", help="Число параллельных процессов FFmpeg. По умолчанию: 1")
+
+    serve_group = parser.add_argument_group('Режим сервера (ytrd serve)')
+    serve_group.add_argument("--host", default="127.0.0.1", help="Адрес HTTP API. По умолчанию: %(default)s")
+    serve_group.add_argument("--port", type=int, default=8765, help="Порт HTTP API (0 — любой свободный). По умолчанию: %(default)s")
+    serve_group.add_argument("--max-queue", type=int, default=100, metavar="N", help="Сколько незавершенных заданий принимать. По умолчанию: %(default)s")
     args = parser.parse_args()
 
     validate_args(args)
+    RETRY_POLICY.max_attempts = max(1, args.retries)
+    RETRY_POLICY.deadline = args.retry_deadline
+    RETRY_POLICY.interactive = args.ask_retry
+    cache.configure(args.cache_dir, info_ttl=args.info_cache_ttl,
+                    translation_bytes=args.translation_cache_mb * 1024 * 1024,
+                    translation_url_ttl=args.translation_url_ttl,
+                    media_bytes=int(args.media_cache_gb * 1024 ** 3))
+    metrics.configure(args.metrics_json, args.metrics_prom)
+    if args.work_dir is None:
+        args.work_dir = default_work_dir(args.output)
+    KEEP_TEMP = args.keep_temp
+    # Рабочие папки запусков, которые завершились аварийно (процесс-владелец уже не работает)
+    if reclaim_stale(args.work_dir):
+        print(f"{YELLOW}🧹 Удалены временные файлы прерванных запусков.{RESET}")
+
+    if args.url[:1] == ["serve"]:
+        if len(args.url) > 1:
+            parser.error("ytrd serve не принимает ссылки: задания передаются через HTTP API")
+        from .server import serve
+        serve(args)
+        return
 
     # --- Начальная настройка ---
-    install_check()
-    check_write_permissions(args.output)
-    cleanup()
+    # Проверки окружения идут в фоне, анализ видео не ждет их
+    preflight = start_preflight(args)
+
+    urls = args.url
+    if args.input:
+        # Список ссылок всегда обрабатывается пакетом, даже если в нем одно видео;
+        # ссылки читаются по мере поступления, задания начинаются сразу
+        skipped = []
+        urls = unique_video_urls(itertools.chain(urls, read_url_list(args.input)), skipped)
+        run_batch(urls, args, preflight, skipped)
+        return
+    if len(urls) > 1:
+        skipped = []
+        run_batch(unique_video_urls(urls, skipped), args, preflight, skipped)
+        return
+    args.url = urls[0] if urls else None
+    # Метрики одиночного задания; выгружаются при выходе в entry_point
+    job_metrics = metrics.JobMetrics(args.url)
+    metrics.set_default(job_metrics)
+
+    # Своя рабочая папка для временных файлов: параллельные запуски ytrd не мешают друг другу
+    workspace = CURRENT_WORKSPACE = Workspace(args.work_dir)
 
     # --- Шаг 1: Инфо о видео ---
     # Получаем всю информацию сразу (title, uploader, duration),
     # чтобы знать длительность видео для запроса перевода.
     # Это позволяет избежать лишних запросов и ошибок с несоответствием длины.
-    url, selected_quality, title, uploader, duration, language = get_user_input_and_info(args)
+    url, selected_quality, title, uploader, duration, language, session = get_user_input_and_info(args, preflight)
+    job_metrics.url, job_metrics.video_id = url, vot.get_video_id(url)
+    media_duration = duration  # Настоящая длительность (0, если неизвестна) — для раскладки MP4
     if not duration: duration = 341.0 # Fallback
 
     is_audio_only = (selected_quality == 'audio')
@@ -732,28 +1379,42 @@ def core_logic():
     skip_translation = False
 
     # Проверка языка видео
-    if language and (language.startswith('ru') or language == 'Russian'):
+    if is_russian(language):
         print(f"\n{YELLOW}⚠️  Видео определено как русскоязычное ({language}).{RESET}")
         if ask_yes_no(f"Скачать оригинал без перевода?"):
             skip_translation = True
         else:
             print(f"{YELLOW}Операция отменена.{RESET}")
+            job_metrics.finish("cancelled")
             cleanup()
             return
     
-    if not skip_translation:
-        # Сначала пробуем получить перевод. Это наиболее вероятная точка отказа.
-        label = "[1/2]" if is_audio_only else "[1/3]"
-        translation_success = get_translation_audio(url, duration, label)
+    translation_future = None
+    stream_audio_url = None
+    if not skip_translation and not is_audio_only and fetch_cached_translation(url, workspace.audio_path):
+        # Перевод уже есть в кэше — сразу переходим к видео и сборке
+        translation_success = True
+    elif not skip_translation:
+        if is_audio_only:
+            translation_success = get_translation_audio(url, duration, workspace.audio_path, "[1/2]")
+        else:
+            # Ожидание перевода может занимать минуты, поэтому запускаем его в фоне
+            # и параллельно скачиваем видео. Сборка начнется, когда готово и то и другое.
+            print(f"\n{YELLOW}[1/3] Запрос перевода...{RESET}")
+            # Аудио при --stream-audio не скачивается заранее: FFmpeg получит его прямо из сети
+            translation_future = start_translation(url, duration, None if args.stream_audio else workspace.audio_path)
     
     if is_audio_only:
         if skip_translation:
              print(f"\n{YELLOW}[1/1] Загрузка оригинального аудио...{RESET}")
-             name = f"{clean_name(uploader)} - {clean_name(title)} [Original].mp3"
+             ext = audio_extension(session, args.audio_format)
+             name = f"{clean_name(uploader)} - {clean_name(title)} [Original].{ext}"
              final_path = os.path.join(args.output, name)
              final_path = handle_existing_file(final_path)
              
-             if download_youtube_audio(url, final_path):
+             final_path = download_youtube_audio(url, final_path, session, args.audio_format)
+             if final_path:
+                 job_metrics.finish("done")
                  print(f"\n{GREEN}✅ Готово!{RESET}")
                  print(f"📂 {final_path}")
              else:
@@ -766,7 +1427,8 @@ def core_logic():
             final_path = handle_existing_file(final_path)
             
             try:
-                shutil.copy(TEMP_AUDIO, final_path)
+                save_output(workspace.audio_path, final_path)
+                job_metrics.finish("done")
                 print(f"\n{GREEN}✅ Готово!{RESET}")
                 print(f"📂 {final_path}")
             except Exception as e:
@@ -777,13 +1439,59 @@ def core_logic():
         cleanup()
         return
 
+    # Прямая сборка: FFmpeg читает видео и оригинальный звук прямо из источника,
+    # без промежуточного temp_video (одна запись на диск вместо двух).
+    sources = None
+    if args.direct and translation_future is not None:
+        print(f"\n{YELLOW}[2/3] Поиск прямых ссылок на потоки...{RESET}")
+        sources = resolve_source_streams(url, selected_quality, session)
+        if sources is None:
+            print(f"{YELLOW}⚠️ Потоки нельзя читать напрямую (фрагменты или загрузка частями), видео будет скачано.{RESET}")
+        else:
+            if not translation_future.done():
+                print(f"{YELLOW}⏳ Ожидание перевода...{RESET}")
+            translation_result = await_translation(translation_future)
+            translation_future = None
+            if args.stream_audio:
+                stream_audio_url = translation_result
+            translation_success = bool(translation_result)
+            if not translation_success:
+                # Без перевода сводить нечего — сохраняем оригинал обычной загрузкой
+                sources = None
+
+    if sources:
+        actual_height = sources['height']
+        current_path = sources['video_url']
+        ext = sources['ext']
+    else:
+        # Загружаем видео. Используем yt-dlp с прогресс-баром.
+        step_label = "[1/1]" if skip_translation else "[2/3]"
+        print(f"\n{YELLOW}{step_label} Загрузка видео...{RESET}")
+        # duration уже получен ранее (для перевода), но yt-dlp вернет точный
+        # current_path - это актуальный путь к файлу (temp_video.mkv или temp_video.mp4)
+        _, actual_height, current_path = download_video(url, workspace.video_path, selected_quality, session)
+
+        # Определяем расширение из реально созданного файла
+        if current_path.endswith('.mkv'):
+            ext = 'mkv'
+        else:
+            ext = 'mp4'
+
+    if translation_future is not None:
+        if not translation_future.done():
+            print(f"{YELLOW}⏳ Видео скачано, ожидание перевода...{RESET}")
+        translation_result = await_translation(translation_future)
+        if args.stream_audio:
+            stream_audio_url = translation_result
+        translation_success = bool(translation_result)
+
     if not translation_success and not skip_translation:
         # Перевод не найден, спрашиваем пользователя
         print(f"\n{YELLOW}⚠️ Перевод не найден.{RESET}")
         save_original = False
         while True:
             try:
-                choice = input(f"Скачать оригинальное видео? (y/n): ").lower().strip()
+                choice = input(f"Сохранить оригинальное видео? (y/n): ").lower().strip()
                 if choice in ('y', 'yes', 'д', 'да'):
                     save_original = True
                     break
@@ -793,31 +1501,11 @@ def core_logic():
                 break
         
         if not save_original:
+            job_metrics.finish("cancelled")
             cleanup()
             print("Отмена.")
             return
-
-    # Если перевод найден (или пользователь согласился качать оригинал),
-    # приступаем к загрузке видео. Используем yt-dlp с прогресс-баром.
-    step_label = "[2/3]"
-    if skip_translation:
-        step_label = "[1/1]"
-    elif not translation_success:
-        step_label = "[2/2]"
-
-    print(f"\n{YELLOW}{step_label} Загрузка видео...{RESET}")
-    # duration уже получен ранее (для перевода), но yt-dlp вернет точный
-    # current_path - это актуальный путь к файлу (temp_video.mkv или temp_video.mp4)
-    _, actual_height, current_path = download_video(url, TEMP_VIDEO, selected_quality)
     
-    # Определяем расширение из реально созданного файла
-    if current_path.endswith('.mkv'):
-        ext = 'mkv'
-    else:
-        ext = 'mp4'
-
-
-
     # Используем FFmpeg для объединения видео и аудио.
     # В зависимости от режима, либо просто копируем потоки, либо используем фильтр amix.
     if translation_success:
@@ -847,21 +1535,38 @@ def core_logic():
         # --- Проверка существования ---
         final_path = handle_existing_file(final_path)
         
-        # Передаем актуальный путь к временному видео и флаг формата
+        # Передаем актуальный путь к временному видео (или прямые ссылки на потоки) и флаг формата
+        source_args = {}
+        if sources:
+            source_args = {'orig_audio_path': sources['audio_url'], 'source_headers': sources['headers']}
         
-        cmd_list = build_ffmpeg_command(mode, final_path, is_mkv=(ext=='mkv'))
-        
-        # Подмена input файла в команде (TEMP_VIDEO -> current_path)
-        try:
-            # TEMP_VIDEO константа "temp_video.mp4". 
-            # build_ffmpeg_command добавляет её в список.
-            # Находим и заменяем на реальный путь.
-            idx = cmd_list.index(TEMP_VIDEO)
-            cmd_list[idx] = current_path
-        except ValueError:
-            pass 
-            
-        run_ffmpeg(cmd_list, duration, mode_name)
+        streamed = False
+        layout = args.mp4_layout
+        if stream_audio_url:
+            # Аудио перевода передается в FFmpeg через stdin, сборка начинается сразу
+            response = open_audio_stream(stream_audio_url)
+            cmd_list = build_ffmpeg_command(mode, final_path, is_mkv=(ext=='mkv'), video_path=current_path, audio_path='pipe:0',
+                                            layout=layout, duration=media_duration, **source_args)
+            try:
+                run_ffmpeg(cmd_list, duration, mode_name, stdin_chunks=response.iter_content(STREAM_CHUNK_SIZE))
+                streamed = True
+            except MoovSizeError:
+                # Та же оценка не поместится и при сборке из файла: индекс переносится вторым проходом
+                print(f"{YELLOW}⚠️ Не хватило места под индекс MP4, сборка из скачанного файла с faststart...{RESET}")
+                layout = 'faststart'
+                download_audio(stream_audio_url, workspace.audio_path)
+            except StreamInputError as e:
+                # Неполный файл не сохраняем: скачиваем перевод целиком и собираем заново
+                print(f"{YELLOW}⚠️ Поток аудио перевода оборвался ({e}), сборка из скачанного файла...{RESET}")
+                download_audio(stream_audio_url, workspace.audio_path)
+        if not streamed and can_mix_parallel(args, mode, duration, workspace.audio_path, sources):
+            run_parallel_mix(final_path, current_path, workspace.audio_path, duration, args.mix_segments,
+                             workspace.path, is_mkv=(ext=='mkv'), mode_name=mode_name,
+                             layout=layout if media_duration else 'faststart')
+        elif not streamed:
+            cmd_list = build_ffmpeg_command(mode, final_path, is_mkv=(ext=='mkv'), video_path=current_path, audio_path=workspace.audio_path,
+                                            layout=layout, duration=media_duration, **source_args)
+            run_ffmpeg(cmd_list, duration, mode_name)
     else:
         # Просто копируем скачанное видео
         # Если перевод не удался, режима нет (Original)
@@ -872,9 +1577,9 @@ def core_logic():
         # --- Проверка существования ---
         final_path = handle_existing_file(final_path)
         
-        print(f"Копирование файла в '{final_path}'...")
+        print(f"Перенос файла в '{final_path}'...")
         try:
-            shutil.copy(current_path, final_path)
+            save_output(current_path, final_path)
         except Exception as e:
              print(f"{RED}❌ Не удалось скопировать файл: {e}{RESET}")
 
@@ -882,9 +1587,11 @@ def core_logic():
     # --- Завершение ---
     cleanup()
     if os.path.exists(final_path):
+        job_metrics.finish("done")
         print(f"\n{GREEN}✅ Готово!{RESET}")
         print(f"📂 {final_path}")
     else:
+        job_metrics.finish("cancelled")
         print(f"\n{YELLOW}Операция отменена. Временные файлы удалены.{RESET}")
 
 def entry_point():
@@ -896,11 +1603,15 @@ def entry_point():
     try:
         core_logic()
     except KeyboardInterrupt:
+        metrics.finish_default("cancelled")
         cleanup()
         sys.exit(0)
     except Exception as e:
         print(f"{RED}Error: {e}{RESET}")
         cleanup(True)
+    finally:
+        # Задание, не дошедшее до успешного конца, считается неудачным
+        metrics.finish_default()
 
 if __name__ == "__main__":
     entry_point()
@@ -0,0 +1,225 @@
+"""Метрики стадий задания: время, байты, повторы и запросы к API.
+
+Стадии: analysis, translation_wait, translation_download, video_download, ffmpeg, finalize.
+Функции стадий помечаются декоратором timed(); метрики пишутся в задание, активное
+в текущем потоке (activate), а если его нет — в задание по умолчанию (одиночный режим,
+set_default). Без активного задания все функции модуля ничего не делают.
+
+Результаты выгружаются в JSON (--metrics-json) и в текстовый файл Prometheus
+(--metrics-prom) для node_exporter textfile collector.
+"""
+import contextlib
+import functools
+import json
+import os
+import threading
+import time
+from dataclasses import asdict, dataclass, field
+
+STAGES = ("analysis", "translation_wait", "translation_download", "video_download", "ffmpeg", "finalize")
+
+# Границы корзин гистограммы длительности стадий для Prometheus, сек
+BUCKETS = (1, 5, 15, 30, 60, 120, 300, 600, 1200, 1800)
+
+@dataclass
+class StageStats:
+    seconds: float = 0.0
+    calls: int = 0
+    bytes: int = 0
+    retries: int = 0
+    polls: int = 0
+
+@dataclass
+class JobMetrics:
+    """Метрики одного задания (одной ссылки)."""
+    url: str = None
+    video_id: str = None
+    status: str = "running"  # running / done / failed / cancelled
+    error: str = None
+    started: float = field(default_factory=time.time)
+    elapsed: float = 0.0
+    stages: dict = field(default_factory=dict)
+
+    def __post_init__(self):
+        self._lock = threading.Lock()
+        self._clock = time.monotonic()
+
+    def add(self, stage, **values):
+        """Прибавляет значения (seconds, calls, bytes, retries, polls) к стадии."""
+        with self._lock:
+            stats = self.stages.get(stage)
+            if stats is None:
+                stats = self.stages[stage] = StageStats()
+            for key, value in values.items():
+                setattr(stats, key, getattr(stats, key) + value)
+
+    def finish(self, status, error=None):
+        if self.status == "running":
+            self.status = status
+            self.error = error
+            self.elapsed = time.monotonic() - self._clock
+
+    def to_dict(self):
+        with self._lock:
+            stages = {name: asdict(stats) for name, stats in self.stages.items()}
+        for stats in stages.values():
+            stats['seconds'] = round(stats['seconds'], 3)
+        return {
+            'url': self.url, 'video_id': self.video_id, 'status': self.status, 'error': self.error,
+            'started': self.started, 'elapsed': round(self.elapsed, 3), 'stages': stages,
+        }
+
+# --- Текущее задание ---
+
+_local = threading.local()
+_default = None
+
+def set_default(job):
+    """Задание для потоков без activate() (одиночный режим, включая фоновые потоки)."""
+    global _default
+    _default = job
+
+def current():
+    return getattr(_local, 'job', None) or _default
+
+@contextlib.contextmanager
+def activate(job):
+    """Делает job текущим заданием потока на время блока (стадии пакетного режима)."""
+    previous = getattr(_local, 'job', None)
+    _local.job = job
+    try:
+        yield job
+    finally:
+        _local.job = previous
+
+def _stage_stack():
+    stack = getattr(_local, 'stages', None)
+    if stack is None:
+        stack = _local.stages = []
+    return stack
+
+def timed(stage):
+    """Декоратор функции стадии: считает вызовы и время в стадии текущего задания."""
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            job = current()
+            if job is None:
+                return func(*args, **kwargs)
+            stack = _stage_stack()
+            stack.append(stage)
+            started = time.monotonic()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                stack.pop()
+                job.add(stage, seconds=time.monotonic() - started, calls=1)
+        return wrapper
+    return decorator
+
+def add(stage=None, **values):
+    """Прибавляет значения к стадии текущего задания (по умолчанию — к выполняемой сейчас стадии)."""
+    job = current()
+    stage = stage or (_stage_stack() or [None])[-1]
+    if job is not None and stage:
+        job.add(stage, **values)
+
+def add_file_bytes(path, stage=None):
+    """Учитывает размер файла path как байты стадии."""
+    try:
+        add(stage, bytes=os.path.getsize(path))
+    except OSError:
+        pass
+
+# --- Выгрузка ---
+
+_targets = {'json': None, 'prometheus': None}
+
+def configure(json_path=None, prometheus_path=None):
+    _targets['json'] = json_path
+    _targets['prometheus'] = prometheus_path
+
+def enabled():
+    return bool(_targets['json'] or _targets['prometheus'])
+
+def _write_atomic(path, text):
+    # Сборщик метрик не должен увидеть недописанный файл
+    directory = os.path.dirname(os.path.abspath(path))
+    os.makedirs(directory, exist_ok=True)
+    tmp = f"{path}.{os.getpid()}.tmp"
+    with open(tmp, 'w', encoding='utf-8') as f:
+        f.write(text)
+    os.replace(tmp, path)
+
+def write_json(path, jobs, elapsed):
+    """Пишет метрики в JSON. Если в пути есть {id} или {index}, на каждое задание пишется свой файл."""
+    if '{id}' in path or '{index}' in path:
+        for index, job in enumerate(jobs, 1):
+            job_path = path.format(id=job.video_id or index, index=index)
+            _write_atomic(job_path, json.dumps(job.to_dict(), ensure_ascii=False, indent=2))
+        return
+    data = {'elapsed': round(elapsed, 3), 'jobs': [job.to_dict() for job in jobs]}
+    _write_atomic(path, json.dumps(data, ensure_ascii=False, indent=2))
+
+def _histogram(lines, name, label, values):
+    for le in BUCKETS:
+        lines.append(f'{name}_bucket{{{label},le="{le}"}} {sum(1 for v in values if v <= le)}')
+    lines.append(f'{name}_bucket{{{label},le="+Inf"}} {len(values)}')
+    lines.append(f'{name}_sum{{{label}}} {sum(values):.3f}')
+    lines.append(f'{name}_count{{{label}}} {len(values)}')
+
+def render_prometheus(jobs, elapsed):
+    """Метрики последнего запуска в формате Prometheus text exposition."""
+    dicts = [job.to_dict() for job in jobs]
+    lines = [
+        "# HELP ytrd_last_run_timestamp_seconds Время завершения последнего запуска ytrd.",
+        "# TYPE ytrd_last_run_timestamp_seconds gauge",
+        f"ytrd_last_run_timestamp_seconds {time.time():.0f}",
+        "# HELP ytrd_run_duration_seconds Длительность последнего запуска.",
+        "# TYPE ytrd_run_duration_seconds gauge",
+        f"ytrd_run_duration_seconds {elapsed:.3f}",
+        "# HELP ytrd_jobs Задания последнего запуска по статусу.",
+        "# TYPE ytrd_jobs gauge",
+    ]
+    for status in ("done", "failed", "cancelled"):
+        lines.append(f'ytrd_jobs{{status="{status}"}} {sum(1 for d in dicts if d["status"] == status)}')
+
+    lines += ["# HELP ytrd_stage_duration_seconds Время стадии в одном задании.",
+              "# TYPE ytrd_stage_duration_seconds histogram"]
+    for stage in STAGES:
+        values = [d['stages'][stage]['seconds'] for d in dicts if stage in d['stages']]
+        if values:
+            _histogram(lines, "ytrd_stage_duration_seconds", f'stage="{stage}"', values)
+    for metric, key, help_text in (
+        ("ytrd_stage_bytes", "bytes", "Байты, скачанные или записанные стадией."),
+        ("ytrd_stage_retries", "retries", "Повторы после ошибок на стадии."),
+        ("ytrd_stage_polls", "polls", "Запросы к API перевода на стадии."),
+    ):
+        lines += [f"# HELP {metric} {help_text}", f"# TYPE {metric} gauge"]
+        for stage in STAGES:
+            present = [d['stages'][stage][key] for d in dicts if stage in d['stages']]
+            if present:
+                lines.append(f'{metric}{{stage="{stage}"}} {sum(present)}')
+    return "\n".join(lines) + "\n"
+
+def export(jobs, elapsed=None):
+    """Выгружает метрики заданий в настроенные файлы. Ошибка записи не прерывает работу."""
+    if not enabled() or not jobs:
+        return
+    if elapsed is None:
+        elapsed = max(job.elapsed for job in jobs)
+    try:
+        if _targets['json']:
+            write_json(_targets['json'], jobs, elapsed)
+        if _targets['prometheus']:
+            _write_atomic(_targets['prometheus'], render_prometheus(jobs, elapsed))
+    except (OSError, KeyError, IndexError, ValueError) as e:
+        print(f"⚠️ Не удалось записать метрики: {e}")
+
+def finish_default(status="failed"):
+    """Завершает и выгружает задание одиночного режима (если оно было)."""
+    global _default
+    job, _default = _default, None
+    if job is not None:
+        job.finish(status)
+        export([job])
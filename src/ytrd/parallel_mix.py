@@ -0,0 +1,166 @@
+"""Параллельная сборка в режиме Mix для длинных видео.
+
+Обычный режим Mix кодирует весь звук одним процессом FFmpeg (amix + AAC на одном ядре).
+Здесь шкала времени делится на сегменты, и каждый сегмент (громкость, amix, AAC)
+кодирует свой процесс FFmpeg. Готовые сегменты склеиваются на уровне кадров AAC
+и собираются с копией видео.
+
+Стыки точны до сэмпла: границы сегментов кратны кадру AAC (1024 сэмпла), каждый
+сегмент кодируется с запасом кадров до и после границы (прогрев кодера), а при склейке
+из ADTS-потока сегмента берутся ровно кадры его интервала. Время в итоговой дорожке
+задается номером кадра, поэтому сдвигов и пропусков на стыках нет.
+"""
+import os
+import subprocess
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from .ffmpeg_monitor import FFmpegMonitor
+
+SAMPLE_RATE = 48000
+FRAME = 1024                 # Сэмплов в кадре AAC
+PRIMING_FRAMES = 1           # Кадр задержки кодера AAC FFmpeg в начале потока
+PREROLL_FRAMES = 4           # Запас кадров перед границей сегмента для прогрева кодера
+POSTROLL_FRAMES = 4          # Запас кадров после границы
+SEEK_MARGIN = 2.0            # Секунд до начала сегмента для быстрого (неточного) поиска во входе
+MIN_SEGMENT_SEC = 60         # Более короткие сегменты не окупают запуск процессов
+
+class MixError(Exception):
+    """Ошибка одного из процессов FFmpeg. log — последние строки его вывода."""
+
+    def __init__(self, message, cmd=None, log=()):
+        super().__init__(message)
+        self.cmd = cmd
+        self.log = list(log)
+
+def plan_segments(duration, segments, sample_rate=SAMPLE_RATE):
+    """Делит [0, duration) на интервалы в сэмплах с границами, кратными кадру AAC.
+
+    Последний интервал открыт (end=None): дорожка заканчивается там, где закончится более
+    короткий вход, как при amix=duration=shortest в обычном режиме.
+    """
+    segments = max(1, min(segments, int(duration // MIN_SEGMENT_SEC)))
+    total_frames = int(duration * sample_rate) // FRAME
+    step = max(1, total_frames // segments) * FRAME
+    bounds = [i * step for i in range(segments)]
+    return [(start, bounds[i + 1] if i + 1 < segments else None) for i, start in enumerate(bounds)]
+
+def segment_command(ffmpeg, orig_path, dub_path, out_path, start, end,
+                    orig_volume=0.2, dub_volume=1.2, bitrate='128k', sample_rate=SAMPLE_RATE):
+    """Команда FFmpeg, кодирующая смешанный звук интервала [start, end) сэмплов в ADTS с запасом кадров.
+
+    Возвращает (команда, сколько кадров пропустить в начале результата).
+    """
+    preroll = min(PREROLL_FRAMES, start // FRAME) * FRAME
+    first = start - preroll
+    seek = max(0.0, first / sample_rate - SEEK_MARGIN)
+    # Поиск во входе (-ss до -i) быстрый; точную границу задает atrim по отметкам времени в сэмплах
+    seek_samples = round(seek * sample_rate)
+    trim = f"start_sample={first - seek_samples}"
+    if end is not None:
+        trim += f":end_sample={end + POSTROLL_FRAMES * FRAME - seek_samples}"
+    chain = f"aresample={sample_rate},aformat=channel_layouts=stereo,atrim={trim},asetpts=PTS-STARTPTS"
+    filter_complex = (f"[0:a]{chain},volume={orig_volume}[orig];"
+                      f"[1:a]{chain},volume={dub_volume}[dub];"
+                      f"[orig][dub]amix=inputs=2:duration=shortest[out]")
+    cmd = [
+        ffmpeg, '-y', '-loglevel', 'error', '-progress', 'pipe:1', '-nostdin',
+        '-ss', f"{seek:.6f}", '-vn', '-i', orig_path,
+        '-ss', f"{seek:.6f}", '-i', dub_path,
+        '-filter_complex', filter_complex, '-map', '[out]',
+        '-c:a', 'aac', '-b:a', bitrate, '-ar', str(sample_rate), '-threads', '1',
+        '-f', 'adts', out_path,
+    ]
+    return cmd, PRIMING_FRAMES + preroll // FRAME
+
+def iter_adts_frames(data):
+    """Разбивает ADTS-поток на кадры (memoryview без копирования)."""
+    view = memoryview(data)
+    pos = 0
+    while pos + 7 <= len(view):
+        if view[pos] != 0xFF or view[pos + 1] & 0xF0 != 0xF0:
+            raise ValueError(f"Нет синхрослова ADTS на смещении {pos}")
+        length = ((view[pos + 3] & 0x03) << 11) | (view[pos + 4] << 3) | (view[pos + 5] >> 5)
+        if length < 7 or pos + length > len(view):
+            raise ValueError(f"Обрезанный кадр ADTS на смещении {pos}")
+        yield view[pos:pos + length]
+        pos += length
+
+def concat_segments(parts, out_path):
+    """Склеивает ADTS-сегменты, оставляя из каждого только кадры его интервала.
+
+    parts — список (путь, сколько кадров пропустить, сколько взять или None — до конца).
+    """
+    with open(out_path, 'wb') as out:
+        for path, skip, count in parts:
+            with open(path, 'rb') as f:
+                data = f.read()
+            for i, frame in enumerate(iter_adts_frames(data)):
+                if i < skip:
+                    continue
+                if count is not None and i >= skip + count:
+                    break
+                out.write(frame)
+
+def mux_command(ffmpeg, video_path, audio_path, final_path, is_mkv=False, mux_args=()):
+    cmd = [
+        ffmpeg, '-y', '-loglevel', 'error', '-progress', 'pipe:1', '-nostdin',
+        '-i', video_path, '-i', audio_path,
+        '-map', '0:v', '-map', '1:a', '-c', 'copy',
+    ]
+    if not is_mkv:
+        # mux_args — раскладка MP4 (см. main.mp4_layout_args)
+        cmd += ['-bsf:a', 'aac_adtstoasc', *mux_args]
+    cmd.append(final_path)
+    return cmd
+
+def run_process(cmd, on_progress=None):
+    """Запускает FFmpeg с монитором прогресса. При ошибке бросает MixError."""
+    proc = subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=subprocess.STDOUT,
+                            universal_newlines=True, bufsize=1, encoding='utf-8', errors='replace')
+    monitor = FFmpegMonitor(proc)
+    if on_progress:
+        monitor.subscribe(on_progress)
+    rc = monitor.start().wait()
+    if rc != 0:
+        raise MixError(f"FFmpeg завершился с кодом {rc}", cmd, monitor.log)
+
+def mix_parallel(ffmpeg, video_path, audio_path, final_path, duration, workdir, segments,
+                 is_mkv=False, orig_audio_path=None, on_progress=None, mux_args=()):
+    """Собирает видео в режиме Mix, кодируя звук сегментами параллельно.
+
+    orig_audio_path — отдельный источник оригинального звука (по умолчанию звук из видео).
+    on_progress(seconds) вызывается с суммой обработанных секунд по всем сегментам.
+    """
+    plan = plan_segments(duration, segments)
+    done = [0.0] * len(plan)
+    lock = threading.Lock()
+
+    def encode(index, start, end):
+        out_path = os.path.join(workdir, f"mix.{index:03d}.aac")
+        cmd, skip = segment_command(ffmpeg, orig_audio_path or video_path, audio_path, out_path, start, end)
+        preroll = (skip - PRIMING_FRAMES) * FRAME / SAMPLE_RATE
+
+        def progress(event):
+            # Запас кадров до границы не считаем, чтобы сумма сходилась с длительностью
+            with lock:
+                done[index] = max(0.0, event.out_time - preroll)
+                if on_progress:
+                    on_progress(sum(done))
+
+        run_process(cmd, progress)
+        count = (end - start) // FRAME if end is not None else None
+        return out_path, skip, count
+
+    # Каждый поток пула только ждет свой процесс FFmpeg: кодирование идет в отдельных процессах
+    with ThreadPoolExecutor(max_workers=len(plan), thread_name_prefix="ytrd-mix") as pool:
+        futures = [pool.submit(encode, i, start, end) for i, (start, end) in enumerate(plan)]
+        parts = [future.result() for future in futures]
+
+    mixed_path = os.path.join(workdir, "mix.aac")
+    concat_segments(parts, mixed_path)
+    for path, _, _ in parts:
+        try: os.remove(path)
+        except OSError: pass
+    run_process(mux_command(ffmpeg, video_path, mixed_path, final_path, is_mkv, mux_args))
+    return len(plan)
@@ -0,0 +1,418 @@
+"""Пакетный режим: конвейер задач с отдельным пулом воркеров на каждую стадию.
+
+Задание проходит стадии translate -> download -> ffmpeg. У каждой стадии свой
+ограниченный пул потоков, поэтому видео N+1 скачивается, пока видео N собирается FFmpeg.
+Конвейер можно использовать и как долгоживущий планировщик (ytrd serve):
+start(), затем submit()/cancel() по мере поступления заданий и close() в конце.
+"""
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+
+from . import cache, main, metrics, vot
+from .poller import TranslationPoller
+from .workspace import Workspace
+
+STAGES = ("translate", "download", "ffmpeg")
+
+# Стадия передала задание дальше сама (через колбэк), конвейеру ничего делать не нужно
+DEFERRED = object()
+
+@dataclass
+class Job:
+    """Состояние одного задания пакетного режима."""
+    index: int
+    url: str
+    title: str = None
+    uploader: str = None
+    duration: float = 0
+    media_duration: float = 0  # Длительность из анализа (0, если неизвестна); duration — с запасным значением
+    quality: object = None
+    skip_translation: bool = False
+    audio_url: str = None
+    translation_wait: float = None
+    translation_polls: int = 0
+    translated: bool = False
+    video_path: str = None
+    audio_path: str = None
+    actual_height: int = 0
+    sources: dict = None
+    session: object = None
+    workspace: Workspace = None
+    final_path: str = None
+    status: str = "pending"  # pending / running / done / failed / cancelled
+    stage: str = None        # Текущая или последняя стадия
+    error: str = None
+    options: object = None   # Настройки задания (argparse.Namespace); по умолчанию — настройки конвейера
+    cancelled: bool = False
+    cancel_event: threading.Event = field(default_factory=threading.Event)  # Прерывает загрузку видео и FFmpeg
+    translation_future: object = None
+    stage_times: dict = field(default_factory=dict)
+    ffmpeg_progress: object = None  # Последнее событие прогресса FFmpeg (ProgressEvent)
+    metrics: object = None  # Метрики стадий (metrics.JobMetrics)
+
+    @property
+    def tag(self):
+        return f"[#{self.index}]"
+
+class BatchPipeline:
+    """Запускает задания через пулы стадий и собирает статистику по времени."""
+
+    def __init__(self, options, translate_workers=4, download_workers=2, ffmpeg_workers=1):
+        self.options = options
+        sizes = {"translate": translate_workers, "download": download_workers, "ffmpeg": ffmpeg_workers}
+        self.pools = {
+            stage: ThreadPoolExecutor(max_workers=max(1, sizes[stage]), thread_name_prefix=f"ytrd-{stage}")
+            for stage in STAGES
+        }
+        self.poller = TranslationPoller(max_requests=translate_workers)
+        self.elapsed = 0.0
+        self.on_finish = None  # Колбэк on_finish(job) после завершения задания
+        self._pending = 0
+        self._last_index = 0
+        self._cond = threading.Condition()
+
+    def run(self, urls):
+        """Обрабатывает список ссылок и возвращает список заданий с результатами."""
+        start = time.monotonic()
+        self.start()
+        try:
+            jobs = [self.submit(url) for url in urls]
+            self.wait()
+        finally:
+            self.close()
+        self.elapsed = time.monotonic() - start
+        return jobs
+
+    def start(self):
+        self.poller.start()
+        return self
+
+    def submit(self, url, options=None):
+        """Ставит ссылку в конвейер. Возвращает Job, состояние которого меняется по ходу работы."""
+        with self._cond:
+            self._last_index += 1
+            self._pending += 1
+            job = Job(self._last_index, url, options=options or self.options,
+                      metrics=metrics.JobMetrics(url, vot.get_video_id(url)))
+        try:
+            job.workspace = Workspace(job.options.work_dir)
+        except OSError as e:
+            job.status = "failed"
+            job.error = f"рабочая папка: {e}"
+            self._finish(job)
+            return job
+        job.video_path = job.workspace.video_path
+        job.audio_path = job.workspace.audio_path
+        self._submit(STAGES[0], job)
+        return job
+
+    def cancel(self, job):
+        """Отменяет задание. False — если задание уже завершено.
+
+        Ожидание перевода, загрузка видео через yt-dlp и сборка FFmpeg прерываются сразу;
+        остальное (анализ, загрузка перевода, сегментный Mix) доработает, следующие стадии не начнутся.
+        """
+        if job.status in ("done", "failed", "cancelled"):
+            return False
+        job.cancelled = True
+        job.cancel_event.set()
+        if job.translation_future is not None:
+            # Ожидание перевода прерывается сразу
+            job.translation_future.cancel()
+        return True
+
+    @property
+    def pending(self):
+        return self._pending
+
+    def wait(self):
+        """Ждет завершения всех поставленных заданий."""
+        with self._cond:
+            while self._pending:
+                self._cond.wait()
+
+    def close(self):
+        self.poller.close()
+        for pool in self.pools.values():
+            pool.shutdown(wait=False)
+
+    def _submit(self, stage, job):
+        self.pools[stage].submit(self._run_stage, stage, job)
+
+    def _run_stage(self, stage, job):
+        if job.cancelled:
+            self._finish(job)
+            return
+        handler = getattr(self, f"_stage_{stage}")
+        job.stage = stage
+        job.status = "running"
+        started = time.monotonic()
+        next_stage = None
+        try:
+            with metrics.activate(job.metrics):
+                next_stage = handler(job)
+        except SystemExit:
+            # Функции одиночного режима завершают процесс при неустранимой ошибке
+            job.status = "failed"
+            job.error = job.error or f"остановлено на стадии {stage}"
+        except Exception as e:
+            job.status = "failed"
+            job.error = f"{stage}: {e}"
+        finally:
+            job.stage_times[stage] = job.stage_times.get(stage, 0.0) + time.monotonic() - started
+        if job.cancelled and job.status == "failed":
+            # Стадию прервала отмена: это не ошибка задания
+            job.status = "cancelled"
+            job.error = None
+
+        if next_stage is DEFERRED and job.status != "failed":
+            return
+        if next_stage and job.status != "failed" and not job.cancelled:
+            self._submit(next_stage, job)
+        else:
+            self._finish(job)
+
+    def _finish(self, job):
+        if job.status != "failed":
+            job.status = "cancelled" if job.cancelled and not job.final_path else "done"
+        job.metrics.finish(job.status, job.error)
+        if job.session is not None:
+            job.session.close()
+            job.session = None
+        self._cleanup_job(job)
+        if job.status == "done":
+            print(f"{main.GREEN}✅ {job.tag} Готово: {job.final_path}{main.RESET}")
+        elif job.status == "cancelled":
+            print(f"{main.YELLOW}{job.tag} Отменено.{main.RESET}")
+        else:
+            print(f"{main.RED}❌ {job.tag} Ошибка: {job.error}{main.RESET}")
+        if self.on_finish:
+            self.on_finish(job)
+        with self._cond:
+            self._pending -= 1
+            self._cond.notify_all()
+
+    def _cleanup_job(self, job):
+        """Удаляет рабочую папку только этого задания (с --keep-temp после ошибки оставляет)."""
+        if job.workspace is None:
+            return
+        if job.status == "failed" and job.options.keep_temp:
+            print(f"{main.YELLOW}{job.tag} Временные файлы оставлены для проверки: {job.workspace.path}{main.RESET}")
+            job.workspace.release()
+            return
+        job.workspace.cleanup()
+
+    # --- Стадии ---
+
+    def _stage_translate(self, job):
+        """Анализ видео и ожидание готовности перевода."""
+        opts = job.options
+        job.session = main.VideoSession(job.url, cancel=job.cancel_event)
+        qualities, job.title, job.uploader, duration, language = main.get_available_qualities(job.url, job.session)
+        job.media_duration = duration or 0
+        job.duration = duration or 341.0
+
+        if opts.audio:
+            job.quality = 'audio'
+        elif opts.quality and opts.quality in qualities:
+            job.quality = opts.quality
+        elif qualities:
+            job.quality = qualities[0]
+
+        if main.is_russian(language):
+            print(f"{main.YELLOW}{job.tag} Видео на русском, перевод не требуется.{main.RESET}")
+            job.skip_translation = True
+            return "download"
+
+        if main.fetch_cached_translation(job.url, job.audio_path):
+            job.translated = True
+            return "download"
+        store = cache.get_translation_store()
+        job.audio_url = store.get_url(vot.get_video_id(job.url))
+        if job.audio_url:
+            return "download"
+
+        # Ожидание перевода не занимает поток пула: задание вернется в конвейер из колбэка
+        print(f"{main.YELLOW}{job.tag} Запрос перевода...{main.RESET}")
+        future = job.translation_future = self.poller.submit(job.url, job.duration)
+        if job.cancelled:
+            future.cancel()
+        future.add_done_callback(lambda f: self._on_translation(job, f))
+        return DEFERRED
+
+    def _on_translation(self, job, future):
+        """Вызывается, когда ожидание перевода задания завершилось."""
+        job.translation_future = None
+        if job.cancelled:
+            self._finish(job)
+            return
+        try:
+            result = future.result()
+        except Exception as e:
+            job.status = "failed"
+            job.error = f"translate: {e}"
+            self._finish(job)
+            return
+        job.translation_wait = result.waited
+        job.translation_polls = result.polls
+        job.metrics.add("translation_wait", seconds=result.waited, calls=1, polls=result.polls)
+        job.stage_times["translate"] = job.stage_times.get("translate", 0.0) + result.waited
+        job.audio_url = main.report_translation_result(result, prefix=f"{job.tag} ")
+        cache.get_translation_store().put_url(vot.get_video_id(job.url), job.audio_url)
+        self._submit("download", job)
+
+    def _stage_download(self, job):
+        """Загрузка аудио перевода и исходного видео."""
+        opts = job.options
+        if job.audio_url and not job.translated:
+            # В режиме --stream-audio аудио для видео не скачивается: FFmpeg читает его из сети
+            if job.quality == 'audio' or not job.options.stream_audio:
+                main.download_audio(job.audio_url, job.audio_path)
+                main.store_translation(job.url, job.audio_path)
+            job.translated = True
+
+        name_base = f"{main.clean_name(job.uploader)} - {main.clean_name(job.title)}"
+        if job.quality == 'audio':
+            if job.translated:
+                return "ffmpeg"
+            if not job.skip_translation:
+                job.status = "failed"
+                job.error = "перевод не найден"
+                return None
+            ext = main.audio_extension(job.session, opts.audio_format)
+            path = main.next_free_path(os.path.join(opts.output, f"{name_base} [Original].{ext}"))
+            path = main.download_youtube_audio(job.url, path, job.session, opts.audio_format)
+            if not path:
+                job.status = "failed"
+                job.error = "не удалось скачать аудио"
+                return None
+            job.final_path = path
+            return None
+
+        if not job.translated and not job.skip_translation:
+            print(f"{main.YELLOW}{job.tag} ⚠️ Перевод не найден, будет сохранен оригинал.{main.RESET}")
+
+        if job.translated and job.options.direct:
+            job.sources = main.resolve_source_streams(job.url, job.quality, job.session)
+            if job.sources:
+                job.actual_height = job.sources['height']
+                return "ffmpeg"
+
+        _, job.actual_height, job.video_path = main.download_video(job.url, job.video_path, job.quality, job.session)
+        return "ffmpeg"
+
+    def _stage_ffmpeg(self, job):
+        """Сборка итогового файла или сохранение оригинала."""
+        opts = job.options
+        name_base = f"{main.clean_name(job.uploader)} - {main.clean_name(job.title)}"
+
+        if job.quality == 'audio':
+            final_path = main.next_free_path(os.path.join(opts.output, f"{name_base} [AudioTranslation].mp3"))
+            main.save_output(job.audio_path, final_path)
+            job.final_path = final_path
+            return None
+
+        if job.sources:
+            ext = job.sources['ext']
+            video_path = job.sources['video_url']
+            source_args = {'orig_audio_path': job.sources['audio_url'], 'source_headers': job.sources['headers']}
+        else:
+            ext = 'mkv' if job.video_path.endswith('.mkv') else 'mp4'
+            video_path = job.video_path
+            source_args = {}
+        res_str = f"[{job.actual_height}p]" if job.actual_height else ""
+
+        if not job.translated:
+            final_path = main.next_free_path(os.path.join(opts.output, f"{name_base} {res_str}.{ext}"))
+            main.save_output(job.video_path, final_path)
+            job.final_path = final_path
+            return None
+
+        mode = 3 if opts.dual else 2
+        mode_tag = {2: "Mix", 3: "Dual"}[mode]
+        final_path = main.next_free_path(os.path.join(opts.output, f"{name_base} {res_str}[{mode_tag}].{ext}"))
+        layout = opts.mp4_layout
+        if opts.stream_audio and not os.path.exists(job.audio_path):
+            response = main.open_audio_stream(job.audio_url)
+            cmd_list = main.build_ffmpeg_command(mode, final_path, is_mkv=(ext == 'mkv'),
+                                                 video_path=video_path, audio_path='pipe:0',
+                                                 layout=layout, duration=job.media_duration, **source_args)
+            try:
+                main.run_ffmpeg(cmd_list, job.duration, f"{job.tag} {mode_tag.upper()}",
+                                stdin_chunks=response.iter_content(main.STREAM_CHUNK_SIZE),
+                                on_progress=lambda event: setattr(job, 'ffmpeg_progress', event),
+                                cancel=job.cancel_event)
+                job.final_path = final_path
+                return None
+            except main.MoovSizeError:
+                # Та же оценка не поместится и при сборке из файла: индекс переносится вторым проходом
+                print(f"{main.YELLOW}{job.tag} ⚠️ Не хватило места под индекс MP4, сборка из файла с faststart...{main.RESET}")
+                layout = 'faststart'
+                main.download_audio(job.audio_url, job.audio_path)
+            except main.StreamInputError as e:
+                # Неполный файл не сохраняем: скачиваем перевод целиком и собираем заново
+                print(f"{main.YELLOW}{job.tag} ⚠️ Поток аудио перевода оборвался ({e}), сборка из файла...{main.RESET}")
+                main.download_audio(job.audio_url, job.audio_path)
+
+        if main.can_mix_parallel(opts, mode, job.duration, job.audio_path, job.sources):
+            main.run_parallel_mix(final_path, video_path, job.audio_path, job.duration, opts.mix_segments,
+                                  job.workspace.path, is_mkv=(ext == 'mkv'), mode_name=f"{job.tag} {mode_tag.upper()}",
+                                  layout=layout if job.media_duration else 'faststart')
+        else:
+            cmd_list = main.build_ffmpeg_command(mode, final_path, is_mkv=(ext == 'mkv'),
+                                                 video_path=video_path, audio_path=job.audio_path,
+                                                 layout=layout, duration=job.media_duration, **source_args)
+            main.run_ffmpeg(cmd_list, job.duration, f"{job.tag} {mode_tag.upper()}",
+                            on_progress=lambda event: setattr(job, 'ffmpeg_progress', event),
+                            cancel=job.cancel_event)
+        job.final_path = final_path
+        return None
+
+    # --- Итоги ---
+
+    def print_summary(self, jobs):
+        """Печатает итоговую статистику: производительность и время по стадиям."""
+        done = [job for job in jobs if job.status == "done"]
+        failed = [job for job in jobs if job.status == "failed"]
+        cancelled = [job for job in jobs if job.status == "cancelled"]
+        hours = self.elapsed / 3600 if self.elapsed else 0
+        rate = len(done) / hours if hours else 0.0
+
+        print(f"\n{main.CYAN}=== Итоги пакета ==={main.RESET}")
+        print(f"Заданий: {len(jobs)}, успешно: {len(done)}, с ошибкой: {len(failed)}"
+              + (f", отменено: {len(cancelled)}" if cancelled else ""))
+        print(f"Общее время: {self.elapsed:.1f} с, производительность: {rate:.1f} заданий/час")
+        for stage in STAGES:
+            times = [job.stage_times[stage] for job in jobs if stage in job.stage_times]
+            if not times:
+                continue
+            total = sum(times)
+            print(f"  {stage:<10} всего {total:8.1f} с, в среднем {total / len(times):6.1f} с, макс {max(times):6.1f} с")
+        waits = [job for job in jobs if job.translation_wait is not None]
+        if waits:
+            print("Ожидание перевода:")
+            for job in waits:
+                print(f"  {job.tag} {job.translation_wait:6.1f} с, запросов: {job.translation_polls}")
+        muxed = [job for job in jobs if job.ffmpeg_progress and job.ffmpeg_progress.speed]
+        if muxed:
+            print("Сборка FFmpeg:")
+            for job in muxed:
+                event = job.ffmpeg_progress
+                size = f", {event.total_size / 1024 ** 2:.1f} МБ" if event.total_size else ""
+                print(f"  {job.tag} скорость x{event.speed:.1f}{size}")
+
+    def print_report(self, jobs, skipped=()):
+        """Итог по каждой ссылке: файл результата, ошибка или причина пропуска."""
+        print(f"\n{main.CYAN}=== Результаты по ссылкам ==={main.RESET}")
+        for job in jobs:
+            if job.status == "done":
+                print(f"{main.GREEN}  ✅ {job.url} -> {job.final_path}{main.RESET}")
+            elif job.status == "cancelled":
+                print(f"{main.YELLOW}  ⏹ {job.url}: отменено{main.RESET}")
+            else:
+                print(f"{main.RED}  ❌ {job.url}: {job.error}{main.RESET}")
+        for url, reason in skipped:
+            print(f"{main.YELLOW}  ⏭ {url}: {reason}{main.RESET}")
@@ -0,0 +1,146 @@
+"""Асинхронный опрос API перевода.
+
+Один цикл событий отслеживает сколько угодно заданий в статусе "Waiting".
+Поток занимается только на время самого HTTP-запроса (vot.translate_video
+синхронный), а ожидание между запросами — это asyncio.sleep без потоков.
+Интервал опроса подбирается для каждого задания: стартует от длительности видео,
+растет с каждым ответом "Waiting" и слегка рандомизируется (jitter), чтобы
+задания пакета не опрашивали API синхронно.
+"""
+import asyncio
+import random
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+
+from . import vot
+
+MIN_INTERVAL = 5.0      # Минимальная пауза между запросами, сек
+MAX_INTERVAL = 60.0     # Максимальная пауза между запросами, сек
+BACKOFF = 1.3           # Множитель паузы после каждого ответа "Waiting"
+JITTER = 0.2            # Случайное отклонение паузы (+-20%)
+MIN_TIMEOUT = 300.0     # Минимальное время ожидания перевода (5 минут)
+MAX_TIMEOUT = 1800.0    # Максимальное время ожидания перевода (30 минут)
+STOP_CHECK = 0.5        # Как часто пауза между запросами проверяет флаг остановки, сек
+
+@dataclass
+class PollResult:
+    """Итог ожидания перевода одного видео."""
+    url: str
+    status: str             # Ready / Error / Unknown / Timeout / Cancelled
+    audio_url: str = None
+    message: str = None
+    waited: float = 0.0     # Сколько секунд прошло до финального ответа
+    polls: int = 0          # Сколько запросов к API было сделано
+
+    @property
+    def ready(self):
+        return self.status == "Ready" and bool(self.audio_url)
+
+def initial_interval(duration):
+    """Стартовая пауза: длинные видео переводятся дольше, их нет смысла опрашивать часто."""
+    return min(max((duration or 0) / 30.0, MIN_INTERVAL), MAX_INTERVAL)
+
+def default_timeout(duration):
+    """Предельное время ожидания: не меньше 5 минут и не больше 30, в среднем — длительность видео."""
+    return min(max(float(duration or 0), MIN_TIMEOUT), MAX_TIMEOUT)
+
+class TranslationPoller:
+    """Опрашивает vot.translate_video для множества заданий из одного цикла событий.
+
+    max_requests ограничивает число одновременных HTTP-запросов (и потоков под них).
+    Для использования из обычного (синхронного) кода цикл запускается в фоновом
+    потоке через start(), а задания отправляются через submit().
+    """
+
+    def __init__(self, max_requests=4, timeout=None, translate=None):
+        self.timeout = timeout
+        self._translate = translate or vot.translate_video
+        self._executor = ThreadPoolExecutor(max_workers=max(1, max_requests), thread_name_prefix="ytrd-poll")
+        self._loop = None
+        self._thread = None
+
+    async def poll(self, url, duration, on_wait=None, stop=None):
+        """Ждет готовности перевода. on_wait(polls, waited, next_interval) вызывается на каждом "Waiting".
+
+        stop — threading.Event: если он выставлен, ожидание прекращается со статусом "Cancelled".
+        """
+        loop = asyncio.get_running_loop()
+        started = loop.time()
+        deadline = started + (self.timeout or default_timeout(duration))
+        interval = initial_interval(duration)
+        polls = 0
+
+        while True:
+            if stop is not None and stop.is_set():
+                return PollResult(url, "Cancelled", None, "Ожидание перевода остановлено", loop.time() - started, polls)
+            result = await loop.run_in_executor(self._executor, self._translate, url, duration)
+            polls += 1
+            waited = loop.time() - started
+            status = result.get("status")
+
+            if not result.get("success") or status != "Waiting":
+                return PollResult(url, status or "Error", result.get("url"), result.get("message"), waited, polls)
+
+            # Если API сообщил оставшееся время, раньше него спрашивать бессмысленно
+            remaining = result.get("remaining_time")
+            base = min(max(remaining, MIN_INTERVAL), MAX_INTERVAL) if remaining and remaining > 0 else interval
+            delay = base * random.uniform(1 - JITTER, 1 + JITTER)
+            if loop.time() + delay > deadline:
+                return PollResult(url, "Timeout", None, "Время ожидания перевода истекло", waited, polls)
+
+            if on_wait:
+                on_wait(polls, waited, delay)
+            await self._sleep(delay, stop)
+            interval = min(interval * BACKOFF, MAX_INTERVAL)
+
+    @staticmethod
+    async def _sleep(delay, stop):
+        """Пауза между запросами; с stop прерывается не позже чем через STOP_CHECK секунд."""
+        if stop is None:
+            await asyncio.sleep(delay)
+            return
+        end = asyncio.get_running_loop().time() + delay
+        while not stop.is_set():
+            left = end - asyncio.get_running_loop().time()
+            if left <= 0:
+                return
+            await asyncio.sleep(min(left, STOP_CHECK))
+
+    async def poll_many(self, items):
+        """Ждет перевод для списка пар (url, duration). Возвращает PollResult в том же порядке."""
+        return await asyncio.gather(*(self.poll(url, duration) for url, duration in items))
+
+    # --- Фоновый цикл событий ---
+
+    def start(self):
+        """Запускает цикл событий в фоновом потоке."""
+        if self._loop is None:
+            self._loop = asyncio.new_event_loop()
+            self._thread = threading.Thread(target=self._loop.run_forever, name="ytrd-poller", daemon=True)
+            self._thread.start()
+        return self
+
+    def submit(self, url, duration, on_wait=None):
+        """Ставит видео на ожидание перевода. Возвращает concurrent.futures.Future с PollResult."""
+        if self._loop is None:
+            self.start()
+        return asyncio.run_coroutine_threadsafe(self.poll(url, duration, on_wait), self._loop)
+
+    def close(self):
+        """Останавливает фоновый цикл и пул потоков запросов."""
+        if self._loop is not None:
+            self._loop.call_soon_threadsafe(self._loop.stop)
+            self._thread.join()
+            self._loop.close()
+            self._loop = None
+            self._thread = None
+        self._executor.shutdown(wait=False)
+
+def poll_translation(url, duration, on_wait=None, timeout=None, stop=None):
+    """Синхронная обертка: ждет перевод одного видео (stop — см. TranslationPoller.poll)."""
+    poller = TranslationPoller(max_requests=1, timeout=timeout)
+    try:
+        return asyncio.run(poller.poll(url, duration, on_wait, stop))
+    finally:
+        poller.close()
@@ -0,0 +1,355 @@
+"""Компактный кодек protobuf по декларативным схемам (без protoc).
+
+Декодирование ленивое и без копий: сообщение ссылается на исходный буфер и при первом
+обращении к полю один раз проходит по нему, запоминая только смещения. Значение
+декодируется при обращении к полю; вложенное сообщение — такое же ленивое представление
+над тем же буфером, строки и bytes читаются через memoryview. Повторяющиеся поля собираются в списки, неизвестные поля
+пропускаются по своему wire type, а неподдерживаемый wire type или обрезанные данные
+дают DecodeError, а не тихую рассинхронизацию разбора.
+
+Кодирование в два прохода: сначала считается размер сообщения (с вложенными), затем
+оно пишется в один заранее выделенный bytearray.
+"""
+import struct
+
+VARINT, I64, LEN, I32 = 0, 1, 2, 5
+
+# Тип поля -> wire type
+KINDS = {
+    'int32': VARINT, 'int64': VARINT, 'uint32': VARINT, 'uint64': VARINT, 'bool': VARINT, 'enum': VARINT,
+    'double': I64, 'fixed64': I64,
+    'float': I32, 'fixed32': I32,
+    'string': LEN, 'bytes': LEN, 'message': LEN,
+}
+_STRUCTS = {'double': struct.Struct('<d'), 'fixed64': struct.Struct('<Q'),
+            'float': struct.Struct('<f'), 'fixed32': struct.Struct('<I')}
+
+class DecodeError(ValueError):
+    pass
+
+class Field:
+    """Описание поля: номер, имя, тип из KINDS; для 'message' — схема вложенного сообщения."""
+
+    __slots__ = ('number', 'name', 'kind', 'repeated', 'schema', 'wire_type', 'tag')
+
+    def __init__(self, number, name, kind, repeated=False, schema=None):
+        if kind not in KINDS:
+            raise ValueError(f"Неизвестный тип поля protobuf: {kind}")
+        if kind == 'message' and schema is None:
+            raise ValueError(f"Для поля-сообщения {name} нужна схема")
+        self.number = number
+        self.name = name
+        self.kind = kind
+        self.repeated = repeated
+        self.schema = schema
+        self.wire_type = KINDS[kind]
+        self.tag = _encode_varint(number << 3 | self.wire_type)
+
+class Schema:
+    """Схема сообщения: набор полей с доступом по номеру и по имени."""
+
+    def __init__(self, name, fields):
+        self.name = name
+        self.fields = tuple(fields)
+        self.by_number = {f.number: f for f in self.fields}
+        self.by_name = {f.name: f for f in self.fields}
+        # Свой подкласс Message со свойствами полей: msg.status без __getattr__
+        attrs = {f.name: property(_field_getter(f.name)) for f in self.fields}
+        attrs['__slots__'] = ()
+        self.message_class = type(name, (Message,), attrs)
+
+    def decode(self, data):
+        """Ленивое сообщение поверх data (bytes, bytearray или memoryview) без копирования."""
+        return self.message_class(self, data)
+
+    def encode(self, values):
+        """Кодирует словарь {имя поля: значение} в один bytearray.
+
+        Поля пишутся в порядке словаря. None означает отсутствие поля; нули и пустые
+        строки записываются явно. Вложенные сообщения — словари, повторяющиеся поля — списки.
+        """
+        sizes = {}
+        buf = bytearray(_message_size(self, values, sizes))
+        end = _write_message(self, values, buf, 0, sizes)
+        assert end == len(buf)
+        return buf
+
+    def __repr__(self):
+        return f"<Schema {self.name}>"
+
+# --- Декодирование ---
+
+def _field_getter(name):
+    return lambda message: message.get(name)
+
+def read_varint(data, pos):
+    result = 0
+    shift = 0
+    try:
+        while True:
+            b = data[pos]
+            result |= (b & 0x7f) << shift
+            pos += 1
+            if not b & 0x80:
+                return result, pos
+            shift += 7
+            if shift >= 70:
+                raise DecodeError("Слишком длинный varint")
+    except IndexError:
+        raise DecodeError("Обрезанный varint") from None
+
+def scan(data, pos, end):
+    """Один проход по сообщению в data[pos:end]: {номер поля: [(wire type, начало, конец), ...]}."""
+    index = {}
+    try:
+        while pos < end:
+            tag = data[pos]
+            if tag < 0x80:
+                pos += 1
+            else:
+                tag, pos = read_varint(data, pos)
+            number, wire_type = tag >> 3, tag & 0x07
+            if number == 0:
+                raise DecodeError(f"Поле с номером 0 на смещении {pos}")
+            start = pos
+            if wire_type == VARINT:
+                while data[pos] & 0x80:
+                    pos += 1
+                pos += 1
+            elif wire_type == LEN:
+                length = data[pos]
+                if length < 0x80:
+                    start = pos + 1
+                else:
+                    length, start = read_varint(data, pos)
+                pos = start + length
+            elif wire_type == I64:
+                pos += 8
+            elif wire_type == I32:
+                pos += 4
+            else:
+                raise DecodeError(f"Неподдерживаемый wire type {wire_type} у поля {number}")
+            if pos > end:
+                raise DecodeError(f"Обрезанное поле {number}")
+            entries = index.get(number)
+            if entries is None:
+                index[number] = [(wire_type, start, pos)]
+            else:
+                entries.append((wire_type, start, pos))
+    except IndexError:
+        raise DecodeError("Обрезанное сообщение") from None
+    return index
+
+class Message:
+    """Ленивое представление сообщения поверх исходного буфера.
+
+    Поля доступны как атрибуты (msg.status) или через get(); отсутствующее поле — None
+    (для повторяющегося — пустой список). Поля типа bytes возвращаются как memoryview.
+    Вложенные сообщения ссылаются на тот же буфер по смещениям и ничего не копируют.
+    """
+
+    __slots__ = ('schema', '_data', '_view', '_start', '_end', '_index', '_cache')
+
+    def __init__(self, schema, data, start=0, end=None, view=None):
+        self.schema = schema
+        self._data = data
+        self._view = view
+        self._start = start
+        self._end = len(data) if end is None else end
+        self._index = None
+        self._cache = {}
+
+    def _fields(self):
+        if self._index is None:
+            self._index = scan(self._data, self._start, self._end)
+        return self._index
+
+    def _memory(self):
+        # Один memoryview на весь буфер, общий для вложенных сообщений
+        if self._view is None:
+            self._view = memoryview(self._data)
+        return self._view
+
+    def _decode(self, field, wire_type, start, end):
+        if wire_type == VARINT:
+            b = self._data[start]
+            value = b if b < 0x80 else read_varint(self._data, start)[0]
+            if field.kind == 'bool':
+                return bool(value)
+            if value >= 1 << 63 and field.kind in ('int32', 'int64', 'enum'):
+                value -= 1 << 64
+            return value
+        if wire_type == LEN:
+            if field.kind == 'string':
+                return str(self._memory()[start:end], 'utf-8')
+            if field.kind == 'bytes':
+                return self._memory()[start:end]
+            return field.schema.message_class(field.schema, self._data, start, end, self._view)
+        return _STRUCTS[field.kind].unpack_from(self._data, start)[0]
+
+    def _decode_packed(self, field, start, end):
+        """Упакованное повторяющееся скалярное поле (packed repeated)."""
+        values = []
+        if field.wire_type == VARINT:
+            pos = start
+            while pos < end:
+                item = pos
+                _, pos = read_varint(self._data, pos)
+                values.append(self._decode(field, VARINT, item, pos))
+        else:
+            packer = _STRUCTS[field.kind]
+            if (end - start) % packer.size:
+                raise DecodeError(f"Неверная длина упакованного поля {field.name}")
+            values.extend(v[0] for v in packer.iter_unpack(self._memory()[start:end]))
+        return values
+
+    def get(self, name, default=None):
+        cache = self._cache
+        if name in cache:
+            return cache[name]
+        field = self.schema.by_name.get(name)
+        if field is None:
+            raise KeyError(f"{self.schema.name} не содержит поля {name}")
+        index = self._index if self._index is not None else self._fields()
+        entries = index.get(field.number)
+        if not entries:
+            return [] if field.repeated else default
+        if not field.repeated:
+            # Обычный случай: одиночное поле встречается один раз
+            wire_type, start, end = entries[-1]
+            if wire_type == field.wire_type:
+                value = cache[name] = self._decode(field, wire_type, start, end)
+                return value
+
+        values = []
+        for wire_type, start, end in entries:
+            if wire_type == field.wire_type:
+                values.append(self._decode(field, wire_type, start, end))
+            elif wire_type == LEN and field.repeated and field.wire_type != LEN:
+                values.extend(self._decode_packed(field, start, end))
+            else:
+                raise DecodeError(f"Поле {self.schema.name}.{name}: wire type {wire_type} вместо {field.wire_type}")
+        # Для одиночного поля, встреченного несколько раз, действует последнее значение
+        value = values if field.repeated else values[-1]
+        cache[name] = value
+        return value
+
+    def has(self, name):
+        return self.schema.by_name[name].number in self._fields()
+
+    def unknown_fields(self):
+        """Номера полей, которых нет в схеме (для отладки новых версий API)."""
+        return sorted(n for n in self._fields() if n not in self.schema.by_number)
+
+    def to_dict(self):
+        """Полное (не ленивое) декодирование в словарь, включая вложенные сообщения."""
+        result = {}
+        for field in self.schema.fields:
+            if not self.has(field.name):
+                continue
+            value = self.get(field.name)
+            if field.kind == 'message':
+                value = [v.to_dict() for v in value] if field.repeated else value.to_dict()
+            elif field.kind == 'bytes':
+                value = [bytes(v) for v in value] if field.repeated else bytes(value)
+            result[field.name] = value
+        return result
+
+    def __repr__(self):
+        return f"<{self.schema.name} {self.to_dict()!r}>"
+
+# --- Кодирование ---
+
+def varint_size(value):
+    if value < 0:
+        return 10
+    if value < 0x80:
+        return 1
+    return (value.bit_length() + 6) // 7
+
+def write_varint(buf, pos, value):
+    if value < 0:
+        value += 1 << 64
+    while value > 0x7f:
+        buf[pos] = (value & 0x7f) | 0x80
+        value >>= 7
+        pos += 1
+    buf[pos] = value
+    return pos + 1
+
+def _encode_varint(value):
+    buf = bytearray(varint_size(value))
+    write_varint(buf, 0, value)
+    return bytes(buf)
+
+def _message_size(schema, values, sizes):
+    """Размер сообщения в байтах. Размеры вложенных сообщений и байты строк запоминаются в sizes."""
+    total = 0
+    by_name = schema.by_name
+    for name, value in values.items():
+        if value is None:
+            continue
+        field = by_name.get(name)
+        if field is None:
+            raise ValueError(f"{schema.name} не содержит поля {name}")
+        tag_size = len(field.tag)
+        for item in (value if field.repeated else (value,)):
+            wire_type = field.wire_type
+            if wire_type == VARINT:
+                item = int(item)
+                size = 1 if 0 <= item < 0x80 else varint_size(item)
+            elif wire_type == LEN:
+                if field.kind == 'string':
+                    # ASCII-строки пишутся как есть, остальные кодируются один раз здесь
+                    if not item.isascii():
+                        sizes[id(item)] = item = item.encode('utf-8')
+                    size = len(item)
+                elif field.kind == 'message':
+                    size = _message_size(field.schema, item, sizes)
+                else:
+                    size = len(item)
+                size += 1 if size < 0x80 else varint_size(size)
+            else:
+                size = 8 if wire_type == I64 else 4
+            total += tag_size + size
+    sizes[id(values)] = total
+    return total
+
+def _write_message(schema, values, buf, pos, sizes):
+    # Поля уже проверены в _message_size
+    by_name = schema.by_name
+    for name, value in values.items():
+        if value is None:
+            continue
+        field = by_name[name]
+        tag = field.tag
+        wire_type = field.wire_type
+        for item in (value if field.repeated else (value,)):
+            end = pos + len(tag)
+            buf[pos:end] = tag
+            pos = end
+            if wire_type == VARINT:
+                item = int(item)
+                if 0 <= item < 0x80:
+                    buf[pos] = item
+                    pos += 1
+                else:
+                    pos = write_varint(buf, pos, item)
+            elif wire_type == LEN:
+                if field.kind == 'message':
+                    pos = write_varint(buf, pos, sizes[id(item)])
+                    pos = _write_message(field.schema, item, buf, pos, sizes)
+                    continue
+                if field.kind == 'string':
+                    data = sizes.get(id(item)) or item.encode('ascii')
+                else:
+                    data = item
+                pos = write_varint(buf, pos, len(data))
+                end = pos + len(data)
+                buf[pos:end] = data
+                pos = end
+            else:
+                packer = _STRUCTS[field.kind]
+                packer.pack_into(buf, pos, item)
+                pos += packer.size
+    return pos
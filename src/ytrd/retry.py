@@ -0,0 +1,64 @@
+"""Политика повторов после ошибок без участия пользователя.
+
+Временные (сетевые) ошибки повторяются с экспоненциальной паузой и jitter, пока не
+исчерпано число попыток или время на стадию. Ошибки, после которых продолжать загрузку
+бессмысленно (HTTP 416, битые параметры кодека), обрабатываются отдельно: временные
+файлы удаляются и загрузка начинается с нуля ограниченное число раз.
+"""
+import random
+import time
+from dataclasses import dataclass
+
+RANGE_NOT_SATISFIABLE = 416
+
+# Признаки ошибок FFmpeg (пост-обработка yt-dlp), при которых скачанный файл уже не спасти
+CODEC_ERROR_MARKERS = ("codec parameters",)
+
+def http_status(error):
+    """HTTP-код ответа из ошибки requests или yt-dlp (в том числе вложенной в DownloadError), иначе None."""
+    seen = set()
+    while error is not None and id(error) not in seen:
+        seen.add(id(error))
+        # requests: error.response.status_code; yt-dlp: error.status
+        status = getattr(getattr(error, 'response', None), 'status_code', None)
+        if status is None:
+            status = getattr(error, 'status', None)
+        if isinstance(status, int):
+            return status
+        exc_info = getattr(error, 'exc_info', None)
+        error = (exc_info[1] if exc_info else None) or error.__cause__ or error.__context__
+    return None
+
+def is_permanent(error):
+    """Проверяет, что ошибка требует перезапуска загрузки с нуля, а не простого повтора.
+
+    HTTP 416 определяется по коду ответа: в тексте ошибки requests есть URL, и "416"
+    может оказаться в нем случайно. По тексту проверяются только ошибки FFmpeg.
+    """
+    if http_status(error) == RANGE_NOT_SATISFIABLE:
+        return True
+    return any(marker in str(error) for marker in CODEC_ERROR_MARKERS)
+
+@dataclass
+class RetryPolicy:
+    max_attempts: int = 5         # Всего попыток, включая первую
+    base_delay: float = 2.0       # Пауза перед первым повтором, сек
+    max_delay: float = 60.0       # Потолок паузы, сек
+    jitter: float = 0.2           # Случайное отклонение паузы (+-20%)
+    deadline: float = 0           # Предельное время на стадию, сек (0 — без ограничения)
+    permanent_restarts: int = 1   # Сколько раз перезапускать загрузку с нуля после "постоянной" ошибки
+    interactive: bool = False     # Спрашивать пользователя вместо автоматического решения
+
+    def delay(self, attempt):
+        """Пауза после неудачной попытки номер attempt (с 1)."""
+        base = min(self.base_delay * 2 ** (attempt - 1), self.max_delay)
+        return base * random.uniform(1 - self.jitter, 1 + self.jitter)
+
+    def next_delay(self, attempt, started):
+        """Пауза перед следующей попыткой или None, если попытки или время стадии исчерпаны."""
+        if attempt >= self.max_attempts:
+            return None
+        delay = self.delay(attempt)
+        if self.deadline and time.monotonic() - started + delay > self.deadline:
+            return None
+        return delay
@@ -0,0 +1,266 @@
+"""Режим сервера (ytrd serve): постоянный процесс с локальным HTTP/JSON API заданий.
+
+Процесс один раз платит за запуск интерпретатора, импорт yt-dlp, поиск FFmpeg и
+соединения с API перевода, а задания идут через общий конвейер пакетного режима
+(pipeline.BatchPipeline) с ограниченными пулами стадий и без вопросов пользователю.
+
+API (тело запросов и ответов — JSON):
+    POST   /jobs             {"url": ..., "mode": "mix"|"dual"|"audio", "quality": 720} -> задание
+    GET    /jobs             -> {"jobs": [...]}
+    GET    /jobs/<id>        -> задание
+    DELETE /jobs/<id>        -> отмена (также POST /jobs/<id>/cancel); пока текущая стадия
+                                не остановилась, статус задания — "cancelling"
+    GET    /health           -> {"status": "ok", "pending": N}
+"""
+import copy
+import http.server
+import json
+import re
+import signal
+import sys
+import threading
+import time
+from collections import OrderedDict
+
+from . import main, metrics, vot
+from .pipeline import BatchPipeline
+
+MODES = ("mix", "dual", "audio")
+MAX_BODY = 64 * 1024     # Предельный размер тела запроса, байт
+KEEP_FINISHED = 1000     # Сколько завершенных заданий помнить для GET /jobs
+
+class QueueFull(Exception):
+    pass
+
+def job_to_dict(job):
+    opts = job.options
+    mode = "audio" if opts.audio else ("dual" if opts.dual else "mix")
+    status = job.status
+    if job.cancelled and status in ("pending", "running"):
+        # Отмена принята, но текущая стадия еще не остановилась
+        status = "cancelling"
+    return {
+        'id': job.index,
+        'url': job.url,
+        'video_id': job.metrics.video_id,
+        'mode': mode,
+        'quality': opts.quality,
+        'status': status,
+        'stage': job.stage,
+        'title': job.title,
+        'final_path': job.final_path,
+        'error': job.error,
+        'stages': job.metrics.to_dict()['stages'],
+    }
+
+class JobManager:
+    """Принимает задания, хранит их состояние и ограничивает очередь."""
+
+    def __init__(self, options, max_queue=100):
+        self.options = options
+        self.max_queue = max(1, max_queue)
+        self.started = time.monotonic()
+        self.pipeline = BatchPipeline(
+            options,
+            translate_workers=options.translate_workers,
+            download_workers=options.download_workers,
+            ffmpeg_workers=options.ffmpeg_workers,
+        )
+        self.pipeline.on_finish = self._on_finish
+        self.jobs = OrderedDict()
+        # RLock: задание может завершиться прямо внутри submit (колбэк _on_finish)
+        self._lock = threading.RLock()
+
+    def start(self):
+        self.pipeline.start()
+        return self
+
+    def job_options(self, payload):
+        """Настройки задания: настройки сервера + режим и качество из запроса."""
+        opts = copy.copy(self.options)
+        mode = payload.get('mode', 'dual' if self.options.dual else 'mix')
+        if mode not in MODES:
+            raise ValueError(f"mode должен быть одним из: {', '.join(MODES)}")
+        opts.mix, opts.dual, opts.audio = mode == "mix", mode == "dual", mode == "audio"
+        quality = payload.get('quality', self.options.quality)
+        if quality is not None and (isinstance(quality, bool) or not isinstance(quality, int) or quality <= 0):
+            raise ValueError("quality должно быть положительным целым числом")
+        opts.quality = None if opts.audio else quality
+        return opts
+
+    def submit(self, payload):
+        url = payload.get('url')
+        if not isinstance(url, str) or not vot.get_video_id(url.strip()):
+            raise ValueError("url должен быть ссылкой на видео YouTube")
+        options = self.job_options(payload)
+        with self._lock:
+            if self.pipeline.pending >= self.max_queue:
+                raise QueueFull(f"В очереди уже {self.pipeline.pending} заданий")
+            job = self.pipeline.submit(url.strip(), options)
+            self.jobs[job.index] = job
+        return job
+
+    def get(self, job_id):
+        with self._lock:
+            return self.jobs.get(job_id)
+
+    def list(self):
+        with self._lock:
+            return list(self.jobs.values())
+
+    def cancel(self, job_id):
+        job = self.get(job_id)
+        if job is None:
+            return None, False
+        return job, self.pipeline.cancel(job)
+
+    def _on_finish(self, job):
+        with self._lock:
+            finished = [i for i, j in self.jobs.items() if j.status in ("done", "failed", "cancelled")]
+            for index in finished[:max(0, len(finished) - KEEP_FINISHED)]:
+                del self.jobs[index]
+            jobs = [j.metrics for j in self.jobs.values()]
+        metrics.export(jobs, time.monotonic() - self.started)
+
+    def close(self):
+        for job in self.list():
+            self.pipeline.cancel(job)
+        self.pipeline.close()
+
+class _Handler(http.server.BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    server_version = "ytrd"
+
+    def log_message(self, fmt, *args):
+        pass
+
+    @property
+    def manager(self):
+        return self.server.manager
+
+    def _send(self, code, data):
+        body = json.dumps(data, ensure_ascii=False).encode('utf-8')
+        self.send_response(code)
+        self.send_header('Content-Type', 'application/json; charset=utf-8')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _error(self, code, message):
+        self._send(code, {'error': message})
+
+    def _job_id(self, pattern):
+        match = re.fullmatch(pattern, self.path.split('?')[0].rstrip('/'))
+        return int(match.group(1)) if match else None
+
+    def do_GET(self):
+        path = self.path.split('?')[0].rstrip('/')
+        if path == '/health':
+            self._send(200, {'status': 'ok', 'pending': self.manager.pipeline.pending})
+        elif path == '/jobs':
+            self._send(200, {'jobs': [job_to_dict(job) for job in self.manager.list()]})
+        else:
+            job_id = self._job_id(r'/jobs/(\d+)')
+            job = self.manager.get(job_id) if job_id is not None else None
+            if job is None:
+                self._error(404, "Задание не найдено")
+            else:
+                self._send(200, job_to_dict(job))
+
+    def do_POST(self):
+        if self.path.split('?')[0].rstrip('/') != '/jobs':
+            job_id = self._job_id(r'/jobs/(\d+)/cancel')
+            if job_id is None:
+                self._error(404, "Неизвестный адрес")
+            else:
+                self._cancel(job_id)
+            return
+        length = self.headers.get('Content-Length')
+        # Тело не прочитано, поэтому после ошибки соединение закрывается
+        if length is None:
+            self.close_connection = True
+            self._error(411, "Нужен заголовок Content-Length")
+            return
+        # Только цифры: при отрицательном значении rfile.read(-1) ждал бы закрытия соединения
+        if not re.fullmatch(r'[0-9]+', length.strip()):
+            self.close_connection = True
+            self._error(400, "Некорректный Content-Length")
+            return
+        length = int(length)
+        if length > MAX_BODY:
+            self.close_connection = True
+            self._error(413, "Слишком большой запрос")
+            return
+        try:
+            payload = json.loads(self.rfile.read(length) or b'{}')
+            if not isinstance(payload, dict):
+                raise ValueError("Тело запроса должно быть JSON-объектом")
+            job = self.manager.submit(payload)
+        except QueueFull as e:
+            self._error(503, str(e))
+        except ValueError as e:
+            self._error(400, str(e))
+        else:
+            self._send(201, job_to_dict(job))
+
+    def do_DELETE(self):
+        job_id = self._job_id(r'/jobs/(\d+)')
+        if job_id is None:
+            self._error(404, "Неизвестный адрес")
+        else:
+            self._cancel(job_id)
+
+    def _cancel(self, job_id):
+        job, accepted = self.manager.cancel(job_id)
+        if job is None:
+            self._error(404, "Задание не найдено")
+        elif not accepted:
+            self._error(409, f"Задание уже завершено ({job.status})")
+        else:
+            self._send(202, job_to_dict(job))
+
+def warm_up(options):
+    """Все, что одиночный запуск делает заново для каждого видео: проверки, импорт yt-dlp, сессия API.
+
+    Экземпляры YoutubeDL не переиспользуются: у каждого задания своя VideoSession (формат,
+    шаблон имени и хуки прогресса меняются по ходу задания). Прогрев — это импорт модулей
+    yt-dlp и классов экстракторов, включая YouTube, чтобы первое задание их не ждало.
+    """
+    main.install_check()
+    main.check_write_permissions(options.output)
+    with main.yt_dlp.YoutubeDL({'quiet': True, 'no_warnings': True, 'logger': main.Logger()}) as ydl:
+        ydl.get_info_extractor('Youtube')
+    # Одна сессия requests с пулом соединений к API перевода на весь процесс
+    vot.get_client()
+
+def _interrupt(signum, frame):
+    raise KeyboardInterrupt
+
+def serve(args):
+    """Запускает HTTP API заданий и работает до Ctrl+C или SIGTERM."""
+    # Сервер никогда не спрашивает пользователя: повторы только по политике
+    main.RETRY_POLICY.interactive = False
+    print(f"{main.YELLOW}Подготовка (FFmpeg, yt-dlp, API перевода)...{main.RESET}")
+    warm_up(args)
+
+    manager = JobManager(args, max_queue=args.max_queue).start()
+    try:
+        httpd = http.server.ThreadingHTTPServer((args.host, args.port), _Handler)
+    except OSError as e:
+        print(f"{main.RED}❌ Не удалось открыть {args.host}:{args.port}: {e}{main.RESET}")
+        manager.close()
+        sys.exit(1)
+    httpd.daemon_threads = True
+    httpd.manager = manager
+    if threading.current_thread() is threading.main_thread():
+        signal.signal(signal.SIGTERM, _interrupt)
+
+    host, port = httpd.server_address[:2]
+    print(f"{main.GREEN}✅ ytrd serve: http://{host}:{port} (POST /jobs, GET /jobs, DELETE /jobs/<id>){main.RESET}")
+    try:
+        httpd.serve_forever()
+    except KeyboardInterrupt:
+        print(f"\n{main.YELLOW}Остановка сервера...{main.RESET}")
+    finally:
+        httpd.server_close()
+        manager.close()
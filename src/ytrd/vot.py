@@ -1,105 +1,79 @@
-import requests
-import struct
 import uuid
 import hmac
 import hashlib
 import time
 import json
 import re
+import threading
+import functools
 from urllib.parse import urlparse, parse_qs
+from .lazy import lazy_import
+from .protobuf import Schema, Field, DecodeError
+
+# requests is imported on first use so that get_video_id() and the CLI start fast
+requests = lazy_import("requests")
 
 # Configuration
 YANDEX_HMAC_KEY = b"bt8xH3VOlb4mqf0nqAibnDOoiPlXsisf"
 USER_AGENT = "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/122.0.0.0 YaBrowser/24.4.0.0 Safari/537.36"
+TRANSLATE_URL = "https://api.browser.yandex.ru/video-translation/translate"
 
-# --- Protobuf Helpers ---
-# Minimal implementation to avoid needing 'protoc' installed
-
-def encode_varint(value):
-    target = []
-    if value < 0:
-        value += (1 << 64)
-    bits = value & 0x7f
-    value >>= 7
-    while value:
-        target.append(bits | 0x80)
-        bits = value & 0x7f
-        value >>= 7
-    target.append(bits)
-    return bytes(target)
-
-def read_varint(buffer, pos):
-    result = 0
-    shift = 0
-    while True:
-        b = buffer[pos]
-        result |= (b & 0x7f) << shift
-        pos += 1
-        if not (b & 0x80):
-            return result, pos
-        shift += 7
-
-def encode_tag(field_number, wire_type):
-    return encode_varint((field_number << 3) | wire_type)
-
-def encode_string(field_number, value):
-    if value is None:
-        return b""
-    encoded = value.encode('utf-8')
-    return encode_tag(field_number, 2) + encode_varint(len(encoded)) + encoded
-
-def encode_bool(field_number, value):
-    return encode_tag(field_number, 0) + encode_varint(1 if value else 0)
-
-def encode_double(field_number, value):
-    return encode_tag(field_number, 1) + struct.pack('<d', float(value))
-
-def encode_int32(field_number, value):
-    return encode_tag(field_number, 0) + encode_varint(value)
-
-class SimpleProtobufReader:
-    def __init__(self, data):
-        self.data = data
-        self.pos = 0
-        self.fields = {}
-        self._parse()
-
-    def _parse(self):
-        while self.pos < len(self.data):
-            try:
-                tag, self.pos = read_varint(self.data, self.pos)
-                field_number = tag >> 3
-                wire_type = tag & 0x07
-                
-                if wire_type == 0: # Varint
-                    val, self.pos = read_varint(self.data, self.pos)
-                    self.fields[field_number] = val
-                elif wire_type == 2: # Length-delimited (string, bytes, embedded messages)
-                    length, self.pos = read_varint(self.data, self.pos)
-                    val = self.data[self.pos:self.pos+length]
-                    self.pos += length
-                    self.fields[field_number] = val
-                elif wire_type == 1: # 64-bit
-                    val = self.data[self.pos:self.pos+8]
-                    self.pos += 8
-                    self.fields[field_number] = val
-                elif wire_type == 5: # 32-bit
-                    val = self.data[self.pos:self.pos+4]
-                    self.pos += 4
-                    self.fields[field_number] = val
-                else:
-                    # Skip unknown
-                    pass 
-            except IndexError:
-                break
-
-    def get_string(self, field_number):
-        if field_number in self.fields:
-            return self.fields[field_number].decode('utf-8')
-        return None
+# --- Protobuf schemas ---
+# Declarative message layouts for the translation API (see ytrd.protobuf for the codec)
+
+TRANSLATION_HELP = Schema("VideoTranslationHelpObject", [
+    Field(1, "target", "string"),
+    Field(2, "target_url", "string"),
+])
+
+TRANSLATE_REQUEST = Schema("VideoTranslationRequest", [
+    Field(3, "url", "string"),
+    Field(4, "device_id", "string"),
+    Field(5, "first_request", "bool"),
+    Field(6, "duration", "double"),
+    Field(7, "unknown0", "int32"),
+    Field(8, "language", "string"),
+    Field(9, "force_source_lang", "int32"),
+    Field(10, "unknown1", "int32"),
+    Field(11, "translation_help", "message", repeated=True, schema=TRANSLATION_HELP),
+    Field(14, "response_language", "string"),
+    Field(15, "was_stream", "int32"),
+    Field(16, "unknown2", "int32"),
+    Field(17, "unknown3", "int32"),
+    Field(18, "bypass_cache", "bool"),
+    Field(19, "use_lively_voice", "bool"),
+    Field(20, "video_title", "string"),
+])
 
-    def get_int(self, field_number):
-        return self.fields.get(field_number)
+TRANSLATE_RESPONSE = Schema("VideoTranslationResponse", [
+    Field(1, "url", "string"),
+    Field(2, "duration", "double"),
+    Field(4, "status", "int32"),
+    Field(5, "remaining_time", "int32"),
+    Field(6, "unknown0", "int32"),
+    Field(7, "translation_id", "string"),
+    Field(8, "language", "string"),
+    Field(9, "message", "string"),
+    Field(10, "is_lively_voice", "bool"),
+    Field(11, "unknown2", "int32"),
+    Field(12, "should_retry", "int32"),
+    Field(13, "unknown3", "int32"),
+])
+
+SUBTITLES_OBJECT = Schema("VideoSubtitlesObject", [
+    Field(1, "language", "string"),
+    Field(2, "url", "string"),
+    Field(3, "unknown0", "int32"),
+    Field(4, "translated_language", "string"),
+    Field(5, "translated_url", "string"),
+    Field(6, "unknown1", "int32"),
+    Field(7, "unknown2", "int32"),
+])
+
+SUBTITLES_RESPONSE = Schema("VideoSubtitlesResponse", [
+    Field(1, "waiting", "bool"),
+    Field(2, "subtitles", "message", repeated=True, schema=SUBTITLES_OBJECT),
+])
 
 # --- Core Logic ---
 
@@ -107,15 +81,20 @@ def get_video_id(url):
     """
     Extracts YouTube video ID from URL.
     """
+    url = url.strip()
+    if "://" not in url:
+        # Links pasted without a scheme: youtu.be/ID, www.youtube.com/watch?v=ID
+        url = "https://" + url
     try:
         parsed_url = urlparse(url)
     except Exception:
         return None
+    netloc = parsed_url.netloc.lower()
 
-    if parsed_url.netloc in ["youtu.be"]:
-        return parsed_url.path.lstrip("/")
+    if netloc in ["youtu.be", "www.youtu.be"]:
+        return parsed_url.path.lstrip("/").split("/")[0] or None
     
-    if parsed_url.netloc in ["www.youtube.com", "youtube.com", "m.youtube.com"]:
+    if netloc in ["www.youtube.com", "youtube.com", "m.youtube.com", "music.youtube.com"]:
         if parsed_url.path == "/watch":
             params = parse_qs(parsed_url.query)
             return params.get("v", [None])[0]
@@ -125,6 +104,8 @@ def get_video_id(url):
             return parsed_url.path.split("/")[2]
         if parsed_url.path.startswith("/shorts/"):
             return parsed_url.path.split("/")[2]
+        if parsed_url.path.startswith("/live/"):
+            return parsed_url.path.split("/")[2]
             
     return None
 
@@ -139,51 +120,46 @@ def get_signature(body):
     return signature
 
 
-def translate_video(url, duration=341.0):
-    video_id = get_video_id(url)
-    if not video_id:
-        return {"success": False, "message": "Invalid YouTube URL"}
+def encode_translate_request(url, duration, request_lang="en", response_lang="ru"):
+    """Encodes the translate request body (one buffer allocation)."""
+    return TRANSLATE_REQUEST.encode({
+        "url": url,
+        "first_request": True,
+        "duration": float(duration),
+        "unknown0": 1,
+        "language": request_lang,  # Source language (usually auto-detected or 'en')
+        "force_source_lang": 0,
+        "unknown1": 0,
+        "response_language": response_lang,
+        "was_stream": 0,
+        "unknown2": 1,
+        "unknown3": 0,
+    })
 
-    # Видео ID используется только для валидации, но сам запрос требует URL
-    
-    body = b""
-    body += encode_string(3, url)
-    body += encode_bool(5, True)
-    body += encode_double(6, float(duration))
-    body += encode_int32(7, 1)
-    body += encode_string(8, "en") # Request Lang (обычно определяется автоматически или 'en')
-    body += encode_int32(9, 0)
-    body += encode_int32(10, 0)
-    body += encode_string(14, "ru") # Response Lang
-    body += encode_int32(15, 0)
-    body += encode_int32(16, 1)
-    body += encode_int32(17, 0)
-
-    headers = {
-        "Accept": "application/x-protobuf",
-        "Accept-Language": "en",
-        "Content-Type": "application/x-protobuf",
-        "User-Agent": USER_AGENT,
-        "Vtrans-Signature": get_signature(body),
-        "Sec-Vtrans-Token": get_uuid()
-    }
+@functools.lru_cache(maxsize=256)
+def build_translate_request(url, duration, request_lang="en", response_lang="ru"):
+    """
+    Builds the protobuf body and its signature.
+    Cached: polling the same video reuses the body instead of re-encoding and re-signing it.
+    """
+    # bytes(): the cached body must be immutable
+    body = bytes(encode_translate_request(url, duration, request_lang, response_lang))
+    return body, get_signature(body)
 
+def parse_translate_response(content):
+    response = TRANSLATE_RESPONSE.decode(content)
     try:
-        response = requests.post(
-            "https://api.browser.yandex.ru/video-translation/translate",
-            data=body,
-            headers=headers,
-            timeout=10
-        )
-        response.raise_for_status()
-    except requests.exceptions.RequestException as e:
-         return {"success": False, "message": f"Network error: {str(e)}"}
-
-    reader = SimpleProtobufReader(response.content)
-    
-    status = reader.get_int(4)
-    message = reader.get_string(9)
-    audio_url = reader.get_string(1)
+        status = response.status
+        message = response.message
+        audio_url = response.url
+        remaining_time = response.remaining_time
+    except DecodeError as e:
+        return {
+            "success": False,
+            "status": "Error",
+            "url": None,
+            "message": f"Malformed response: {e}"
+        }
     
     if status == 1:
         return {
@@ -197,7 +173,8 @@ def translate_video(url, duration=341.0):
             "success": True, 
             "status": "Waiting",
             "url": None,
-            "message": "Translation will take a few minutes"
+            "message": "Translation will take a few minutes",
+            "remaining_time": remaining_time
         }
     elif status == 0:
         return {
@@ -213,3 +190,71 @@ def translate_video(url, duration=341.0):
             "url": None,
             "message": f"Unknown status: {status}"
         }
+
+class TranslationClient:
+    """
+    Reusable client for the translation API.
+    Keeps a keep-alive connection pool, so repeated polls don't pay a new TCP+TLS handshake.
+    Safe to share between threads.
+    """
+
+    def __init__(self, timeout=(5, 10), retries=3, backoff_factor=0.5, pool_size=10, api_url=TRANSLATE_URL):
+        from requests.adapters import HTTPAdapter
+        from urllib3.util.retry import Retry
+
+        self.timeout = timeout
+        self.api_url = api_url
+        self.session = requests.Session()
+        self.session.headers.update({
+            "Accept": "application/x-protobuf",
+            "Accept-Language": "en",
+            "Content-Type": "application/x-protobuf",
+            "User-Agent": USER_AGENT,
+        })
+        retry = Retry(
+            total=retries,
+            backoff_factor=backoff_factor,
+            status_forcelist=(429, 500, 502, 503, 504),
+            allowed_methods=frozenset(["POST"]),
+            raise_on_status=False,
+        )
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size, max_retries=retry)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+
+    def translate(self, url, duration=341.0, request_lang="en", response_lang="ru"):
+        video_id = get_video_id(url)
+        if not video_id:
+            return {"success": False, "message": "Invalid YouTube URL"}
+
+        # Видео ID используется только для валидации, но сам запрос требует URL
+        body, signature = build_translate_request(url, float(duration), request_lang, response_lang)
+        headers = {
+            "Vtrans-Signature": signature,
+            "Sec-Vtrans-Token": get_uuid()
+        }
+
+        try:
+            response = self.session.post(self.api_url, data=body, headers=headers, timeout=self.timeout)
+            response.raise_for_status()
+        except requests.exceptions.RequestException as e:
+             return {"success": False, "message": f"Network error: {str(e)}"}
+
+        return parse_translate_response(response.content)
+
+    def close(self):
+        self.session.close()
+
+_default_client = None
+_default_client_lock = threading.Lock()
+
+def get_client():
+    """Returns the process-wide shared client (created on first use)."""
+    global _default_client
+    with _default_client_lock:
+        if _default_client is None:
+            _default_client = TranslationClient()
+        return _default_client
+
+def translate_video(url, duration=341.0, request_lang="en", response_lang="ru"):
+    return get_client().translate(url, duration, request_lang, response_lang)
@@ -0,0 +1,112 @@
+"""Изолированные рабочие папки заданий.
+
+Каждое задание получает свою временную папку с файлами video.* и audio.*,
+поэтому несколько процессов ytrd (или заданий пакета) в одной папке не затирают
+и не удаляют файлы друг друга. По умолчанию рабочие папки создаются рядом с папкой
+сохранения (WORK_DIR_NAME), чтобы готовый файл переносился переименованием, без копирования.
+
+В каждой рабочей папке лежит файл владельца (PID и имя хоста). Папки, чей владелец
+уже не работает (аварийное завершение, kill), удаляет reclaim_stale при следующем запуске.
+"""
+import os
+import shutil
+import socket
+import tempfile
+import time
+
+WORK_DIR_NAME = ".ytrd-work"
+OWNER_FILE = ".owner"
+STALE_AGE = 24 * 3600  # Через сколько секунд удалять папки без живого владельца, если PID не проверить
+
+def default_work_dir(output):
+    """Папка для рабочих папок заданий на том же диске, что и папка сохранения."""
+    return os.path.join(output, WORK_DIR_NAME)
+
+def _pid_alive(pid):
+    """Жив ли процесс pid. None — проверить нельзя (на Windows os.kill завершает процесс)."""
+    if os.name == 'nt':
+        return None
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except OSError:
+        return True  # Процесс есть, но чужой (EPERM)
+    return True
+
+def _read_owner(path):
+    try:
+        with open(os.path.join(path, OWNER_FILE), 'r', encoding='utf-8') as f:
+            pid, _, host = f.read().strip().partition(' ')
+        return int(pid), host
+    except (OSError, ValueError):
+        return None
+
+def is_stale(path):
+    """Рабочая папка брошена: ее владелец завершился, либо (без проверки PID) она старше STALE_AGE."""
+    owner = _read_owner(path)
+    if owner is not None and owner[1] == socket.gethostname():
+        alive = _pid_alive(owner[0])
+        if alive is not None:
+            return not alive
+    try:
+        return time.time() - os.path.getmtime(path) > STALE_AGE
+    except OSError:
+        return False
+
+def reclaim_stale(base):
+    """Удаляет брошенные рабочие папки ytrd-* в base. Возвращает их число."""
+    try:
+        names = os.listdir(base)
+    except OSError:
+        return 0
+    removed = 0
+    for name in names:
+        path = os.path.join(base, name)
+        if name.startswith("ytrd-") and os.path.isdir(path) and is_stale(path):
+            shutil.rmtree(path, ignore_errors=True)
+            removed += not os.path.exists(path)
+    return removed
+
+class Workspace:
+    """Временная папка одного задания."""
+
+    def __init__(self, base=None):
+        self.base = base
+        try:
+            if base:
+                os.makedirs(base, exist_ok=True)
+            self.path = tempfile.mkdtemp(prefix="ytrd-", dir=base)
+        except OSError:
+            if not base:
+                raise
+            # Нет прав на папку рядом с результатом — работаем в системной временной папке
+            self.base = None
+            self.path = tempfile.mkdtemp(prefix="ytrd-")
+        try:
+            with open(os.path.join(self.path, OWNER_FILE), 'w', encoding='utf-8') as f:
+                f.write(f"{os.getpid()} {socket.gethostname()}")
+        except OSError:
+            pass  # Без файла владельца папка будет считаться брошенной только по возрасту
+        self.video_path = os.path.join(self.path, "video.mp4")
+        self.audio_path = os.path.join(self.path, "audio.mp3")
+
+    def file(self, name):
+        """Путь к произвольному файлу внутри рабочей папки."""
+        return os.path.join(self.path, name)
+
+    def release(self):
+        """Оставляет папку для проверки: без владельца ее удалит reclaim_stale через STALE_AGE."""
+        try:
+            os.remove(os.path.join(self.path, OWNER_FILE))
+        except OSError:
+            pass
+
+    def cleanup(self):
+        """Удаляет рабочую папку целиком (и общую папку base, если она опустела)."""
+        shutil.rmtree(self.path, ignore_errors=True)
+        if self.base:
+            try:
+                os.rmdir(self.base)
+            except OSError:
+                pass